@@ -1,31 +1,111 @@
 ## 1. Import necessary libraries
 from __future__ import annotations
 
+import atexit
+import os
+import threading
+import time
 import boto3
-from typing import Dict
+from botocore.config import Config
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
 from langchain_aws import ChatBedrock
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+from chathealth import HealthMonitor, serve_health
+from chatusage import TokenBudget, TokenMeter
+
+if TYPE_CHECKING:
+    from chatcache import SemanticCache
+    from chatstore import MemoryBackend
+    from chatsummarizer import SummaryScheduler
 
 
 MODEL_ID = "amazon.titan-text-lite-v1"
 MODEL_REGION = "us-east-1"
+MAX_TOKEN_COUNT = 2048
+MEMORY_TOKEN_LIMIT = 1500
+# Tries to store a turn when another replica wrote the session meanwhile
+SAVE_ATTEMPTS = 3
+
+
+def _env_number(name: str, default: float, cast: Any = int) -> Any:
+    """Read a numeric env knob; a malformed value falls back to the default."""
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return cast(default)
+    try:
+        return cast(raw)
+    except ValueError:
+        print(f"Warning: ignoring {name}={raw!r} (not a number), using {default}")
+        return cast(default)
+
+
+# Opt-in semantic response cache (needs numpy). Set SMARTBOT_CACHE_PATH to
+# persist the index between restarts.
+CACHE_ENABLED = os.environ.get("SMARTBOT_CACHE", "").lower() in {"1", "true", "yes"}
+CACHE_PATH = os.environ.get("SMARTBOT_CACHE_PATH") or None
+CACHE_THRESHOLD = _env_number("SMARTBOT_CACHE_THRESHOLD", 0.92, float)
+
+# Optional persistent session memory, e.g. "sqlite:///smartbot_memory.db" or
+# "dynamodb://smartbot-chat-memory?region=us-east-1".
+MEMORY_BACKEND_URL = os.environ.get("SMARTBOT_MEMORY_BACKEND", "")
+
+# Optional token budgets (input + output tokens); unset means unlimited.
+SESSION_TOKEN_BUDGET = _env_number("SMARTBOT_SESSION_TOKEN_BUDGET", 0) or None
+GLOBAL_TOKEN_BUDGET = _env_number("SMARTBOT_GLOBAL_TOKEN_BUDGET", 0) or None
+
+# Optional deferred summarization: overflowing sessions are summarized by a
+# shared scheduler in bounded-concurrency batches instead of inline.
+SUMMARY_BATCHING = os.environ.get("SMARTBOT_SUMMARY_BATCHING", "").lower() in {"1", "true", "yes"}
+SUMMARY_CONCURRENCY = _env_number("SMARTBOT_SUMMARY_CONCURRENCY", 4)
+SUMMARY_DEADLINE = _env_number("SMARTBOT_SUMMARY_DEADLINE", 5, float)
+
+# Warm-up and health probing. POOL_CONNECTIONS keep-alive connections are
+# opened at start-up; WARMUP_PRIME also sends a one-token request to the model.
+POOL_CONNECTIONS = _env_number("SMARTBOT_POOL_CONNECTIONS", 10)
+WARMUP_CONNECTIONS = _env_number("SMARTBOT_WARMUP_CONNECTIONS", 2)
+WARMUP_PRIME = os.environ.get("SMARTBOT_WARMUP_PRIME", "").lower() in {"1", "true", "yes"}
+HEALTH_PORT = _env_number("SMARTBOT_HEALTH_PORT", 0)
 
 
 class ChatbotManager:
-    """Manage LLM, prompt template, and per-session memory."""
+    """Manage LLM, prompt template, and per-session memory.
 
-    def __init__(self) -> None:
+    One manager can serve every user in the process. Sessions are isolated by
+    ``session_id``: turns of different sessions run in parallel, turns of the
+    same session are serialized so its memory is never updated concurrently.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[SemanticCache] = None,
+        backend: Optional[MemoryBackend] = None,
+        budget: Optional[TokenBudget] = None,
+        scheduler: Optional[SummaryScheduler] = None,
+        client: Any = None,
+    ) -> None:
+        self.cache = cache
+        self.backend = backend
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.on_complete = self._persist
+        self.meter = TokenMeter(budget)
         self.llm = ChatBedrock(
             model_id=MODEL_ID,
             model_kwargs={
                 "temperature": 0.5,
-                "maxTokenCount": 2048,
+                "maxTokenCount": MAX_TOKEN_COUNT,
                 "topP": 0.9,
             },
             region_name=MODEL_REGION,
+            client=client,
+            callbacks=[self.meter],
         )
+        self.monitor = HealthMonitor(self.llm.client)
 
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -44,37 +124,214 @@ class ChatbotManager:
         )
 
         self.memory_store: Dict[str, ConversationSummaryBufferMemory] = {}
+        # Last summary written to the backend, to skip rewriting it every turn.
+        self._persisted_summary: Dict[str, str] = {}
+        # Backend version each in-process memory was loaded or saved at.
+        self._versions: Dict[str, int] = {}
+        # _lock guards the dicts above; each session also gets its own lock,
+        # kept as [lock, number of threads holding or waiting for it].
+        self._lock = threading.Lock()
+        self._session_locks: Dict[str, List[Any]] = {}
+
+    @contextmanager
+    def _session_lock(self, session_id: str) -> Iterator[None]:
+        """Hold the session's lock (reentrant).
+
+        The lock is forgotten only once no thread holds or waits for it, so
+        every thread working on a session always shares the same lock.
+        """
+        with self._lock:
+            entry = self._session_locks.get(session_id)
+            if entry is None:
+                entry = self._session_locks[session_id] = [threading.RLock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._session_locks[session_id]
 
     def _memory_for(self, session_id: str) -> ConversationSummaryBufferMemory:
-        if session_id not in self.memory_store:
-            self.memory_store[session_id] = ConversationSummaryBufferMemory(
+        """Return the session's memory; the caller holds its session lock.
+
+        With a backend, the stored session is read on every turn: another
+        replica may have served the previous one. The in-process memory is
+        only rebuilt when the stored version differs from the one it has.
+        """
+        with self._lock:
+            memory = self.memory_store.get(session_id)
+        if memory is None:
+            memory_kwargs: Dict[str, Any] = {}
+            memory_cls = ConversationSummaryBufferMemory
+            if self.scheduler is not None:
+                from chatsummarizer import DeferredSummaryMemory
+
+                memory_cls = DeferredSummaryMemory
+                memory_kwargs = {"scheduler": self.scheduler, "session_id": session_id}
+
+            memory = memory_cls(
                 llm=self.llm,
-                max_token_limit=1500,
+                max_token_limit=MEMORY_TOKEN_LIMIT,
                 return_messages=False,
                 ai_memory_key="output",
                 human_memory_key="input",
+                **memory_kwargs,
             )
-        return self.memory_store[session_id]
+            with self._lock:
+                self.memory_store[session_id] = memory
+
+        if self.backend is not None:
+            state = self.backend.load(session_id)
+            with self._lock:
+                current = self._versions.get(session_id, 0)
+            if state is not None and state.version != current:
+                memory.moving_summary_buffer = state.summary
+                memory.chat_memory.messages = messages_from_dict(state.messages)
+                if hasattr(memory, "pending_messages"):
+                    # Stored messages already include the pending ones.
+                    memory.pending_messages = []
+                with self._lock:
+                    self._persisted_summary[session_id] = state.summary
+                    self._versions[session_id] = state.version
+        return memory
+
+    def _remember(self, session_id: str, memory: ConversationSummaryBufferMemory,
+                  user_input: str, output_text: str) -> None:
+        for _ in range(SAVE_ATTEMPTS):
+            memory.save_context({"input": user_input}, {"output": output_text})
+            if self._persist(session_id, memory):
+                return
+            # Another replica stored a turn meanwhile: add this one on top of
+            # its state instead of overwriting it.
+            memory = self._memory_for(session_id)
+        print(f"Failed to persist memory for session {session_id}: kept changing")
+
+    def _persist(self, session_id: str, memory: ConversationSummaryBufferMemory) -> bool:
+        """Save the session; False if the stored version changed since it was read."""
+        if self.backend is None:
+            return True
+
+        from chatstore import VersionConflict
+
+        # Also called from the summary scheduler's threads.
+        with self._session_lock(session_id):
+            summary = memory.moving_summary_buffer
+            with self._lock:
+                changed = self._persisted_summary.get(session_id, "") != summary
+                expected = self._versions.get(session_id, 0)
+            # Messages still waiting for a deferred summary are stored with the
+            # buffer so they survive a restart.
+            messages = list(getattr(memory, "pending_messages", [])) + memory.chat_memory.messages
+            try:
+                version = self.backend.save(
+                    session_id,
+                    messages_to_dict(messages),
+                    summary if changed else None,
+                    expected_version=expected,
+                )
+                with self._lock:
+                    self._persisted_summary[session_id] = summary
+                    self._versions[session_id] = version
+            except VersionConflict:
+                # A finished deferred summary is dropped here; the newer state
+                # is picked up on the session's next turn.
+                return False
+            except Exception as exc:
+                print(f"Failed to persist memory for session {session_id}: {exc}")
+        return True
 
     def chat(self, session_id: str, user_input: str) -> str:
+        with self._session_lock(session_id):
+            return self._chat(session_id, user_input)
+
+    def _chat(self, session_id: str, user_input: str) -> str:
         memory = self._memory_for(session_id)
         summary = memory.load_memory_variables({}).get("history", "")
 
-        response = self.prompt | self.llm
-        result = response.invoke({
-            "conversation_summary": summary,
-            "input": user_input,
-        })
+        scope = None
+        if self.cache is not None:
+            from chatcache import scope_for_summary
+
+            scope = scope_for_summary(summary)
+            cached = self.cache.lookup(user_input, scope)
+            if cached is not None:
+                # Summarizing the buffer may still call the model
+                with self.meter.session(session_id):
+                    self._remember(session_id, memory, user_input, cached)
+                return cached
+
+        # Near the budget, shrink the response and memory buffer; past it, reject.
+        pressure = self.meter.check(session_id)
+        budget = self.meter.budget
+        memory.max_token_limit = self.meter.scaled(MEMORY_TOKEN_LIMIT, pressure, budget.min_memory_tokens)
+        max_tokens = self.meter.scaled(MAX_TOKEN_COUNT, pressure, budget.min_output_tokens)
+        llm = self.llm if max_tokens == MAX_TOKEN_COUNT else self.llm.bind(maxTokenCount=max_tokens)
 
-        output_text = result.content if hasattr(result, "content") else str(result)
-        memory.save_context({"input": user_input}, {"output": output_text})
+        with self.meter.session(session_id):
+            started = time.perf_counter()
+            response = self.prompt | llm
+            result = response.invoke({
+                "conversation_summary": summary,
+                "input": user_input,
+            })
+
+            output_text = result.content if hasattr(result, "content") else str(result)
+            if self.cache is not None:
+                self.cache.store(user_input, output_text, scope, time.perf_counter() - started)
+            self._remember(session_id, memory, user_input, output_text)
         return output_text
 
+    def end_session(self, session_id: str) -> None:
+        """Drop a session's in-process memory (persisted state is kept)."""
+        with self._session_lock(session_id):
+            with self._lock:
+                self.memory_store.pop(session_id, None)
+                self._persisted_summary.pop(session_id, None)
+                self._versions.pop(session_id, None)
+
+    def warm_up(self, connections: int = WARMUP_CONNECTIONS, prime: bool = False) -> Dict[str, Any]:
+        """Open pooled connections to Bedrock (and optionally prime the model)."""
+        primer = None
+        if prime:
+            def primer() -> None:
+                self.llm.bind(maxTokenCount=1).invoke("Hi")
+
+        return self.monitor.warm_up(connections, primer)
+
+    def health(self) -> Dict[str, Any]:
+        """Readiness with a recent upstream round-trip latency."""
+        return self.monitor.check()
+
+    def stats(self) -> Dict[str, Any]:
+        """Token usage, budget state and cache metrics for monitoring."""
+        with self._lock:
+            active_sessions = len(self.memory_store)
+        stats: Dict[str, Any] = {
+            "active_sessions": active_sessions,
+            "tokens": self.meter.stats(),
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats.as_dict()
+        if self.scheduler is not None:
+            stats["summaries"] = dict(self.scheduler.stats)
+        return stats
+
 
 def setup_bedrock_client():
-    """Check connectivity to AWS Bedrock."""
+    """Create the pooled, keep-alive Bedrock runtime client."""
     try:
-        return boto3.client("bedrock-runtime", region_name=MODEL_REGION)
+        return boto3.client(
+            "bedrock-runtime",
+            region_name=MODEL_REGION,
+            config=Config(
+                max_pool_connections=POOL_CONNECTIONS,
+                tcp_keepalive=True,
+                retries={"max_attempts": 3, "mode": "adaptive"},
+            ),
+        )
     except Exception as exc:  # pragma: no cover
         print(f"Error setting up Bedrock client: {exc}")
         return None
@@ -89,7 +346,44 @@ def initialize_chatbot() -> ChatbotManager | None:
         return None
 
     try:
-        chatbot = ChatbotManager()
+        cache = None
+        if CACHE_ENABLED:
+            from chatcache import SemanticCache
+
+            cache = SemanticCache(threshold=CACHE_THRESHOLD, path=CACHE_PATH)
+            atexit.register(cache.save)
+            print(f"Semantic cache enabled ({len(cache)} entries loaded).")
+
+        backend = None
+        if MEMORY_BACKEND_URL:
+            from chatstore import backend_from_url
+
+            backend = backend_from_url(MEMORY_BACKEND_URL)
+            print(f"Persistent memory backend: {MEMORY_BACKEND_URL}")
+
+        budget = TokenBudget(session_limit=SESSION_TOKEN_BUDGET, global_limit=GLOBAL_TOKEN_BUDGET)
+
+        scheduler = None
+        if SUMMARY_BATCHING:
+            from chatsummarizer import SummaryScheduler
+
+            scheduler = SummaryScheduler(max_concurrency=SUMMARY_CONCURRENCY, deadline=SUMMARY_DEADLINE)
+            atexit.register(scheduler.shutdown)
+
+        chatbot = ChatbotManager(
+            cache=cache,
+            backend=backend,
+            budget=budget,
+            scheduler=scheduler,
+            client=client,
+        )
+
+        health = chatbot.warm_up(prime=WARMUP_PRIME)
+        print(f"Bedrock status: {health['status']} (latency: {health['upstream_latency_ms']} ms)")
+        if HEALTH_PORT:
+            serve_health(chatbot, HEALTH_PORT)
+            print(f"Health endpoint listening on :{HEALTH_PORT}/health")
+
         print("Chatbot initialized successfully.")
         return chatbot
     except Exception as exc:
@@ -0,0 +1,139 @@
+"""Per-visitor memory and start-up latency with many concurrent browser tabs.
+
+Compares the two ways the Streamlit frontend can hold the chatbot:
+
+* per-tab: every browser session builds its own Bedrock client and
+  ``ChatbotManager`` (what ``chatfrontend`` used to do), and
+* shared: one process-wide manager (``st.cache_resource``) with per-session
+  memory keyed by ``session_id``.
+
+All tabs open at once from separate threads, as Streamlit runs each session's
+script on its own thread. No model calls are made and warm-up is skipped, so
+the benchmark needs no AWS credentials.
+
+Usage:
+    python chatbenchmark.py --tabs 100
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import statistics
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+from chatbackend import ChatbotManager, setup_bedrock_client
+
+
+def open_tabs(tabs: int, open_tab: Callable[[str], object]) -> Tuple[List[float], List[object]]:
+    """Open ``tabs`` sessions concurrently.
+
+    Returns each tab's latency and what it holds on to, which must stay alive
+    until its memory has been measured.
+    """
+    barrier = threading.Barrier(tabs)
+    latencies = [0.0] * tabs
+    keep: List[object] = [None] * tabs
+
+    def visit(index: int) -> None:
+        session_id = str(uuid.uuid4())
+        barrier.wait()
+        started = time.perf_counter()
+        keep[index] = open_tab(session_id)
+        latencies[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=visit, args=(i,)) for i in range(tabs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, keep
+
+
+def per_tab_visit(session_id: str) -> ChatbotManager:
+    chatbot = ChatbotManager(client=setup_bedrock_client())
+    with chatbot._session_lock(session_id):
+        chatbot._memory_for(session_id)
+    return chatbot
+
+
+def shared_visit_factory() -> Callable[[str], ChatbotManager]:
+    chatbot = ChatbotManager(client=setup_bedrock_client())
+
+    def visit(session_id: str) -> ChatbotManager:
+        with chatbot._session_lock(session_id):
+            chatbot._memory_for(session_id)
+        return chatbot
+
+    visit.chatbot = chatbot  # type: ignore[attr-defined]
+    return visit
+
+
+def _traced_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(name: str, tabs: int, make_visit: Callable[[], Callable[[str], object]]) -> Dict[str, float]:
+    # Latency and memory are measured in separate runs: tracemalloc slows
+    # allocation-heavy code down considerably.
+    gc.collect()
+    started = time.perf_counter()
+    visit = make_visit()
+    process_init = time.perf_counter() - started
+    latencies, kept = open_tabs(tabs, visit)
+    del visit, kept
+
+    tracemalloc.start()
+    before = _traced_bytes()
+    visit = make_visit()
+    after_init = _traced_bytes()
+    _, kept = open_tabs(tabs, visit)
+    after_tabs = _traced_bytes()
+    tracemalloc.stop()
+
+    chatbot = getattr(visit, "chatbot", None)
+    if chatbot is not None and len(chatbot.memory_store) != tabs:
+        raise AssertionError(f"expected {tabs} isolated sessions, got {len(chatbot.memory_store)}")
+    del visit, kept
+
+    ordered = sorted(latencies)
+    return {
+        "mode": name,
+        "process_init_ms": process_init * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "process_mib": (after_init - before) / 1024 / 1024,
+        "per_visitor_kib": (after_tabs - after_init) / tabs / 1024,
+        "total_mib": (after_tabs - before) / 1024 / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tabs", type=int, default=100, help="concurrent browser sessions (default: 100)")
+    args = parser.parse_args()
+
+    # Import and first-use costs (botocore service models, pydantic schemas)
+    # are paid once per process in both modes; do it before measuring.
+    per_tab_visit(str(uuid.uuid4()))
+
+    results = [
+        measure("per-tab", args.tabs, lambda: per_tab_visit),
+        measure("shared", args.tabs, shared_visit_factory),
+    ]
+
+    print(f"{args.tabs} concurrent tabs")
+    print(f"{'mode':<10}{'process init':>14}{'tab p50':>11}{'tab p95':>11}{'tab max':>11}"
+          f"{'shared MiB':>12}{'KiB/visitor':>13}{'total MiB':>11}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['process_init_ms']:>12.1f}ms{r['p50_ms']:>9.1f}ms{r['p95_ms']:>9.1f}ms"
+              f"{r['max_ms']:>9.1f}ms{r['process_mib']:>12.2f}{r['per_visitor_kib']:>13.1f}{r['total_mib']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Semantic response cache for ChatbotManager.
+
+Questions are embedded locally with a signed hashing vectorizer (word unigrams,
+bigrams and character trigrams) and kept in a fixed-capacity NumPy matrix, so a
+lookup is one matrix-vector product and no extra Bedrock call is made.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+GLOBAL_SCOPE = "global"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def scope_for_summary(summary: str) -> str:
+    """Return the cache scope for a conversation summary.
+
+    Answers given with no conversation context are shared by every session.
+    Once a summary exists the answer may depend on it, so entries are scoped to
+    a digest of the summary and are only reused for the exact same context.
+    """
+    summary = (summary or "").strip()
+    if not summary:
+        return GLOBAL_SCOPE
+    return "ctx:" + hashlib.sha1(summary.encode("utf-8")).hexdigest()[:16]
+
+
+class HashingEmbedder:
+    """Stateless, CPU-only text embedder based on the hashing trick."""
+
+    def __init__(self, dim: int = 512) -> None:
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dim] += sign
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    lookup_seconds: float = 0.0
+    saved_upstream_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_lookup_ms": 1000 * self.lookup_seconds / lookups if lookups else 0.0,
+            "saved_upstream_seconds": round(self.saved_upstream_seconds, 3),
+        }
+
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    scope: str
+    created: float
+    upstream_seconds: float = 0.0
+    hits: int = 0
+
+
+class SemanticCache:
+    """Fixed-capacity vector index of (question, answer) pairs.
+
+    Entries are evicted least-recently-used once ``capacity`` is reached and
+    expire after ``ttl_seconds`` (``None`` disables expiry). When ``path`` is
+    given, the index is loaded from and saved to ``<path>.npz``/``<path>.json``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        threshold: float = 0.92,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        dim: int = 512,
+        path: Optional[str] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.embedder = HashingEmbedder(dim)
+        self.stats = CacheStats()
+
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._entries: List[Optional[_Entry]] = [None] * capacity
+        self._lock = threading.Lock()
+
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._entries)
+
+    def _is_live(self, entry: Optional[_Entry], now: float) -> bool:
+        if entry is None:
+            return False
+        return self.ttl_seconds is None or now - entry.created <= self.ttl_seconds
+
+    def lookup(self, question: str, scope: str = GLOBAL_SCOPE) -> Optional[str]:
+        """Return a cached answer for a similar question in ``scope``, if any."""
+        started = time.perf_counter()
+        query = self.embedder.embed(question)
+        now = time.time()
+
+        with self._lock:
+            scores = self._vectors @ query
+            best_slot, best_score = -1, self.threshold
+            for slot in np.flatnonzero(scores >= self.threshold):
+                entry = self._entries[slot]
+                if not self._is_live(entry, now) or entry.scope != scope:
+                    continue
+                if scores[slot] >= best_score:
+                    best_slot, best_score = int(slot), float(scores[slot])
+
+            if best_slot < 0:
+                self.stats.misses += 1
+                self.stats.lookup_seconds += time.perf_counter() - started
+                return None
+
+            entry = self._entries[best_slot]
+            entry.hits += 1
+            self._last_used[best_slot] = now
+            self.stats.hits += 1
+            self.stats.saved_upstream_seconds += entry.upstream_seconds
+            self.stats.lookup_seconds += time.perf_counter() - started
+            return entry.answer
+
+    def store(
+        self,
+        question: str,
+        answer: str,
+        scope: str = GLOBAL_SCOPE,
+        upstream_seconds: float = 0.0,
+    ) -> None:
+        """Insert an answer, evicting the least recently used entry if full."""
+        vector = self.embedder.embed(question)
+        now = time.time()
+
+        with self._lock:
+            slot = self._free_slot(now)
+            self._vectors[slot] = vector
+            self._last_used[slot] = now
+            self._entries[slot] = _Entry(
+                question=question,
+                answer=answer,
+                scope=scope,
+                created=now,
+                upstream_seconds=upstream_seconds,
+            )
+            self.stats.stores += 1
+
+    def _free_slot(self, now: float) -> int:
+        for slot, entry in enumerate(self._entries):
+            if not self._is_live(entry, now):
+                if entry is not None:
+                    self.stats.evictions += 1
+                return slot
+        slot = int(np.argmin(self._last_used))
+        self.stats.evictions += 1
+        return slot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors[:] = 0.0
+            self._last_used[:] = 0.0
+            self._entries = [None] * self.capacity
+
+    def save(self) -> None:
+        """Persist the index next to ``self.path``."""
+        if not self.path:
+            return
+        with self._lock:
+            slots = [i for i, entry in enumerate(self._entries) if entry is not None]
+            meta = [self._entries[i].__dict__ for i in slots]
+            np.savez_compressed(
+                self.path + ".npz",
+                vectors=self._vectors[slots],
+                last_used=self._last_used[slots],
+            )
+            with open(self.path + ".json", "w", encoding="utf-8") as handle:
+                json.dump({"dim": self.embedder.dim, "entries": meta}, handle)
+
+    def load(self) -> None:
+        """Load a previously saved index, if one exists and is compatible."""
+        if not self.path or not os.path.exists(self.path + ".json"):
+            return
+        try:
+            with open(self.path + ".json", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            arrays = np.load(self.path + ".npz")
+        except (OSError, ValueError) as exc:
+            print(f"Ignoring unreadable semantic cache at {self.path}: {exc}")
+            return
+
+        if meta.get("dim") != self.embedder.dim:
+            print("Ignoring semantic cache saved with a different embedding size.")
+            return
+
+        entries = meta["entries"][-self.capacity:]
+        vectors = arrays["vectors"][-self.capacity:]
+        last_used = arrays["last_used"][-self.capacity:]
+        with self._lock:
+            count = len(entries)
+            self._vectors[:count] = vectors
+            self._last_used[:count] = last_used
+            for slot, data in enumerate(entries):
+                self._entries[slot] = _Entry(**data)
@@ -59,6 +59,15 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner="🔄 Initializing AI SmartBot...")
+def get_chatbot():
+    """One ChatbotManager per process, shared by all browser sessions"""
+    chatbot = initialize_chatbot()
+    if chatbot is None:
+        # Don't cache the failure; the next run retries
+        raise RuntimeError("Failed to initialize chatbot. Please check your AWS credentials.")
+    return chatbot
+
 def main():
     """Main Streamlit application"""
     
@@ -75,8 +84,12 @@ def main():
         
         # Clear chat button
         if st.button("🗑️ Clear Chat History"):
+            if 'session_id' in st.session_state:
+                try:
+                    get_chatbot().end_session(st.session_state.session_id)
+                except Exception:
+                    pass
             st.session_state.messages = []
-            st.session_state.conversation = None
             st.session_state.session_id = str(uuid.uuid4())
             st.rerun()
         
@@ -93,25 +106,15 @@ def main():
     if 'messages' not in st.session_state:
         st.session_state.messages = []
     
-    if 'conversation' not in st.session_state:
-        st.session_state.conversation = None
-
     if 'session_id' not in st.session_state:
         st.session_state.session_id = str(uuid.uuid4())
     
-    # Initialize chatbot if not already done
-    if st.session_state.conversation is None:
-        with st.spinner("🔄 Initializing AI SmartBot..."):
-            try:
-                st.session_state.conversation = initialize_chatbot()
-                if st.session_state.conversation:
-                    st.success("✅ AI SmartBot initialized successfully!")
-                else:
-                    st.error("❌ Failed to initialize chatbot. Please check your AWS credentials.")
-                    return
-            except Exception as e:
-                st.error(f"❌ Error initializing chatbot: {e}")
-                return
+    # Shared chatbot; this session's memory is keyed by session_id
+    try:
+        chatbot = get_chatbot()
+    except Exception as e:
+        st.error(f"❌ Error initializing chatbot: {e}")
+        return
     
     # Display chat messages
     for message in st.session_state.messages:
@@ -130,7 +133,7 @@ def main():
             with st.spinner("🤔 Thinking..."):
                 try:
                     response = chat_with_bot(
-                        st.session_state.conversation,
+                        chatbot,
                         st.session_state.session_id,
                         prompt,
                     )
@@ -0,0 +1,140 @@
+"""Warm-up and health probing for the Bedrock runtime connection.
+
+A probe is a cheap, model-free ``ListAsyncInvokes`` call. Any answer from the
+service - including AccessDenied for roles without that permission - proves
+DNS, TLS and credentials are good and leaves a pooled keep-alive connection
+behind; only transport or credential failures count as unreachable.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+
+def probe_bedrock(client: Any) -> float:
+    """Round-trip the Bedrock runtime endpoint and return latency in seconds."""
+    started = time.perf_counter()
+    try:
+        client.list_async_invokes(maxResults=1)
+    except ClientError:
+        pass  # The endpoint answered; that is all a probe needs.
+    return time.perf_counter() - started
+
+
+class HealthMonitor:
+    """Tracks readiness and the most recent upstream latency.
+
+    ``check`` re-probes at most every ``max_age`` seconds so frequent load
+    balancer polls do not turn into a stream of Bedrock requests.
+    """
+
+    def __init__(self, client: Any, max_age: float = 10.0, degraded_after: float = 2.0) -> None:
+        self.client = client
+        self.max_age = max_age
+        self.degraded_after = degraded_after
+        self.warm = False
+        self.warmup_seconds: Optional[float] = None
+        self._last: Optional[Dict[str, Any]] = None
+        self._last_checked = 0.0
+        self._lock = threading.Lock()
+
+    def warm_up(self, connections: int = 2, prime: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Open ``connections`` pooled connections and optionally run ``prime``."""
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=connections) as pool:
+                list(pool.map(lambda _: probe_bedrock(self.client), range(connections)))
+            if prime is not None:
+                prime()
+        except Exception as exc:
+            print(f"Bedrock warm-up failed: {exc}")
+            return self._record(None, error=str(exc))
+
+        self.warmup_seconds = time.perf_counter() - started
+        self.warm = True
+        return self.check(force=True)
+
+    def check(self, force: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            if not force and self._last and time.monotonic() - self._last_checked < self.max_age:
+                return self._last
+        try:
+            latency = probe_bedrock(self.client)
+        except (BotoCoreError, ClientError, Exception) as exc:
+            # Anything a probe raises means "not ready", never a crashed check.
+            return self._record(None, error=f"{type(exc).__name__}: {exc}")
+        return self._record(latency)
+
+    def _record(self, latency: Optional[float], error: Optional[str] = None) -> Dict[str, Any]:
+        if latency is None:
+            status = "unavailable"
+        elif not self.warm:
+            status = "cold"
+        elif latency > self.degraded_after:
+            status = "degraded"
+        else:
+            status = "ready"
+
+        result: Dict[str, Any] = {
+            "status": status,
+            "warm": self.warm,
+            "upstream_latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "warmup_ms": round(self.warmup_seconds * 1000, 1) if self.warmup_seconds else None,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if error:
+            result["error"] = error
+        with self._lock:
+            self._last = result
+            self._last_checked = time.monotonic()
+        return result
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def serve_health(chatbot: Any, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose ``GET /health`` (200 only when ready) and ``GET /metrics``.
+
+    Only one server runs per process; calling again points it at ``chatbot``.
+    """
+    global _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            bot = self.server.chatbot  # type: ignore[attr-defined]
+            if self.path.startswith("/health"):
+                try:
+                    body = bot.health()
+                except Exception as exc:
+                    body = {"status": "unavailable", "error": f"{type(exc).__name__}: {exc}"}
+                code = 200 if body["status"] == "ready" else 503
+            elif self.path.startswith("/metrics"):
+                body, code = bot.stats(), 200
+            else:
+                body, code = {"error": "not found"}, 404
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="health-server", daemon=True).start()
+        _server.chatbot = chatbot  # type: ignore[attr-defined]
+        return _server
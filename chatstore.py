@@ -0,0 +1,194 @@
+"""Persistent conversation memory backends for ChatbotManager.
+
+Only the rolling summary and the recent message buffer of a session are
+stored, so a session can be restored on any replica with a single key lookup.
+Every write is conditional on the version that was read, so two replicas
+serving the same session cannot overwrite each other's turns.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class SessionState:
+    """Serializable part of a ConversationSummaryBufferMemory."""
+
+    summary: str = ""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    version: int = 0  # incremented by every save; 0 for a new session
+
+
+class VersionConflict(Exception):
+    """The stored session changed since the version the writer read."""
+
+
+class MemoryBackend(ABC):
+    """Interface for session memory persistence.
+
+    A backend missing one of the methods fails when it is created, not in
+    the middle of a chat turn.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[SessionState]:
+        """Return the stored state, or None for an unknown session."""
+
+    @abstractmethod
+    def save(self, session_id: str, messages: List[Dict[str, Any]], summary: Optional[str] = None,
+             expected_version: int = 0) -> int:
+        """Write the message buffer, and the summary only when it changed (``summary`` not None).
+
+        The write only happens if the stored version is still ``expected_version``
+        (0: the session was never saved). Returns the new version; raises
+        VersionConflict otherwise.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Forget a session."""
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """Single-file backend for local development and single-host deployments."""
+
+    def __init__(self, path: str = "smartbot_memory.db") -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_memory ("
+                "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', "
+                "buffer TEXT NOT NULL DEFAULT '[]', updated REAL NOT NULL, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chat_memory)")}
+            if "version" not in columns:  # databases created before versioning
+                self._conn.execute("ALTER TABLE chat_memory ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, buffer, version FROM chat_memory WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return SessionState(summary=row[0], messages=json.loads(row[1]), version=row[2])
+
+    def save(self, session_id: str, messages: List[Dict[str, Any]], summary: Optional[str] = None,
+             expected_version: int = 0) -> int:
+        buffer = json.dumps(messages)
+        version = expected_version + 1
+        # Each statement is atomic, also for other processes sharing the file
+        with self._lock, self._conn:
+            if summary is None:
+                updated = self._conn.execute(
+                    "UPDATE chat_memory SET buffer = ?, updated = ?, version = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (buffer, time.time(), version, session_id, expected_version),
+                ).rowcount
+            else:
+                updated = self._conn.execute(
+                    "UPDATE chat_memory SET summary = ?, buffer = ?, updated = ?, version = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (summary, buffer, time.time(), version, session_id, expected_version),
+                ).rowcount
+            if not updated and expected_version == 0:
+                updated = self._conn.execute(
+                    "INSERT OR IGNORE INTO chat_memory (session_id, summary, buffer, updated, version) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, summary or "", buffer, time.time(), version),
+                ).rowcount
+        if not updated:
+            raise VersionConflict(f"Session {session_id} changed since version {expected_version}")
+        return version
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chat_memory WHERE session_id = ?", (session_id,))
+
+
+class DynamoDBMemoryBackend(MemoryBackend):
+    """Shared backend so every replica sees the same sessions.
+
+    Expects a table with a string partition key named ``sessionId``.
+    """
+
+    def __init__(self, table_name: str, region_name: Optional[str] = None) -> None:
+        import boto3
+
+        self.table = boto3.resource("dynamodb", region_name=region_name).Table(table_name)
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        # Strongly consistent, so a turn always sees the previous turn's write
+        item = self.table.get_item(
+            Key={"sessionId": session_id},
+            ProjectionExpression="#summary, #buffer, #version",
+            ExpressionAttributeNames={"#summary": "summary", "#buffer": "buffer", "#version": "version"},
+            ConsistentRead=True,
+        ).get("Item")
+        if item is None:
+            return None
+        return SessionState(
+            summary=item.get("summary", ""),
+            messages=json.loads(item.get("buffer", "[]")),
+            version=int(item.get("version", 0)),
+        )
+
+    def save(self, session_id: str, messages: List[Dict[str, Any]], summary: Optional[str] = None,
+             expected_version: int = 0) -> int:
+        from botocore.exceptions import ClientError
+
+        version = expected_version + 1
+        expression = "SET #buffer = :buffer, #updated = :updated, #version = :version"
+        names = {"#buffer": "buffer", "#updated": "updated", "#version": "version"}
+        values: Dict[str, Any] = {
+            ":buffer": json.dumps(messages),
+            ":updated": int(time.time()),
+            ":version": version,
+            ":expected": expected_version,
+        }
+        if summary is not None:
+            expression += ", #summary = :summary"
+            names["#summary"] = "summary"
+            values[":summary"] = summary
+        # Items written before versioning have no version attribute
+        condition = "#version = :expected"
+        if expected_version == 0:
+            condition = "attribute_not_exists(#version) OR " + condition
+        try:
+            self.table.update_item(
+                Key={"sessionId": session_id},
+                UpdateExpression=expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+        except ClientError as exc:
+            if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise VersionConflict(f"Session {session_id} changed since version {expected_version}") from exc
+        return version
+
+    def delete(self, session_id: str) -> None:
+        self.table.delete_item(Key={"sessionId": session_id})
+
+
+def backend_from_url(url: str) -> MemoryBackend:
+    """Build a backend from ``sqlite:///path/to.db`` or ``dynamodb://table?region=...``."""
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # Same convention as SQLAlchemy: sqlite:///relative.db, sqlite:////abs.db
+        return SQLiteMemoryBackend(parsed.path[1:] or "smartbot_memory.db")
+    if parsed.scheme == "dynamodb":
+        region = parse_qs(parsed.query).get("region", [None])[0]
+        return DynamoDBMemoryBackend(parsed.netloc, region_name=region)
+    raise ValueError(f"Unsupported memory backend URL: {url}")
@@ -0,0 +1,213 @@
+"""Deferred, micro-batched summarization for ConversationSummaryBufferMemory.
+
+With the stock memory, every session whose buffer overflows makes its own
+blocking summarization call inside ``save_context``. ``DeferredSummaryMemory``
+instead hands the pruned messages to a shared ``SummaryScheduler``, which
+coalesces jobs per session and runs them with bounded concurrency, earliest
+deadline first. Until a job finishes, the pruned messages stay visible to the
+model as part of the history, so no context is lost in the meantime.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.messages import BaseMessage, get_buffer_string
+
+
+class DeferredSummaryMemory(ConversationSummaryBufferMemory):
+    """Summary buffer memory whose summarization runs on a SummaryScheduler."""
+
+    scheduler: Any = None
+    session_id: str = ""
+    pending_messages: List[BaseMessage] = []
+
+    def prune(self) -> None:
+        buffer = self.chat_memory.messages
+        curr_buffer_length = self.llm.get_num_tokens_from_messages(buffer)
+        if curr_buffer_length <= self.max_token_limit:
+            return
+
+        pruned: List[BaseMessage] = []
+        while buffer and curr_buffer_length > self.max_token_limit:
+            pruned.append(buffer.pop(0))
+            curr_buffer_length = self.llm.get_num_tokens_from_messages(buffer)
+        self.scheduler.submit(self, pruned)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.pending_messages:
+            return super().load_memory_variables(inputs)
+
+        buffer = list(self.pending_messages) + self.chat_memory.messages
+        if self.moving_summary_buffer:
+            buffer = [self.summary_message_cls(content=self.moving_summary_buffer)] + buffer
+        if self.return_messages:
+            return {self.memory_key: buffer}
+        return {
+            self.memory_key: get_buffer_string(
+                buffer, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+            )
+        }
+
+
+@dataclass
+class _Job:
+    memory: DeferredSummaryMemory
+    submitted: float
+    deadline: float
+    context: contextvars.Context
+    done: Future = field(default_factory=Future)
+
+
+class SummaryScheduler:
+    """Collects summarization jobs across sessions and runs them in batches.
+
+    Jobs wait up to ``batch_window`` seconds so that bursts are dispatched
+    together, but never past their ``deadline`` (seconds after submission).
+    At most ``max_concurrency`` summarization calls are in flight at once.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        batch_window: float = 0.5,
+        deadline: float = 5.0,
+        on_complete: Optional[Callable[[str, DeferredSummaryMemory], None]] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.batch_window = batch_window
+        self.deadline = deadline
+        self.on_complete = on_complete
+        self.stats = {"submitted": 0, "coalesced": 0, "batches": 0, "completed": 0, "failed": 0}
+
+        self._queued: Dict[str, _Job] = {}
+        self._running: Dict[str, _Job] = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="summary")
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="summary-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def submit(
+        self,
+        memory: DeferredSummaryMemory,
+        messages: List[BaseMessage],
+        deadline: Optional[float] = None,
+    ) -> Future:
+        """Queue ``messages`` to be folded into ``memory``'s summary."""
+        now = time.monotonic()
+        due = now + (self.deadline if deadline is None else deadline)
+        with self._cond:
+            memory.pending_messages.extend(messages)
+            self.stats["submitted"] += 1
+            job = self._queued.get(memory.session_id)
+            if job is not None:
+                job.deadline = min(job.deadline, due)
+                self.stats["coalesced"] += 1
+                self._cond.notify()
+                return job.done
+
+            job = _Job(
+                memory=memory,
+                submitted=now,
+                deadline=due,
+                context=contextvars.copy_context(),
+            )
+            self._queued[memory.session_id] = job
+            self._cond.notify()
+            return job.done
+
+    def flush(self, session_id: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """Dispatch queued jobs now (one session or all) and wait for them."""
+        with self._cond:
+            ids = [session_id] if session_id is not None else list(self._queued)
+            waits = []
+            for sid in ids:
+                for jobs in (self._queued, self._running):
+                    if sid in jobs:
+                        waits.append(jobs[sid].done)
+                if sid in self._queued:
+                    self._queued[sid].deadline = 0.0
+            self._cond.notify()
+        for done in waits:
+            done.exception(timeout=timeout)
+
+    def shutdown(self) -> None:
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not self._ready_jobs():
+                    self._cond.wait(timeout=self._next_wakeup())
+                if self._closed:
+                    return
+
+                batch = self._ready_jobs()[: self.max_concurrency - len(self._running)]
+                for job in batch:
+                    sid = job.memory.session_id
+                    del self._queued[sid]
+                    self._running[sid] = job
+                self.stats["batches"] += 1
+
+            for job in batch:
+                self._executor.submit(job.context.run, self._run, job)
+
+    def _startable(self) -> List[_Job]:
+        # A session's next job waits for its running one to finish.
+        if len(self._running) >= self.max_concurrency:
+            return []
+        return [job for sid, job in self._queued.items() if sid not in self._running]
+
+    def _due(self, job: _Job) -> float:
+        return min(job.deadline, job.submitted + self.batch_window)
+
+    def _ready_jobs(self) -> List[_Job]:
+        """Queued jobs that may start now, earliest deadline first."""
+        now = time.monotonic()
+        ready = [job for job in self._startable() if self._due(job) <= now]
+        return sorted(ready, key=lambda job: job.deadline)
+
+    def _next_wakeup(self) -> Optional[float]:
+        # Otherwise sleep until a submit, flush or finished job notifies us.
+        jobs = self._startable()
+        if not jobs:
+            return None
+        return max(0.0, min(self._due(job) for job in jobs) - time.monotonic())
+
+    def _run(self, job: _Job) -> None:
+        memory = job.memory
+        with self._cond:
+            # Everything pending at start, including messages from coalesced
+            # submissions and from earlier failed attempts.
+            messages = list(memory.pending_messages)
+        try:
+            summary = memory.predict_new_summary(messages, memory.moving_summary_buffer)
+            with self._cond:
+                memory.moving_summary_buffer = summary
+                del memory.pending_messages[: len(messages)]
+                self.stats["completed"] += 1
+            if self.on_complete is not None:
+                self.on_complete(memory.session_id, memory)
+            job.done.set_result(summary)
+        except Exception as exc:
+            # Leave the messages pending: they stay in the prompt verbatim and
+            # are retried with the session's next job.
+            print(f"Summarization failed for session {memory.session_id}: {exc}")
+            with self._cond:
+                self.stats["failed"] += 1
+            job.done.set_exception(exc)
+        finally:
+            with self._cond:
+                self._running.pop(memory.session_id, None)
+                self._cond.notify()
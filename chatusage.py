@@ -0,0 +1,160 @@
+"""Token accounting and budget enforcement for ChatbotManager.
+
+``TokenMeter`` is attached to the Bedrock LLM as a callback, so it sees every
+call made through it - chat turns and the summarization calls issued by
+ConversationSummaryBufferMemory alike - and attributes usage to the session
+that is active in the calling context.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+_current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "smartbot_session", default=None
+)
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a session or the whole process has used up its token budget."""
+
+
+@dataclass
+class TokenBudget:
+    """Token limits; ``None`` disables a limit.
+
+    Past ``soft_ratio`` of a limit, responses and the memory buffer are shrunk
+    in proportion to the remaining budget; at the limit requests are rejected.
+    ``window_seconds`` resets the global budget periodically (e.g. daily).
+    """
+
+    session_limit: Optional[int] = None
+    global_limit: Optional[int] = None
+    soft_ratio: float = 0.8
+    window_seconds: Optional[float] = 24 * 3600
+    min_output_tokens: int = 128
+    min_memory_tokens: int = 300
+
+
+@dataclass
+class UsageCounter:
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, input_tokens: int, output_tokens: int) -> None:
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {**asdict(self), "total_tokens": self.total_tokens}
+
+
+def usage_from_result(response: LLMResult) -> Optional[tuple]:
+    """Extract (input_tokens, output_tokens) from a Bedrock LLM result."""
+    usage = (response.llm_output or {}).get("usage")
+    if usage:
+        return int(usage.get("prompt_tokens", 0)), int(usage.get("completion_tokens", 0))
+
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                return int(metadata.get("input_tokens", 0)), int(metadata.get("output_tokens", 0))
+    return None
+
+
+class TokenMeter(BaseCallbackHandler):
+    """Per-session and global token counters with optional budgets."""
+
+    def __init__(self, budget: Optional[TokenBudget] = None) -> None:
+        self.budget = budget or TokenBudget()
+        self.global_usage = UsageCounter()
+        self.session_usage: Dict[str, UsageCounter] = {}
+        self.rejected = 0
+        self._window_usage = 0
+        self._window_started = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[None]:
+        """Attribute LLM calls made inside the block to ``session_id``."""
+        token = _current_session.set(session_id)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = usage_from_result(response)
+        if usage is None:
+            return
+        self.record(_current_session.get(), *usage)
+
+    def record(self, session_id: Optional[str], input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self._roll_window()
+            self.global_usage.add(input_tokens, output_tokens)
+            self._window_usage += input_tokens + output_tokens
+            if session_id is not None:
+                counter = self.session_usage.setdefault(session_id, UsageCounter())
+                counter.add(input_tokens, output_tokens)
+
+    def _roll_window(self) -> None:
+        window = self.budget.window_seconds
+        if window and time.time() - self._window_started >= window:
+            self._window_started = time.time()
+            self._window_usage = 0
+
+    def _pressure(self, session_id: str) -> float:
+        """Highest fraction of any applicable budget already used."""
+        pressure = 0.0
+        if self.budget.session_limit:
+            used = self.session_usage.get(session_id, UsageCounter()).total_tokens
+            pressure = max(pressure, used / self.budget.session_limit)
+        if self.budget.global_limit:
+            pressure = max(pressure, self._window_usage / self.budget.global_limit)
+        return pressure
+
+    def check(self, session_id: str) -> float:
+        """Return the budget pressure for a new turn, or raise if exhausted."""
+        with self._lock:
+            self._roll_window()
+            pressure = self._pressure(session_id)
+            if pressure >= 1.0:
+                self.rejected += 1
+                raise TokenBudgetExceeded(
+                    "Token budget exhausted for this session. Please start a new chat later."
+                )
+            return pressure
+
+    def scaled(self, value: int, pressure: float, floor: int) -> int:
+        """Shrink ``value`` linearly from the soft threshold down to ``floor``."""
+        soft = self.budget.soft_ratio
+        if pressure < soft:
+            return value
+        remaining = max(0.0, (1.0 - pressure) / (1.0 - soft))
+        return max(floor, int(value * remaining))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "global": self.global_usage.as_dict(),
+                "window_tokens": self._window_usage,
+                "rejected_requests": self.rejected,
+                "budget": asdict(self.budget),
+                "sessions": {sid: c.as_dict() for sid, c in self.session_usage.items()},
+            }
@@ -0,0 +1,226 @@
+"""
+Pooled HTTP client for the Payment Smart Bot API.
+
+One client is shared by every Streamlit session in the process, so chat turns
+reuse keep-alive connections to API Gateway instead of paying a new TCP + TLS
+handshake each time. Connection setup is timed so the UI can report how much
+handshake time reuse saves per turn.
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError, ResponseError
+from urllib3.util.retry import Retry
+
+# Timeouts (seconds): fail fast on connect, allow for Bedrock + Stripe on read
+CONNECT_TIMEOUT = float(os.getenv("PAYMENT_BOT_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("PAYMENT_BOT_READ_TIMEOUT", "30"))
+POOL_SIZE = int(os.getenv("PAYMENT_BOT_POOL_SIZE", "20"))
+MAX_RETRIES = int(os.getenv("PAYMENT_BOT_MAX_RETRIES", "2"))
+# Longest a turn may take, retries and their waits included
+TOTAL_TIMEOUT = float(os.getenv("PAYMENT_BOT_TOTAL_TIMEOUT", "40"))
+
+
+class ConnectionStats:
+    """Process-wide counters for requests and new connections."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def begin_turn(self):
+        self._local.connect_seconds = 0.0
+        self._local.connections = 0
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += seconds
+        self._local.connect_seconds = getattr(self._local, 'connect_seconds', 0.0) + seconds
+        self._local.connections = getattr(self._local, 'connections', 0) + 1
+
+    def end_turn(self) -> Dict[str, Any]:
+        """Close out a turn and describe its connection cost."""
+        with self._lock:
+            self.requests += 1
+        connect_ms = getattr(self._local, 'connect_seconds', 0.0) * 1000
+        reused = getattr(self._local, 'connections', 0) == 0
+        return {
+            'reused_connection': reused,
+            'connect_ms': round(connect_ms, 1),
+            'saved_ms': round(self.avg_connect_ms, 1) if reused else 0.0,
+        }
+
+    @property
+    def avg_connect_ms(self) -> float:
+        return 1000 * self.connect_seconds / self.connections if self.connections else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        reused = max(0, self.requests - self.connections)
+        return {
+            'requests': self.requests,
+            'connections_opened': self.connections,
+            'reused_requests': reused,
+            'avg_connect_ms': round(self.avg_connect_ms, 1),
+            'total_saved_ms': round(reused * self.avg_connect_ms, 1),
+        }
+
+
+CONNECTION_STATS = ConnectionStats()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        CONNECTION_STATS.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        CONNECTION_STATS.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time every new connection (TCP + TLS)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+_deadline = threading.local()
+
+
+class _DeadlineRetry(Retry):
+    """Retry that only tries again if a full attempt still fits the turn's
+    TOTAL_TIMEOUT, counting the backoff or Retry-After wait before it.
+
+    The deadline is kept per thread: urllib3 runs a request, retries
+    included, in the calling thread. A read timeout that is not retried is
+    raised as is, so callers still get requests' ReadTimeout.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        try:
+            retry = super().increment(method, url, response, error, _pool, _stacktrace)
+            deadline = getattr(_deadline, 'value', None)
+            if deadline is not None:
+                wait = retry.get_retry_after(response) if response is not None else None
+                if wait is None:
+                    wait = retry.get_backoff_time()
+                if time.monotonic() + wait + CONNECT_TIMEOUT + READ_TIMEOUT > deadline:
+                    raise MaxRetryError(_pool, url, error or ResponseError("retry would exceed the total timeout"))
+        except MaxRetryError:
+            if isinstance(error, ReadTimeoutError):
+                raise error
+            raise
+        return retry
+
+
+class PaymentBotClient:
+    """Keep-alive session with split timeouts and idempotent retries.
+
+    Every turn carries an ``Idempotency-Key`` header that stays the same across
+    retries, so a retried POST cannot be processed twice by the backend; that
+    is what makes retrying a read error (the turn may have been processed)
+    safe. Retries stop once another attempt would take the turn past
+    TOTAL_TIMEOUT.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES):
+        retry = _DeadlineRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=1,  # safe: the backend replays or rejects a repeated key
+            status=max_retries,
+            status_forcelist=(409, 429, 502, 503, 504),  # 409: same key still in progress
+            allowed_methods=frozenset({'POST'}),
+            backoff_factor=0.3,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.stats = CONNECTION_STATS
+
+    def post_message(self, endpoint: str, session_id: str, message: str,
+                     idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send one chat turn.
+
+        Returns:
+            Parsed JSON body, with connection timing under ``_connection``
+
+        Raises:
+            requests.exceptions.RequestException or ValueError (invalid JSON)
+        """
+        self.stats.begin_turn()
+        _deadline.value = time.monotonic() + TOTAL_TIMEOUT
+        try:
+            response = self.session.post(
+                endpoint,
+                json={'sessionId': session_id, 'message': message},
+                headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())},
+                timeout=self.timeout,
+            )
+        finally:
+            _deadline.value = None
+        turn = self.stats.end_turn()
+        response.raise_for_status()
+        body = response.json()
+        if isinstance(body, dict):
+            body['_connection'] = turn
+        return body
+
+    def get_status(self, endpoint: str, session_id: str) -> Dict[str, Any]:
+        """
+        Fetch the session's status and last reply without sending a turn
+        (read-only, so no Idempotency-Key).
+
+        Returns:
+            Parsed JSON body
+
+        Raises:
+            requests.exceptions.RequestException or ValueError (invalid JSON)
+        """
+        _deadline.value = time.monotonic() + TOTAL_TIMEOUT
+        try:
+            response = self.session.post(
+                endpoint,
+                json={'sessionId': session_id, 'action': 'status'},
+                timeout=self.timeout,
+            )
+        finally:
+            _deadline.value = None
+        response.raise_for_status()
+        return response.json()
@@ -15,10 +15,15 @@ import streamlit as st
 import requests
 import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
+import time
+from pathlib import Path
 from typing import Dict, Optional
 
+from api_client import PaymentBotClient
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="💳 Payment Smart Bot",
@@ -32,269 +37,16 @@ st.set_page_config(
     }
 )
 
-# Custom CSS for professional payment interface
-st.markdown("""
-<style>
-/* Main app styling */
-.stApp {
-    max-width: 1400px;
-    margin: 0 auto;
-}
-
-/* Security banner */
-.security-banner {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    color: white;
-    padding: 1rem;
-    border-radius: 10px;
-    margin-bottom: 1rem;
-    display: flex;
-    align-items: center;
-    gap: 1rem;
-}
-
-/* Chat container */
-.chat-container {
-    background-color: #f8f9fa;
-    border-radius: 15px;
-    padding: 2rem;
-    margin-bottom: 1rem;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-}
-
-/* Message bubbles */
-.chat-message {
-    padding: 1.2rem;
-    border-radius: 15px;
-    margin-bottom: 1rem;
-    display: flex;
-    align-items: flex-start;
-    animation: slideIn 0.3s ease-out;
-}
-
-@keyframes slideIn {
-    from {
-        opacity: 0;
-        transform: translateY(10px);
-    }
-    to {
-        opacity: 1;
-        transform: translateY(0);
-    }
-}
-
-.chat-message.user {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    color: white;
-    flex-direction: row-reverse;
-    margin-left: 20%;
-}
-
-.chat-message.bot {
-    background-color: white;
-    color: #2d3748;
-    border: 1px solid #e2e8f0;
-    margin-right: 20%;
-}
-
-.chat-message .avatar {
-    width: 45px;
-    height: 45px;
-    border-radius: 50%;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    font-size: 1.5rem;
-    flex-shrink: 0;
-    margin: 0 1rem;
-}
-
-.user .avatar {
-    background-color: rgba(255, 255, 255, 0.2);
-}
-
-.bot .avatar {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-}
-
-.chat-message .message {
-    flex: 1;
-    padding: 0.5rem;
-    line-height: 1.6;
-}
-
-/* Status indicators */
-.status-indicator {
-    display: inline-flex;
-    align-items: center;
-    gap: 0.5rem;
-    padding: 0.5rem 1rem;
-    border-radius: 20px;
-    font-size: 0.9rem;
-    font-weight: 600;
-    margin: 0.5rem 0;
-}
-
-.status-collecting {
-    background-color: #fef3c7;
-    color: #92400e;
-}
-
-.status-confirming {
-    background-color: #dbeafe;
-    color: #1e40af;
-}
-
-.status-completed {
-    background-color: #d1fae5;
-    color: #065f46;
-}
-
-.status-error {
-    background-color: #fee2e2;
-    color: #991b1b;
-}
-
-/* Security features */
-.security-feature {
-    display: flex;
-    align-items: center;
-    gap: 0.8rem;
-    padding: 0.8rem;
-    background-color: #f0fdf4;
-    border-left: 4px solid #10b981;
-    border-radius: 8px;
-    margin-bottom: 0.8rem;
-}
-
-.security-icon {
-    font-size: 1.5rem;
-    color: #10b981;
-}
-
-/* PCI Compliance badge */
-.pci-badge {
-    background: white;
-    border: 2px solid #10b981;
-    border-radius: 10px;
-    padding: 1rem;
-    text-align: center;
-    margin: 1rem 0;
-}
-
-.pci-badge h3 {
-    color: #10b981;
-    margin: 0;
-    font-size: 1.2rem;
-}
-
-/* Payment info card */
-.payment-info {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    color: white;
-    padding: 1.5rem;
-    border-radius: 15px;
-    margin: 1rem 0;
-}
-
-.payment-info h4 {
-    margin-top: 0;
-    display: flex;
-    align-items: center;
-    gap: 0.5rem;
-}
-
-/* Progress bar */
-.progress-container {
-    background-color: #e2e8f0;
-    border-radius: 10px;
-    height: 8px;
-    margin: 1rem 0;
-    overflow: hidden;
-}
-
-.progress-bar {
-    height: 100%;
-    background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-    transition: width 0.3s ease;
-}
-
-/* Info boxes */
-.info-box {
-    background-color: #f0f9ff;
-    border-left: 4px solid #3b82f6;
-    padding: 1rem;
-    border-radius: 8px;
-    margin: 1rem 0;
-}
-
-.warning-box {
-    background-color: #fffbeb;
-    border-left: 4px solid #f59e0b;
-    padding: 1rem;
-    border-radius: 8px;
-    margin: 1rem 0;
-}
-
-/* Footer */
-.footer {
-    text-align: center;
-    padding: 2rem;
-    color: #718096;
-    border-top: 1px solid #e2e8f0;
-    margin-top: 3rem;
-}
-
-/* Stripe branding */
-.powered-by-stripe {
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    gap: 0.5rem;
-    margin: 1rem 0;
-    color: #635bff;
-    font-weight: 600;
-}
-
-/* Quick actions */
-.quick-action {
-    background-color: white;
-    border: 2px solid #e2e8f0;
-    border-radius: 10px;
-    padding: 1rem;
-    margin: 0.5rem 0;
-    cursor: pointer;
-    transition: all 0.2s;
-}
-
-.quick-action:hover {
-    border-color: #667eea;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(102, 126, 234, 0.15);
-}
-
-/* Metric cards */
-.metric-card {
-    background: white;
-    border-radius: 12px;
-    padding: 1.5rem;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-    text-align: center;
-}
-
-.metric-value {
-    font-size: 2rem;
-    font-weight: bold;
-    color: #667eea;
-}
-
-.metric-label {
-    color: #718096;
-    font-size: 0.9rem;
-    margin-top: 0.5rem;
-}
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for professional payment interface (styles.css)
+@st.cache_resource
+def load_styles() -> str:
+    """Read the stylesheet once per server process."""
+    return (Path(__file__).parent / "styles.css").read_text(encoding="utf-8")
+
+# Style-only HTML goes to the event container: it takes no space in the
+# layout, and fragment reruns (the chat panel) leave it in place. A full
+# rerun has to send it again or the browser drops the styles.
+st.html(f"<style>{load_styles()}</style>")
 
 # Configuration
 API_ENDPOINT = os.getenv("PAYMENT_BOT_API_ENDPOINT", "")
@@ -318,44 +70,75 @@ if 'api_endpoint' not in st.session_state:
 if 'test_mode' not in st.session_state:
     st.session_state.test_mode = True
 
+if 'last_connection' not in st.session_state:
+    st.session_state.last_connection = None
+
+# Number of most recent messages drawn; older ones load on demand
+HISTORY_WINDOW = 30
+
+if 'history_window' not in st.session_state:
+    st.session_state.history_window = HISTORY_WINDOW
+
+# In-flight request: {"future", "message", "session_id", "submitted"} or None
+if 'pending' not in st.session_state:
+    st.session_state.pending = None
+
+if 'status_checked' not in st.session_state:
+    st.session_state.status_checked = 0.0
+
+if 'last_error' not in st.session_state:
+    st.session_state.last_error = None
+
+# Background API calls: worker threads per process and reply poll interval (s)
+SUBMIT_WORKERS = int(os.getenv("PAYMENT_BOT_SUBMIT_WORKERS", "32"))
+POLL_INTERVAL = float(os.getenv("PAYMENT_BOT_POLL_INTERVAL", "0.5"))
+# Status checks while a queued payment is processing (s)
+STATUS_POLL_INTERVAL = float(os.getenv("PAYMENT_BOT_STATUS_POLL_INTERVAL", "2"))
+
 # Helper Functions
-def send_message(message: str) -> Optional[Dict]:
-    """Send message to Payment Smart Bot API"""
-    if not st.session_state.api_endpoint:
-        st.error("⚠️ API endpoint not configured. Please enter it in the sidebar.")
-        return None
+@st.cache_resource
+def get_api_client() -> PaymentBotClient:
+    """Per-process pooled HTTP client shared by all browser sessions"""
+    return PaymentBotClient()
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Per-process worker pool for in-flight API calls"""
+    return ThreadPoolExecutor(max_workers=SUBMIT_WORKERS, thread_name_prefix="payment-bot-api")
+
+def send_message(client: PaymentBotClient, endpoint: str, session_id: str,
+                 message: str, idempotency_key: str) -> Dict:
+    """Send message to Payment Smart Bot API
     
+    Runs on a worker thread, so it must not touch st.* APIs. Returns either
+    {"body": <response json>} or {"error": <message for the user>}.
+    """
     try:
-        payload = {
-            "sessionId": st.session_state.session_id,
-            "message": message
-        }
-        
-        response = requests.post(
-            st.session_state.api_endpoint,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        
-        response.raise_for_status()
-        return response.json()
+        body = client.post_message(endpoint, session_id, message, idempotency_key=idempotency_key)
+        return {"body": body}
     
     except requests.exceptions.Timeout:
-        st.error("⏱️ Request timed out. Please try again.")
-        return None
+        return {"error": "⏱️ Request timed out. Please try again."}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"❌ API Error: {str(e)}"}
+    except json.JSONDecodeError:
+        return {"error": "❌ Invalid response from server"}
+
+def check_status(client: PaymentBotClient, endpoint: str, session_id: str) -> Dict:
+    """Fetch the session status (worker thread, same result shape as send_message)"""
+    try:
+        return {"body": client.get_status(endpoint, session_id)}
     except requests.exceptions.RequestException as e:
-        st.error(f"❌ API Error: {str(e)}")
-        return None
+        return {"error": f"❌ API Error: {str(e)}"}
     except json.JSONDecodeError:
-        st.error("❌ Invalid response from server")
-        return None
+        return {"error": "❌ Invalid response from server"}
 
 def get_status_badge(status: str) -> str:
     """Get HTML for status badge"""
     status_config = {
         'collecting': ('📝', 'Collecting Information', 'status-collecting'),
         'confirming': ('🔍', 'Confirming Details', 'status-confirming'),
+        'processing': ('⏳', 'Processing Payment', 'status-processing'),
         'completed': ('✅', 'Payment Complete', 'status-completed'),
         'error': ('❌', 'Error', 'status-error')
     }
@@ -393,17 +176,284 @@ def display_security_banner():
     </div>
     """, unsafe_allow_html=True)
 
-def display_message(role: str, content: str):
-    """Display a chat message with proper styling"""
+def message_html(role: str, content: str) -> str:
+    """Build the HTML for a chat message with proper styling"""
     avatar = "👤" if role == "user" else "🤖"
     css_class = "user" if role == "user" else "bot"
     
-    st.markdown(f"""
+    return f"""
     <div class="chat-message {css_class}">
         <div class="avatar">{avatar}</div>
         <div class="message">{content}</div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+def add_message(role: str, content: str):
+    """Append a message to the history, rendering its HTML once"""
+    st.session_state.messages.append({
+        "role": role,
+        "content": content,
+        "timestamp": datetime.now(),
+        "html": message_html(role, content)
+    })
+
+def show_earlier_messages():
+    """Widen the history window (button callback, runs before the rerun)"""
+    st.session_state.history_window += HISTORY_WINDOW
+
+def display_messages():
+    """Display the most recent messages as a single element
+    
+    Only the last `history_window` messages are drawn, so render cost stays
+    flat however long the session gets. Older messages load on demand.
+    """
+    messages = st.session_state.messages
+    window = st.session_state.history_window
+    hidden = len(messages) - window
+    
+    st.markdown(f"### 💬 Conversation ({len(messages)} messages)")
+    if hidden > 0:
+        st.button(
+            f"⬆️ Show {min(hidden, HISTORY_WINDOW)} earlier messages",
+            key="show_earlier",
+            on_click=show_earlier_messages
+        )
+    
+    st.markdown(
+        "".join(msg.get("html") or message_html(msg["role"], msg["content"]) for msg in messages[-window:]),
+        unsafe_allow_html=True
+    )
+
+def submit_message(message: str) -> bool:
+    """Show the user message immediately and send it in the background
+    
+    Returns False (and sends nothing) while another reply is still pending,
+    so double clicks and repeated submits never create duplicate API calls.
+    """
+    if st.session_state.pending is not None and not st.session_state.pending.get("status_check"):
+        st.toast("⏳ Please wait for the current reply.")
+        return False
+    
+    if not st.session_state.api_endpoint:
+        st.session_state.last_error = "⚠️ API endpoint not configured. Please enter it in the sidebar."
+        return False
+    
+    add_message("user", message)
+    st.session_state.conversation_started = True
+    st.session_state.pending = {
+        "future": get_executor().submit(
+            send_message,
+            get_api_client(),
+            st.session_state.api_endpoint,
+            st.session_state.session_id,
+            message,
+            str(uuid.uuid4())
+        ),
+        "message": message,
+        "session_id": st.session_state.session_id,
+        "submitted": time.monotonic()
+    }
+    return True
+
+def submit_chat_input():
+    """chat_input callback"""
+    if st.session_state.chat_input:
+        submit_message(st.session_state.chat_input)
+
+def cancel_pending():
+    """Cancel the in-flight turn (button callback)
+    
+    A request that has not started is dropped. One already sent cannot be
+    recalled: the input stays disabled until it settles, so the next turn
+    never races it on the session, and collect_reply() reports the outcome.
+    """
+    pending = st.session_state.pending
+    if pending is None or pending.get("cancelled"):
+        return
+    
+    if pending["future"].cancel():
+        st.session_state.pending = None
+        add_message("assistant", "⏹️ Cancelled before sending.")
+    else:
+        pending["cancelled"] = True
+
+def collect_reply() -> bool:
+    """Record the pending reply if it has arrived. Returns True when done."""
+    pending = st.session_state.pending
+    if pending is None or not pending["future"].done():
+        return False
+    
+    st.session_state.pending = None
+    if pending["session_id"] != st.session_state.session_id:
+        return True  # Session was reset while waiting
+    
+    result = pending["future"].result()
+    if pending.get("status_check"):
+        # Background check: quiet until the payment leaves processing
+        status = result.get("body", {}).get("status", "processing")
+        if status == "processing":
+            return False
+        st.session_state.payment_status = status
+        add_message("assistant", result["body"].get("response") or "Payment status: " + status)
+        return True
+    if pending.get("cancelled"):
+        if "error" in result:
+            add_message("assistant", "⏹️ Cancelled.")
+            return True
+        # The backend processed the turn; show it so the chat matches its state
+        add_message("assistant", "⏹️ Too late to cancel: the bot had already received your message.")
+    if "error" in result:
+        st.session_state.last_error = result["error"]
+        return True
+    
+    response = result["body"]
+    st.session_state.last_connection = response.pop('_connection', None)
+    add_message(
+        "assistant",
+        response.get("response", "I apologize, but I couldn't process that. Please try again.")
+    )
+    st.session_state.payment_status = response.get("status", "collecting")
+    return True
+
+@st.fragment(run_every=POLL_INTERVAL)
+def reply_poller():
+    """Check for the bot reply without blocking the script thread
+    
+    Only called by chat_panel() while a reply is pending or a payment is
+    processing, so idle tabs do not poll. Polls draw nothing. When a reply
+    lands the whole page reruns once, refreshing the conversation, status and
+    sidebar together, and the poller stops unless there is more to wait for.
+    While a queued payment is processing, the status is checked every
+    STATUS_POLL_INTERVAL.
+    """
+    if collect_reply():
+        st.rerun()
+    if (st.session_state.pending is None
+            and st.session_state.payment_status == 'processing'
+            and time.monotonic() - st.session_state.status_checked >= STATUS_POLL_INTERVAL):
+        st.session_state.status_checked = time.monotonic()
+        st.session_state.pending = {
+            "future": get_executor().submit(
+                check_status,
+                get_api_client(),
+                st.session_state.api_endpoint,
+                st.session_state.session_id
+            ),
+            "status_check": True,
+            "session_id": st.session_state.session_id,
+            "submitted": time.monotonic()
+        }
+
+@st.fragment
+def chat_panel():
+    """Status, quick start, conversation and chat input
+    
+    Runs as a fragment: submitting a message reruns only this panel, not the
+    page CSS, header or sidebar. The reply is picked up by reply_poller(),
+    which this panel starts while there is something to wait for.
+    """
+    # Background status checks do not block the input
+    pending = st.session_state.pending is not None and not st.session_state.pending.get("status_check")
+    
+    # Status indicator
+    st.markdown(get_status_badge(st.session_state.payment_status), unsafe_allow_html=True)
+    
+    # Quick start buttons (only show if no conversation)
+    if not st.session_state.conversation_started:
+        st.markdown("### 🚀 Quick Start")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.button(
+                "💳 Make a Payment",
+                use_container_width=True,
+                disabled=pending,
+                on_click=submit_message,
+                args=("I want to make a payment",)
+            )
+        
+        with col2:
+            st.button(
+                "🔍 Check Payment Status",
+                use_container_width=True,
+                disabled=pending,
+                on_click=submit_message,
+                args=("What's my payment status?",)
+            )
+        
+        with col3:
+            st.button(
+                "❓ Get Help",
+                use_container_width=True,
+                disabled=pending,
+                on_click=submit_message,
+                args=("I need help with payment",)
+            )
+        
+        # Info boxes
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("""
+            <div class="info-box">
+                <h4>💡 How It Works</h4>
+                <ol style="margin: 0.5rem 0;">
+                    <li>Start a conversation</li>
+                    <li>Provide payment details securely</li>
+                    <li>Review and confirm</li>
+                    <li>Payment processed safely</li>
+                </ol>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown("""
+            <div class="warning-box">
+                <h4>⚠️ Test Mode</h4>
+                <p style="margin: 0.5rem 0;">
+                    Use test card: <code>4242424242424242</code><br/>
+                    Expiry: Any future date<br/>
+                    CVV: Any 3 digits
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    # Chat messages are drawn after input handling so a new message appears
+    # in this same run, without a second rerun
+    history = st.container()
+    
+    # Chat input
+    st.markdown("---")
+    
+    # Callbacks run before this panel is drawn, so the input and buttons are
+    # already disabled in the same run that sent the message
+    st.chat_input(
+        "Type your message here...",
+        key="chat_input",
+        disabled=pending,
+        on_submit=submit_chat_input
+    )
+    
+    with history:
+        if st.session_state.messages:
+            display_messages()
+        
+        if st.session_state.last_error:
+            st.error(st.session_state.last_error)
+            st.session_state.last_error = None
+        
+        if pending and st.session_state.pending.get("cancelled"):
+            st.caption("⏹️ Cancelling... waiting for the sent message to finish.")
+        elif pending:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.caption("🤖 Processing...")
+            with col2:
+                st.button("✖️ Cancel", key="cancel_pending", on_click=cancel_pending, use_container_width=True)
+    
+    if st.session_state.pending is not None or st.session_state.payment_status == 'processing':
+        reply_poller()
 
 def main():
     """Main application"""
@@ -460,9 +510,23 @@ def main():
         # Session info
         st.markdown("### 📊 Session Info")
         st.metric("Session ID", st.session_state.session_id[:8] + "...")
-        st.metric("Messages", len(st.session_state.messages))
         st.metric("Status", st.session_state.payment_status.title())
         
+        # Connection reuse (keep-alive pool shared across sessions)
+        conn_stats = get_api_client().stats.as_dict()
+        if conn_stats['requests']:
+            last = st.session_state.last_connection or {}
+            st.metric(
+                "Connection Setup Saved",
+                f"{last.get('saved_ms', 0.0):.0f} ms",
+                help=(
+                    f"Last turn {'reused' if last.get('reused_connection') else 'opened'} a connection. "
+                    f"Process total: {conn_stats['reused_requests']}/{conn_stats['requests']} requests reused, "
+                    f"avg handshake {conn_stats['avg_connect_ms']:.0f} ms, "
+                    f"{conn_stats['total_saved_ms'] / 1000:.1f} s saved"
+                )
+            )
+        
         # Progress bar
         progress = get_progress_percentage()
         st.markdown("### 📈 Progress")
@@ -479,6 +543,9 @@ def main():
             st.session_state.session_id = str(uuid.uuid4())
             st.session_state.payment_status = 'collecting'
             st.session_state.conversation_started = False
+            st.session_state.history_window = HISTORY_WINDOW
+            st.session_state.pending = None
+            st.session_state.last_error = None
             st.rerun()
         
         if st.button("📋 Copy Session ID", use_container_width=True):
@@ -531,131 +598,7 @@ def main():
     # Main chat area
     st.markdown("---")
     
-    # Status indicator
-    st.markdown(get_status_badge(st.session_state.payment_status), unsafe_allow_html=True)
-    
-    # Quick start buttons (only show if no conversation)
-    if not st.session_state.conversation_started:
-        st.markdown("### 🚀 Quick Start")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("💳 Make a Payment", use_container_width=True):
-                st.session_state.conversation_started = True
-                # Auto-send first message
-                response = send_message("I want to make a payment")
-                if response:
-                    st.session_state.messages.append({
-                        "role": "user",
-                        "content": "I want to make a payment",
-                        "timestamp": datetime.now()
-                    })
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response.get("response", ""),
-                        "timestamp": datetime.now()
-                    })
-                    st.session_state.payment_status = response.get("status", "collecting")
-                st.rerun()
-        
-        with col2:
-            if st.button("🔍 Check Payment Status", use_container_width=True):
-                st.session_state.conversation_started = True
-                response = send_message("What's my payment status?")
-                if response:
-                    st.session_state.messages.append({
-                        "role": "user",
-                        "content": "What's my payment status?",
-                        "timestamp": datetime.now()
-                    })
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response.get("response", ""),
-                        "timestamp": datetime.now()
-                    })
-                st.rerun()
-        
-        with col3:
-            if st.button("❓ Get Help", use_container_width=True):
-                st.session_state.conversation_started = True
-                response = send_message("I need help with payment")
-                if response:
-                    st.session_state.messages.append({
-                        "role": "user",
-                        "content": "I need help with payment",
-                        "timestamp": datetime.now()
-                    })
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response.get("response", ""),
-                        "timestamp": datetime.now()
-                    })
-                st.rerun()
-        
-        # Info boxes
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            <div class="info-box">
-                <h4>💡 How It Works</h4>
-                <ol style="margin: 0.5rem 0;">
-                    <li>Start a conversation</li>
-                    <li>Provide payment details securely</li>
-                    <li>Review and confirm</li>
-                    <li>Payment processed safely</li>
-                </ol>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown("""
-            <div class="warning-box">
-                <h4>⚠️ Test Mode</h4>
-                <p style="margin: 0.5rem 0;">
-                    Use test card: <code>4242424242424242</code><br/>
-                    Expiry: Any future date<br/>
-                    CVV: Any 3 digits
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    # Chat messages
-    if st.session_state.messages:
-        st.markdown("### 💬 Conversation")
-        
-        # Display messages
-        for msg in st.session_state.messages:
-            display_message(msg["role"], msg["content"])
-    
-    # Chat input
-    st.markdown("---")
-    
-    if prompt := st.chat_input("Type your message here...", key="chat_input"):
-        # Add user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": datetime.now()
-        })
-        st.session_state.conversation_started = True
-        
-        # Get bot response
-        with st.spinner("🤖 Processing..."):
-            response = send_message(prompt)
-            
-            if response:
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": response.get("response", "I apologize, but I couldn't process that. Please try again."),
-                    "timestamp": datetime.now()
-                })
-                
-                # Update status
-                st.session_state.payment_status = response.get("status", "collecting")
-        
-        st.rerun()
+    chat_panel()
     
     # Footer
     st.markdown("""
@@ -0,0 +1,297 @@
+"""
+Vectorized card validation for offline jobs.
+
+Validates arrays of card numbers, expiry dates and CVVs in one pass with
+NumPy, for nightly runs over stored fixtures and card-on-file metadata.
+Results match luhn_checksum, validate_expiry and validate_cvv from
+card_validation.py exactly.
+
+Strings are converted to fixed-width matrices of code points (zero padded)
+and every check is done on whole columns. The few rows that contain
+non-ASCII characters or NUL, which the scalar functions treat in
+Unicode-aware ways, are checked one by one with the scalar functions.
+
+NumPy is not part of the Lambda package; install it where this runs.
+"""
+
+from datetime import datetime, date
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from card_networks import BIN_DIGITS, DEFAULT_CVV_LENGTH, BinIndex, get_index
+from card_validation import luhn_checksum, validate_cvv
+
+# Reason codes: the first failing check of a row
+OK = 0
+CARD_FORMAT = 1  # not 13-19 digits once spaces and dashes are removed
+CARD_LUHN = 2
+EXPIRY_FORMAT = 3  # not MM/YY
+EXPIRY_PAST = 4
+CVV_FORMAT = 5  # not all digits
+CVV_LENGTH = 6  # wrong length for the card network (4 for Amex, 3 otherwise)
+
+REASONS = ('ok', 'card_format', 'card_luhn', 'expiry_format', 'expiry_past', 'cvv_format', 'cvv_length')
+
+DEFAULT_CHUNK_SIZE = 1 << 18  # rows per pass, bounds temporary memory
+
+_ZERO, _NINE, _SPACE, _DASH, _SLASH, _NEWLINE = 48, 57, 32, 45, 47, 10
+
+
+class BulkResult(NamedTuple):
+    """Per-row results of validate_bulk."""
+    valid: np.ndarray  # bool, all three fields valid
+    card_valid: np.ndarray  # bool, luhn_checksum
+    expiry_valid: np.ndarray  # bool, validate_expiry
+    cvv_valid: np.ndarray  # bool, validate_cvv
+    reason: np.ndarray  # uint8 reason code, OK when valid
+    network: np.ndarray  # int8 index into network_keys(), -1 when unknown
+
+
+class _Codes(NamedTuple):
+    codes: np.ndarray  # uint8 [rows, width], 0 padded; only meaningful for ASCII rows
+    lengths: np.ndarray  # int64 [rows]
+    fallback: np.ndarray  # bool [rows], row needs the scalar function
+
+
+# 10 ** (BIN_DIGITS - n) for the n-th digit of a BIN key, 1-based
+_BIN_WEIGHTS = np.array([0] + [10 ** (BIN_DIGITS - n) for n in range(1, BIN_DIGITS + 1)], dtype=np.int64)
+
+# Luhn doubling: digit -> sum of the digits of 2 * digit
+_DOUBLED = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+
+
+def _code_matrix(values: Sequence[str], min_width: int = 1) -> _Codes:
+    """Strings -> code point matrix, lengths and rows to check with scalar code."""
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    array = np.array(values, dtype=str) if len(values) else np.zeros(0, dtype='<U1')
+    width = array.dtype.itemsize // 4
+    codes = array.view(np.uint32).reshape(len(values), width)
+    # NumPy drops trailing NULs, so NUL anywhere shows up as a count mismatch
+    fallback = np.count_nonzero(codes, axis=1) != lengths
+    if width:
+        fallback |= codes.max(axis=1) > 127
+    codes = codes.astype(np.uint8)
+    if width < min_width:
+        codes = np.pad(codes, ((0, 0), (0, min_width - width)))
+    return _Codes(codes, lengths, fallback)
+
+
+def _is_digit(codes: np.ndarray) -> np.ndarray:
+    return (codes >= _ZERO) & (codes <= _NINE)
+
+
+def _card_reasons(cards: Sequence[str], matrix: _Codes) -> np.ndarray:
+    codes, _, fallback = matrix
+    kept = (codes != 0) & (codes != _SPACE) & (codes != _DASH)
+    values = codes - _ZERO  # wraps around for non-digits
+    digit = values <= 9
+
+    clean_length = np.count_nonzero(kept, axis=1)
+    well_formed = ~(kept & ~digit).any(axis=1) & (clean_length >= 13) & (clean_length <= 19)
+
+    # Every second kept character counted from the right is doubled, the
+    # rightmost (check digit) is not; only the parity of the count matters
+    kept_from_right = np.cumsum(kept[:, ::-1], axis=1, dtype=np.uint8)[:, ::-1]
+    doubled = (kept_from_right & 1) == 0
+    values = np.where(digit, values, 0).astype(np.uint8)
+    values = np.where(doubled, _DOUBLED[values], values)
+    passes = values.sum(axis=1) % 10 == 0
+
+    reasons = np.where(well_formed, np.where(passes, OK, CARD_LUHN), CARD_FORMAT).astype(np.uint8)
+    for row in np.flatnonzero(fallback):
+        reasons[row] = _card_reason(cards[row])
+    return reasons
+
+
+def _card_reason(card: str) -> int:
+    """Scalar path for one card number."""
+    clean = card.replace(' ', '').replace('-', '')
+    if not clean.isdigit() or not 13 <= len(clean) <= 19:
+        return CARD_FORMAT
+    try:
+        return OK if luhn_checksum(card) else CARD_LUHN
+    except ValueError:
+        # isdigit() accepts characters int() rejects, such as superscripts;
+        # luhn_checksum raises on those, report them as malformed
+        return CARD_FORMAT
+
+
+def _expiry_reasons(matrix: _Codes, today: date) -> np.ndarray:
+    codes, lengths, fallback = matrix
+    c = codes[:, :6].astype(np.int32)
+    # re.match's "$" also matches just before a trailing newline
+    sized = (lengths == 5) | ((lengths == 6) & (c[:, 5] == _NEWLINE))
+    month_ok = (
+        ((c[:, 0] == _ZERO) & (c[:, 1] >= _ZERO + 1) & (c[:, 1] <= _NINE))
+        | ((c[:, 0] == _ZERO + 1) & (c[:, 1] >= _ZERO) & (c[:, 1] <= _ZERO + 2))
+    )
+    # The pattern is ASCII only, so fallback rows can never match it
+    well_formed = sized & month_ok & (c[:, 2] == _SLASH) & _is_digit(c[:, 3]) & _is_digit(c[:, 4]) & ~fallback
+
+    month = (c[:, 0] - _ZERO) * 10 + (c[:, 1] - _ZERO)
+    year = 2000 + (c[:, 3] - _ZERO) * 10 + (c[:, 4] - _ZERO)
+    # Valid through the last day of the expiry month
+    current = year * 12 + month >= today.year * 12 + today.month
+
+    return np.where(well_formed, np.where(current, OK, EXPIRY_PAST), EXPIRY_FORMAT).astype(np.uint8)
+
+
+def network_keys(index: Optional[BinIndex] = None) -> List[str]:
+    """Network keys in the order used by BulkResult.network."""
+    return list((index or get_index()).networks)
+
+
+def _networks(cards: Sequence[str], matrix: _Codes, index: BinIndex) -> np.ndarray:
+    """Vectorized BinIndex.lookup: network index per row, -1 when unknown."""
+    codes, _, fallback = matrix
+    keys = network_keys(index)
+    kept = (codes != 0) & (codes != _SPACE) & (codes != _DASH)
+    # Same key as card_networks.bin_key: first BIN_DIGITS kept characters,
+    # all digits, zero padded on the right
+    rank = np.cumsum(kept, axis=1, dtype=np.int16)
+    in_bin = kept & (rank <= BIN_DIGITS)
+    digit = _is_digit(codes)
+    has_key = in_bin.any(axis=1) & ~(in_bin & ~digit).any(axis=1)
+    weights = _BIN_WEIGHTS[np.minimum(rank, BIN_DIGITS)] * in_bin
+    bin_keys = ((codes.astype(np.int64) - _ZERO) * weights).sum(axis=1)
+
+    starts = np.array(index.starts, dtype=np.int64)
+    ends = np.array(index.ends, dtype=np.int64)
+    interval_networks = np.array([keys.index(key) for key in index.keys], dtype=np.int8)
+    i = np.searchsorted(starts, bin_keys, side='right') - 1
+    clipped = np.maximum(i, 0)
+    found = has_key & (i >= 0) & (bin_keys <= ends[clipped])
+    networks = np.where(found, interval_networks[clipped], -1).astype(np.int8)
+
+    for row in np.flatnonzero(fallback):
+        network = index.lookup(cards[row])
+        networks[row] = keys.index(network.key) if network else -1
+    return networks
+
+
+def _cvv_reasons(cvvs: Sequence[str], cards: Sequence[str], matrix: _Codes, card_fallback: np.ndarray,
+                 networks: np.ndarray, index: BinIndex) -> np.ndarray:
+    codes, lengths, fallback = matrix
+    all_digits = ~((codes != 0) & ~_is_digit(codes)).any(axis=1) & (lengths > 0)
+
+    # CVV length per network, last entry for unknown cards (index -1)
+    cvv_lengths = np.array([n.cvv_length for n in index.networks.values()] + [DEFAULT_CVV_LENGTH])
+    expected = cvv_lengths[networks]
+
+    reasons = np.where(all_digits, np.where(lengths == expected, OK, CVV_LENGTH), CVV_FORMAT).astype(np.uint8)
+    for row in np.flatnonzero(fallback | card_fallback):
+        if validate_cvv(cvvs[row], cards[row]):
+            reasons[row] = OK
+        else:
+            reasons[row] = CVV_FORMAT if not cvvs[row].isdigit() else CVV_LENGTH
+    return reasons
+
+
+def validate_cards(cards: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized luhn_checksum.
+
+    Args:
+        cards: Card numbers (spaces and dashes are ignored)
+
+    Returns:
+        (bool mask, uint8 reason codes)
+    """
+    cards = list(cards)
+    reasons = _card_reasons(cards, _code_matrix(cards))
+    return reasons == OK, reasons
+
+
+def validate_expiries(expiries: Sequence[str], today: Optional[date] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized validate_expiry.
+
+    Args:
+        expiries: Dates in MM/YY format
+        today: Date to validate against (default: today, as validate_expiry)
+
+    Returns:
+        (bool mask, uint8 reason codes)
+    """
+    today = today or datetime.now().date()
+    reasons = _expiry_reasons(_code_matrix(list(expiries), min_width=6), today)
+    return reasons == OK, reasons
+
+
+def validate_cvvs(cvvs: Sequence[str], cards: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized validate_cvv.
+
+    Args:
+        cvvs: CVVs
+        cards: Card number of each row, for the network's CVV length
+
+    Returns:
+        (bool mask, uint8 reason codes)
+    """
+    cvvs, cards = list(cvvs), list(cards)
+    index = get_index()
+    card_matrix = _code_matrix(cards)
+    networks = _networks(cards, card_matrix, index)
+    reasons = _cvv_reasons(cvvs, cards, _code_matrix(cvvs), card_matrix.fallback, networks, index)
+    return reasons == OK, reasons
+
+
+def _validate_chunk(cards: List[str], expiries: List[str], cvvs: List[str], today: date,
+                    index: BinIndex) -> Tuple[np.ndarray, ...]:
+    card_matrix = _code_matrix(cards)
+    card = _card_reasons(cards, card_matrix)
+    networks = _networks(cards, card_matrix, index)
+    expiry = _expiry_reasons(_code_matrix(expiries, min_width=6), today)
+    cvv = _cvv_reasons(cvvs, cards, _code_matrix(cvvs), card_matrix.fallback, networks, index)
+    reason = np.where(card != OK, card, np.where(expiry != OK, expiry, cvv))
+    return card, expiry, cvv, reason, networks
+
+
+def validate_bulk(
+    cards: Sequence[str],
+    expiries: Sequence[str],
+    cvvs: Sequence[str],
+    today: Optional[date] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BulkResult:
+    """
+    Validate card number, expiry and CVV of many rows at once.
+
+    Args:
+        cards: Card numbers
+        expiries: Expiry dates (MM/YY)
+        cvvs: CVVs
+        today: Date to validate expiries against (default: today)
+        chunk_size: Rows converted to matrices at a time
+
+    Returns:
+        BulkResult; reason holds the first failure of each row, in the
+        order card, expiry, CVV (see REASONS), and network the card network
+        (see network_keys)
+    """
+    cards, expiries, cvvs = list(cards), list(expiries), list(cvvs)
+    if not len(cards) == len(expiries) == len(cvvs):
+        raise ValueError("cards, expiries and cvvs must have the same length")
+    today = today or datetime.now().date()
+    index = get_index()
+
+    parts = [
+        _validate_chunk(cards[i:i + chunk_size], expiries[i:i + chunk_size], cvvs[i:i + chunk_size], today, index)
+        for i in range(0, len(cards), chunk_size)
+    ]
+    if parts:
+        card, expiry, cvv, reason, networks = (np.concatenate(column) for column in zip(*parts))
+    else:
+        card = expiry = cvv = reason = np.zeros(0, dtype=np.uint8)
+        networks = np.zeros(0, dtype=np.int8)
+
+    return BulkResult(
+        valid=reason == OK,
+        card_valid=card == OK,
+        expiry_valid=expiry == OK,
+        cvv_valid=cvv == OK,
+        reason=reason.astype(np.uint8),
+        network=networks,
+    )
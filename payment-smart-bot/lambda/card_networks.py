@@ -0,0 +1,150 @@
+"""
+Card network (brand) detection from the card number prefix (BIN/IIN).
+
+Networks, their PAN and CVV lengths, and their prefix ranges are loaded from
+card_networks.json. Prefix ranges are widened to fixed-width BIN_DIGITS keys
+and flattened into sorted, non-overlapping intervals where the narrowest
+range wins (Discover's 622126-622925 inside UnionPay's 62), so a lookup is a
+single bisect over the interval starts.
+"""
+
+import bisect
+import json
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+BIN_DIGITS = 8
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'card_networks.json')
+
+# Rules for numbers that match no network
+DEFAULT_PAN_LENGTHS = tuple(range(13, 20))
+DEFAULT_CVV_LENGTH = 3
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class CardNetwork(NamedTuple):
+    """One card network and its length rules."""
+    key: str
+    name: str
+    pan_lengths: Tuple[int, ...]
+    cvv_length: int
+
+
+def bin_key(card_number: str) -> Optional[int]:
+    """
+    Fixed-width BIN key of a card number.
+
+    Spaces and dashes are ignored; numbers shorter than BIN_DIGITS are padded
+    with zeros.
+
+    Returns:
+        Integer key, or None if the number does not start with digits
+    """
+    prefix = card_number.replace(' ', '').replace('-', '')[:BIN_DIGITS]
+    if not prefix or not prefix.isdecimal():
+        return None
+    return int(prefix.ljust(BIN_DIGITS, '0'))
+
+
+def _widen(prefix: str) -> Tuple[int, int]:
+    """Prefix -> (first, last) BIN key it covers."""
+    return int(prefix.ljust(BIN_DIGITS, '0')), int(prefix.ljust(BIN_DIGITS, '9'))
+
+
+class BinIndex:
+    """Sorted, non-overlapping BIN intervals searched with bisect."""
+
+    def __init__(self, networks: Dict[str, CardNetwork], ranges: List[Tuple[str, str, str]]):
+        """
+        Args:
+            networks: Network key -> CardNetwork
+            ranges: (low prefix, high prefix, network key), may overlap
+        """
+        self.networks = networks
+        spans = []
+        for low, high, key in ranges:
+            if key not in networks:
+                raise ValueError(f"BIN range {low}-{high} refers to unknown network {key!r}")
+            spans.append((_widen(low)[0], _widen(high)[1], key))
+
+        # Cut at every range boundary and keep the narrowest range per piece
+        bounds = sorted({first for first, _, _ in spans} | {last + 1 for _, last, _ in spans})
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.keys: List[str] = []
+        for first, following in zip(bounds, bounds[1:]):
+            covering = [(last - start, key) for start, last, key in spans if start <= first and following - 1 <= last]
+            if not covering:
+                continue
+            key = min(covering)[1]
+            if self.keys and self.keys[-1] == key and self.ends[-1] == first - 1:
+                self.ends[-1] = following - 1
+            else:
+                self.starts.append(first)
+                self.ends.append(following - 1)
+                self.keys.append(key)
+
+    @classmethod
+    def load(cls, path: str = DATA_FILE) -> 'BinIndex':
+        """Build an index from a JSON data file (see card_networks.json)."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        networks = {
+            key: CardNetwork(key, spec['name'], tuple(spec['pan_lengths']), spec['cvv_length'])
+            for key, spec in data['networks'].items()
+        }
+        return cls(networks, [tuple(r) for r in data['ranges']])
+
+    def lookup(self, card_number: str) -> Optional[CardNetwork]:
+        """
+        Network of a card number, in O(log n) over the intervals.
+
+        Returns:
+            CardNetwork, or None if no range matches
+        """
+        key = bin_key(card_number)
+        if key is None:
+            return None
+        i = bisect.bisect_right(self.starts, key) - 1
+        if i < 0 or key > self.ends[i]:
+            return None
+        return self.networks[self.keys[i]]
+
+
+def get_index() -> BinIndex:
+    """Load the default index once per container."""
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            _index = BinIndex.load()
+    return _index
+
+
+def card_network(card_number: str) -> Optional[CardNetwork]:
+    """Network of a card number, or None if unknown."""
+    return get_index().lookup(card_number)
+
+
+def pan_lengths(card_number: str) -> Tuple[int, ...]:
+    """Valid PAN lengths for the card's network (13-19 when unknown)."""
+    network = card_network(card_number)
+    return network.pan_lengths if network else DEFAULT_PAN_LENGTHS
+
+
+def describe_lengths(lengths: Tuple[int, ...]) -> str:
+    """Human-readable lengths: "15", "16-19" or "13, 16 or 19"."""
+    if len(lengths) > 2 and list(lengths) == list(range(lengths[0], lengths[-1] + 1)):
+        return f"{lengths[0]}-{lengths[-1]}"
+    if len(lengths) == 1:
+        return str(lengths[0])
+    return ', '.join(str(n) for n in lengths[:-1]) + f" or {lengths[-1]}"
+
+
+def cvv_length(card_number: str) -> int:
+    """CVV length for the card's network (3 when unknown)."""
+    network = card_network(card_number)
+    return network.cvv_length if network else DEFAULT_CVV_LENGTH
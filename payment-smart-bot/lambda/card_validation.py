@@ -0,0 +1,115 @@
+"""
+Card field validation for the payment bot.
+
+Pure functions with no AWS or Stripe dependencies, shared by the Lambda
+handler and offline tooling (see bulk_validation.py).
+"""
+
+import re
+from calendar import monthrange
+from datetime import datetime
+
+from card_networks import card_network, cvv_length, pan_lengths
+
+
+def luhn_checksum(card_number: str) -> bool:
+    """
+    Validate credit card number using Luhn algorithm.
+    
+    Args:
+        card_number: Card number as string (spaces will be stripped)
+    
+    Returns:
+        True if valid, False otherwise
+    """
+    def digits_of(n):
+        return [int(d) for d in str(n)]
+    
+    card_number = card_number.replace(' ', '').replace('-', '')
+    
+    if not card_number.isdigit() or len(card_number) < 13 or len(card_number) > 19:
+        return False
+    
+    digits = digits_of(card_number)
+    odd_digits = digits[-1::-2]
+    even_digits = digits[-2::-2]
+    checksum = sum(odd_digits)
+    
+    for d in even_digits:
+        checksum += sum(digits_of(d * 2))
+    
+    return checksum % 10 == 0
+
+
+def validate_expiry(expiry: str) -> bool:
+    """
+    Validate expiry date format (MM/YY) and check if not expired.
+    Uses last day of the expiry month for accurate validation.
+    
+    Args:
+        expiry: Date string in MM/YY format
+    
+    Returns:
+        True if valid and not expired
+    """
+    pattern = r'^(0[1-9]|1[0-2])/([0-9]{2})$'
+    match = re.match(pattern, expiry)
+    
+    if not match:
+        return False
+    
+    month = int(match.group(1))
+    year = int('20' + match.group(2))
+    
+    # Get last day of the expiry month
+    last_day = monthrange(year, month)[1]
+    expiry_date = datetime(year, month, last_day)
+    
+    # Compare with current date (set time to midnight for accurate comparison)
+    now = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    return expiry_date >= now
+
+
+def validate_cvv(cvv: str, card_number: str) -> bool:
+    """
+    Validate CVV format (3 digits for most cards, 4 for Amex).
+    
+    Args:
+        cvv: CVV string
+        card_number: Card number to determine card type
+    
+    Returns:
+        True if valid format
+    """
+    # Length comes from the card network (4 for Amex, 3 for the others)
+    expected_length = cvv_length(card_number)
+    
+    return cvv.isdigit() and len(cvv) == expected_length
+
+
+def validate_pan_length(card_number: str) -> bool:
+    """
+    Check the card number length against its network's rules.
+    
+    Args:
+        card_number: Card number (spaces and dashes are ignored)
+    
+    Returns:
+        True if the length is valid for the network (13-19 when unknown)
+    """
+    clean = card_number.replace(' ', '').replace('-', '')
+    return len(clean) in pan_lengths(clean)
+
+
+def mask_card_number(card_number: str) -> str:
+    """Mask all but last 4 digits of card number."""
+    clean = card_number.replace(' ', '').replace('-', '')
+    return '****' + clean[-4:]
+
+
+def describe_card(card_number: str) -> str:
+    """Masked card number with its network, e.g. "Visa ****4242"."""
+    network = card_network(card_number)
+    masked = mask_card_number(card_number)
+    return f"{network.name} {masked}" if network else masked
@@ -0,0 +1,350 @@
+"""
+Multi-field extraction for the payment bot.
+
+Pulls every payment field it can recognize out of one user message in a
+single pass over precompiled patterns, and validates each one. A user who
+pastes "John Smith 4242 4242 4242 4242 12/28 123" is then done in one turn
+instead of four.
+
+Fields are described by FieldSpec entries (pattern, normalization,
+validation, how to show them). FIELD_SPECS holds the known ones; which of
+them a conversation collects is configuration (see payment_flow.py).
+"""
+
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import intents
+from card_networks import card_network, cvv_length, describe_lengths, pan_lengths
+from card_validation import (
+    describe_card, luhn_checksum, validate_cvv, validate_expiry, validate_pan_length
+)
+
+# "My name is", "Name on card:", "I'm" ... before a name
+_NAME_LABEL = re.compile(
+    r"^\s*(?:(?:my\s+)?(?:full\s+)?name(?:\s+on\s+(?:the\s+)?card)?(?:\s+is)?\s*:?|i\s+am|i'm)\s+",
+    re.IGNORECASE,
+)
+_NAME_WORD = re.compile(r"^[^\W\d_][\w'.-]*$")
+# Words around card details that are never part of a name ("my card is ...")
+_NOT_NAME = frozenset("""
+    an and are at be by card cards code credit cvc cvv date debit details digits exp expires expiry
+    for from go have here hi hello hey i info is it it's its me my name no number ok okay on or
+    pay paying payment please security so that the this to use using via with yes zip
+""".split())
+# Pronouns and verbs of a request ("I want to make a payment"), plus the above
+_CHATTER = _NOT_NAME | frozenset("""
+    alright begin cool could did does doing fine get going good great help how just know let let's
+    like make need needs our right should sounds start sure thank thanks there try us want wants we
+    what when where who why would you your
+""".split())
+_TRAILING_LABEL = re.compile(
+    r"[\s,;:]*(?:card(?:\s+number)?|number|cc|exp(?:iry)?|cvv|cvc|zip(?:\s+code)?|postcode)?[\s,;:]*$",
+    re.IGNORECASE,
+)
+
+
+class FieldSpec(NamedTuple):
+    """How one payment field is found, checked and shown."""
+    key: str  # collectedData key and step name
+    label: str  # how prompts refer to it
+    title: str  # label in the confirmation summary
+    pattern: Optional[str]  # regex for the single-pass scan, None for free text
+    normalize: Callable[[str], str]  # matched text -> stored value
+    validate: Callable[[str, Dict[str, str]], Optional[str]]  # (value, known fields) -> error or None
+    display: Callable[[str], str]  # value -> confirmation summary text
+    requires: Sequence[str] = ()  # fields that must be known first
+    restates: bool = False  # a message containing it may correct earlier answers
+    fallback: Optional[Callable[[str], Optional[str]]] = None  # whole message, at this field's step
+    cue: Optional[str] = None  # label the value must follow, except at its step or with a restating field
+    hint: str = ''  # how to give it, for help replies
+
+
+class Extraction(NamedTuple):
+    """Result of FieldExtractor.extract."""
+    fields: Dict[str, str]  # valid values, by field
+    errors: Dict[str, str]  # user-facing message, by field
+
+
+def _name_from(text: str) -> Optional[str]:
+    """
+    Name in a piece of text: 2+ words, letters only, no filler words.
+
+    After a name label the name ends at the first filler word ("My name is
+    John Smith and my card is ...").
+    """
+    rest = _NAME_LABEL.sub('', text)
+    words = rest.split()
+    if rest != text:
+        for i, word in enumerate(words):
+            if word.lower().strip(".,;:'") in _NOT_NAME:
+                words = words[:i]
+                break
+    text = ' '.join(words).strip(' ,;:.')
+    words = text.split()
+    if (len(words) >= 2 and all(_NAME_WORD.match(word) for word in words)
+            and not any(word.lower().strip(".'") in _NOT_NAME for word in words)):
+        return text.title()
+    return None
+
+
+def _name_fallback(text: str) -> Optional[str]:
+    # Any 2+ words without digits, unless it reads like a request, a
+    # question or small talk: that goes to the model instead
+    words = [word.lower().strip(".,!?;:\"") for word in _NAME_LABEL.sub('', text).split()]
+    if len(words) < 2 or any(c.isdigit() for c in text) or '?' in text:
+        return None
+    if _CHATTER.intersection(words) or intents.detect_intents(text):
+        return None
+    return _name_from(text) or text.title()
+
+
+def _card_fallback(text: str) -> Optional[str]:
+    # Every digit in an unrecognized layout ("4242.4242.4242.4242")
+    digits = re.sub(r'[^\d]', '', text)
+    if len(digits) >= 13 and len(digits) >= min(pan_lengths(digits)):
+        return digits
+    return None
+
+
+def _card_error(card: str, known: Dict[str, str]) -> Optional[str]:
+    if not validate_pan_length(card):
+        network = card_network(card)
+        name = network.name if network else 'Card'
+        return f"{name} card numbers have {describe_lengths(pan_lengths(card))} digits. Could you double-check it?"
+    if not luhn_checksum(card):
+        return "That card number doesn't pass validation. Could you double-check it?"
+    return None
+
+
+def _expiry_value(text: str) -> str:
+    month, year = re.sub(r'\s', '', text).split('/')
+    return f"{month}/{year[-2:]}"
+
+
+# "1228" or "12 28": only taken at the expiry step, where it can't be a CVV
+_EXPIRY_COMPACT = re.compile(r"(?<![\d/])(0[1-9]|1[0-2])\s?(20\d{2}|\d{2})(?![\d/])")
+
+
+def _expiry_fallback(text: str) -> Optional[str]:
+    match = _EXPIRY_COMPACT.search(text)
+    if match:
+        return f"{match.group(1)}/{match.group(2)[-2:]}"
+    return None
+
+
+def _expiry_error(expiry: str, known: Dict[str, str]) -> Optional[str]:
+    if validate_expiry(expiry):
+        return None
+    return "That expiry date seems invalid or expired. Please use MM/YY format."
+
+
+def _cvv_error(cvv: str, known: Dict[str, str]) -> Optional[str]:
+    if validate_cvv(cvv, known['card']):
+        return None
+    return f"CVV should be {cvv_length(known['card'])} digits for this card. Please try again."
+
+
+NAME = FieldSpec(
+    key='name',
+    label='name on the card',
+    title='Name',
+    pattern=None,
+    normalize=str,
+    validate=lambda value, known: None,
+    display=str,
+    fallback=_name_fallback,
+    hint='exactly as printed on the card',
+)
+
+# 4-6-5 (Amex), 4-4-4-4, 4-4-4 plus 1-3 digits, or 13-19 digits in a row.
+# Spaced 19-digit numbers are left out so a CVV typed after a 16-digit
+# number is not swallowed. A message with a card number is read as a full
+# restatement of the details.
+CARD = FieldSpec(
+    key='card',
+    label='card number',
+    title='Card',
+    pattern=r"\d{4}[ -]\d{6}[ -]\d{5} | \d{4}(?:[ -]\d{4}){3} | \d{4}(?:[ -]\d{4}){2}[ -]\d{1,3} | \d{13,19}",
+    normalize=lambda text: re.sub(r'[ -]', '', text),
+    validate=_card_error,
+    display=describe_card,
+    restates=True,
+    fallback=_card_fallback,
+    hint='the long number on the front, 13 to 19 digits',
+)
+
+EXPIRY = FieldSpec(
+    key='expiry',
+    label='expiry date',
+    title='Expiry',
+    pattern=r"(?:0[1-9]|1[0-2])\s?/\s?(?:\d{2}|20\d{2})",
+    normalize=_expiry_value,
+    validate=_expiry_error,
+    display=str,
+    fallback=_expiry_fallback,
+    hint='in MM/YY format',
+)
+
+# The CVV length depends on the card, so it is only taken once one is known.
+# Any 3-4 digits would match, so outside its step a CVV needs a label or a
+# card number in the same message.
+CVV = FieldSpec(
+    key='cvv',
+    label='CVV',
+    title='CVV',
+    pattern=r"\d{3,4}",
+    normalize=str,
+    validate=_cvv_error,
+    display=lambda value: '***',
+    requires=('card',),
+    cue=r"\b(?:cvv2?|cvc2?|cid|csc|security\s+code|verification\s+(?:code|value))",
+    hint='the 3 or 4 digit security code on the card',
+)
+
+BILLING_ZIP = FieldSpec(
+    key='zip',
+    label='billing ZIP code',
+    title='ZIP',
+    pattern=r"\d{5}(?:-\d{4})?",
+    normalize=str,
+    validate=lambda value, known: None,
+    display=str,
+    hint='5 digits, or ZIP+4',
+)
+
+# Known fields, by key
+FIELD_SPECS = {spec.key: spec for spec in (NAME, CARD, EXPIRY, CVV, BILLING_ZIP)}
+
+
+class FieldExtractor:
+    """Single-pass extraction of a fixed list of fields, compiled once."""
+
+    def __init__(self, fields: List[FieldSpec]):
+        """
+        Args:
+            fields: Fields in collection order; where patterns overlap the
+                earlier one wins
+        """
+        self.fields = list(fields)
+        self.keys = tuple(spec.key for spec in self.fields)
+        self.specs = {spec.key: spec for spec in self.fields}
+        self.free_text = [spec.key for spec in self.fields if spec.pattern is None]
+        alternatives = [f"(?P<{spec.key}>{spec.pattern})" for spec in self.fields if spec.pattern]
+        # Lookarounds keep a field from starting or ending inside another
+        # number or a date
+        self.pattern = re.compile(
+            r"(?<![\d/])(?:" + " | ".join(alternatives) + r")(?![\d/])", re.VERBOSE | re.ASCII
+        ) if alternatives else None
+        self.cues = {
+            spec.key: re.compile(spec.cue + r"(?:\s+(?:is|was))?[\s:#=-]*$", re.IGNORECASE)
+            for spec in self.fields if spec.cue
+        }
+
+    def extract(self, text: str, current_step: Optional[str], collected: Dict[str, str],
+                correcting: bool = False) -> Extraction:
+        """
+        Extract and validate every field in a message.
+
+        Only fields that are still missing, or the one for the current step,
+        are taken, unless the message contains a restating field (the card
+        number) or ``correcting`` is set: then every field in it is taken,
+        correcting earlier answers. A field with requirements is only taken once they are
+        known, from this message or an earlier one. A name already collected
+        is only replaced while correcting, and only by a labelled one ("my
+        name is ...").
+
+        Args:
+            text: User's message
+            current_step: Field being asked for (None once all are collected)
+            collected: Fields collected so far
+            correcting: Details are being reviewed (confirmation, failed
+                payment), so any field given replaces the earlier answer
+
+        Returns:
+            Extraction with the valid fields and an error for each invalid one
+        """
+        text = text.strip()
+        matches = list(self.pattern.finditer(text)) if self.pattern else []
+        restating = any(self.specs[match.lastgroup].restates for match in matches)
+        if restating or correcting:
+            wanted = set(self.keys)
+        else:
+            wanted = {key for key in self.keys if key not in collected or key == current_step}
+        found: Dict[str, str] = {}
+        first_match = None
+
+        for match in matches:
+            key = match.lastgroup
+            if key not in wanted or key in found:
+                continue
+            cue = self.cues.get(key)
+            if cue and key != current_step and not restating and not cue.search(text, 0, match.start()):
+                continue
+            if first_match is None:
+                first_match = match.start()
+            found[key] = self.specs[key].normalize(match.group(key))
+
+        # Lenient format for a message that answers just the current step;
+        # it replaces whatever the patterns found in it
+        spec = self.specs.get(current_step)
+        if spec and spec.pattern and spec.fallback and current_step not in found:
+            value = spec.fallback(text)
+            if value:
+                found = {current_step: value}
+                first_match = re.search(r'\d', text).start()
+
+        # Free text (the name): typed before the other fields ("John Smith
+        # 4242 ..."), or the whole message at its own step. Leading text is
+        # only read as a name at the name step or after a name label, and a
+        # collected name is only replaced by a labelled one while correcting.
+        for key in self.free_text:
+            if key not in wanted or (key in collected and key != current_step and not correcting):
+                continue
+            leading = text[:first_match] if found else ''
+            if found and (key == current_step or _NAME_LABEL.match(leading)):
+                value = _name_from(_TRAILING_LABEL.sub('', leading))
+            elif key == current_step and self.specs[key].fallback:
+                value = self.specs[key].fallback(text)
+            elif correcting and _NAME_LABEL.match(text):
+                value = _name_from(text)
+            else:
+                value = None
+            if value:
+                found[key] = value
+
+        fields: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        for spec in self.fields:
+            value = found.get(spec.key)
+            if value is None:
+                continue
+            known = {**collected, **fields}
+            if any(required not in known for required in spec.requires):
+                continue
+            error = spec.validate(value, known)
+            if error:
+                errors[spec.key] = error
+            else:
+                fields[spec.key] = value
+        return Extraction(fields, errors)
+
+    def apply(self, collected: Dict[str, str], fields: Dict[str, str]) -> None:
+        """
+        Store extracted fields in the collected data.
+
+        A field that depends on one that changed (a CVV collected for a
+        different card number) is dropped unless given again.
+        """
+        changed = {key for key, value in fields.items() if collected.get(key) != value}
+        for spec in self.fields:
+            if spec.key not in fields and changed.intersection(spec.requires):
+                collected.pop(spec.key, None)
+        collected.update(fields)
+
+    def next_field(self, collected: Dict[str, str]) -> Optional[str]:
+        """First field still missing, or None when all are collected."""
+        for key in self.keys:
+            if key not in collected:
+                return key
+        return None
@@ -0,0 +1,94 @@
+"""
+Inference settings per kind of model turn.
+
+The model only writes the turns the state machine cannot answer from a
+template: asking for the next field once some were received, and answering
+anything else said during collection (questions, small talk). Each kind has
+an InferenceProfile with a token cap, temperature and stop sequences.
+Generation time grows with the output, and asking for the expiry date takes
+a sentence, not 512 tokens.
+
+Token caps are read from inference_profiles.json, which
+scripts/fit_inference_profiles.py fits from the output tokens the handler
+logs per profile (see metrics.py). Profiles missing from the file keep the
+defaults below.
+"""
+
+import json
+import os
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference_profiles.json')
+
+NEXT_FIELD = 'next_field'  # fields received, ask for the next one
+FIELD_QUESTION = 'field_question'  # nothing extracted at a field step
+DEFAULT = 'default'  # the fixed settings used before profiles
+
+# Stop before the model writes the user's next line or echoes a system note
+_STOP = ("\nUser:", "[SYSTEM")
+
+
+class InferenceProfile(NamedTuple):
+    """Converse inferenceConfig for one kind of turn."""
+    name: str
+    max_tokens: int
+    temperature: float
+    top_p: float = 0.9
+    stop_sequences: Tuple[str, ...] = ()
+
+    def config(self, stop: bool = True) -> Dict[str, Any]:
+        """
+        inferenceConfig for the Converse API.
+
+        Args:
+            stop: Include the stop sequences (False for models without them)
+        """
+        config = {"temperature": self.temperature, "maxTokens": self.max_tokens, "topP": self.top_p}
+        if stop and self.stop_sequences:
+            config["stopSequences"] = list(self.stop_sequences)
+        return config
+
+
+DEFAULT_PROFILES = {
+    NEXT_FIELD: InferenceProfile(NEXT_FIELD, 96, 0.3, stop_sequences=_STOP),
+    FIELD_QUESTION: InferenceProfile(FIELD_QUESTION, 192, 0.5, stop_sequences=_STOP),
+    DEFAULT: InferenceProfile(DEFAULT, 512, 0.5),
+}
+
+
+def load_profiles(path: str = DATA_FILE) -> Dict[str, InferenceProfile]:
+    """
+    Profiles with the fitted token caps from a data file.
+
+    Returns:
+        Profiles by name (the defaults if the file is missing)
+    """
+    profiles = dict(DEFAULT_PROFILES)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return profiles
+    for name, fitted in data.get('profiles', {}).items():
+        if name in profiles and name != DEFAULT:
+            profiles[name] = profiles[name]._replace(max_tokens=int(fitted['max_tokens']))
+    return profiles
+
+
+def choose(state: str, hint: Optional[str], fields: Sequence[str]) -> str:
+    """
+    Profile for a turn the model answers.
+
+    Args:
+        state: Turn's state (PaymentFlow.handle)
+        hint: Turn's note for the model (set when fields were received)
+        fields: Field states of the flow
+
+    Returns:
+        Profile name
+    """
+    if hint:
+        return NEXT_FIELD
+    if state in fields:
+        return FIELD_QUESTION
+    return DEFAULT
@@ -0,0 +1,71 @@
+"""
+Intent detection for the payment bot: cancel, confirm, help and status.
+
+Keywords are matched as whole words in one precompiled pattern, so names
+like "Nora Stopford" or "Manoel" no longer read as "stop" or "no", and a
+keyword right after a negation ("don't cancel") is ignored. Short replies
+that are only a yes or a no ("yes please", "nope") count as confirm or
+cancel; inside a longer message they do not, since "no, the expiry is 01/29"
+is a correction rather than a cancellation.
+"""
+
+import re
+from typing import FrozenSet
+
+CANCEL = 'cancel'
+CONFIRM = 'confirm'
+HELP = 'help'
+STATUS = 'status'
+
+INTENTS = (CANCEL, CONFIRM, HELP, STATUS)
+
+NO_INTENTS: FrozenSet[str] = frozenset()
+
+_KEYWORDS = re.compile(r"""
+    \b(?:
+        (?P<cancel>cancel(?:led)? | stop | quit | abort | exit | never\s*mind | forget\s+(?:it|about\s+it)
+          | (?:don'?t|do\s+not)\s+want\s+to\s+(?:pay|continue|proceed))
+      | (?P<confirm>confirm(?:ed)? | proceed | go\s+ahead | submit | pay\s+now)
+      | (?P<help>help | how\s+does\s+(?:this|it)\s+work | what\s+do\s+(?:you|i)\s+need
+          | what\s+(?:should|do)\s+i\s+(?:do|enter|type|say) | i\s+don'?t\s+understand
+          | is\s+(?:this|it)\s+(?:safe|secure))
+      | (?P<status>status | where\s+(?:am\s+i|are\s+we) | what(?:'s|\s+is)\s+(?:left|next|missing)
+          | how\s+far)
+    )\b
+""", re.VERBOSE | re.IGNORECASE)
+
+# Negation within two words before a keyword: "don't cancel", "do not stop it"
+_NEGATION = re.compile(
+    r"\b(?:don'?t|do\s+not|doesn'?t|not|never|won'?t|no\s+need\s+to)\s+(?:\w+\s+){0,2}$",
+    re.IGNORECASE,
+)
+
+# A whole message that is only a yes or a no, with politeness around it
+_POLITE = r"(?:please|thanks|thank\s+you|it\s+is|that'?s\s+(?:right|correct)|correct|go\s+ahead)"
+_SHORT_REPLY = re.compile(rf"""
+    ^\W*(?:
+        (?P<cancel>no|nope|nah|n)(?:\W+(?:thanks|thank\s+you))?
+      | (?P<confirm>yes|yeah|yep|yup|y|ok|okay|sure|correct|right|looks\s+(?:good|right)|all\s+good
+          |that'?s\s+(?:right|correct))(?:\W+{_POLITE})*
+    )\W*$
+""", re.VERBOSE | re.IGNORECASE)
+
+
+def detect_intents(text: str) -> FrozenSet[str]:
+    """
+    Intents expressed in a message.
+
+    Args:
+        text: User's message
+
+    Returns:
+        Subset of INTENTS (empty for most messages)
+    """
+    short = _SHORT_REPLY.match(text)
+    if short:
+        return frozenset((short.lastgroup,))
+    found = set()
+    for match in _KEYWORDS.finditer(text):
+        if match.lastgroup not in found and not _NEGATION.search(text, 0, match.start()):
+            found.add(match.lastgroup)
+    return frozenset(found) if found else NO_INTENTS
@@ -0,0 +1,55 @@
+"""
+CloudWatch metrics in Embedded Metric Format (EMF).
+
+A metric record is one JSON log line; CloudWatch Logs extracts the metrics
+from it asynchronously, so recording a metric makes no API call and adds no
+latency to the turn. Outside Lambda the line is only printed.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'PaymentSmartBot')
+
+# Unit of each metric name; anything else is "None"
+UNITS = {
+    'InputTokens': 'Count',
+    'OutputTokens': 'Count',
+    'CacheReadInputTokens': 'Count',
+    'CacheWriteInputTokens': 'Count',
+    'BedrockLatency': 'Milliseconds',
+    'Truncated': 'Count',
+}
+
+
+def emit(metrics: Dict[str, float], dimensions: Dict[str, str],
+         properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Log one EMF record.
+
+    Args:
+        metrics: Values by metric name
+        dimensions: Dimension values by name (one dimension set)
+        properties: Extra fields kept in the log line, searchable with Logs
+            Insights but not metrics
+
+    Returns:
+        The record that was logged
+    """
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': UNITS.get(name, 'None')} for name in metrics],
+            }],
+        },
+        **(properties or {}),
+        **dimensions,
+        **metrics,
+    }
+    print(json.dumps(record, separators=(',', ':'), default=str))
+    return record
@@ -0,0 +1,326 @@
+"""
+Conversation state machine for the payment bot.
+
+The conversation is a table of transitions keyed by (state, event), built
+once when a PaymentFlow is created (at import in the handler), so each turn
+is one dictionary lookup. States, the fields they collect, response
+templates and transitions are plain data; adding a field such as the
+billing ZIP code is a change to the field list, not to the handler.
+
+Nothing here calls AWS: the handler makes the model call for turns without a
+template reply and tokenizes the card for the 'tokenize' action, so a
+conversation can be stepped through without either.
+"""
+
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+import intents
+from card_validation import mask_card_number
+from field_extraction import FIELD_SPECS, Extraction, FieldExtractor
+
+# Collected when PAYMENT_BOT_FIELDS is not set
+DEFAULT_FIELDS = ('name', 'card', 'expiry', 'cvv')
+
+# States besides one per field
+CONFIRM = 'confirm'
+PROCESSING = 'processing'  # tokenization queued
+COMPLETE = 'complete'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+
+# Events, detected from the user's message (or the tokenization result)
+CANCEL = 'cancel'
+CONFIRMED = 'confirmed'
+INVALID = 'invalid'
+FIELDS = 'fields'
+HELP = 'help'
+STATUS = 'status'
+MESSAGE = 'message'
+QUEUED = 'queued'
+TOKENIZED = 'tokenized'
+DECLINED = 'declined'
+
+# Transition targets besides a state name
+NEXT = 'next'  # first missing field, or confirm when all are collected
+SAME = 'same'  # stay in the current state
+
+# Action for the handler
+TOKENIZE = 'tokenize'
+
+# Message events that come from intents.detect_intents
+_INTENT_EVENTS = {CANCEL: intents.CANCEL, CONFIRMED: intents.CONFIRM, HELP: intents.HELP, STATUS: intents.STATUS}
+
+TEMPLATES = {
+    'summary': "Please confirm:\n{summary}\nReply 'confirm' to proceed or 'cancel' to abort.",
+    'invalid': "{error}",
+    'help': (
+        "I need the {label} next, {hint}. Your card number and CVV are never shown in full "
+        "and are not kept after the payment. Say 'cancel' at any time to stop."
+    ),
+    'confirm_help': (
+        "Reply 'confirm' to make the payment, send any detail again to correct it, "
+        "or say 'cancel' to stop.\n\n{summary}"
+    ),
+    'status': "Details so far:\n{summary}\n\nNext I need the {label}.",
+    'cancelled': "No problem! Payment cancelled. Have a great day!",
+    'complete': (
+        "✅ Payment processed successfully!\n\n"
+        "Token: {token}\n"
+        "Card: {card_brand} ending in {last4}\n\n"
+        "Thank you for your payment!"
+    ),
+    'failed': "❌ Payment processing failed: {error}\n\nPlease check your card details and try again.",
+    'processing': "⏳ Processing your payment... Ask for the status in a moment to see the result.",
+    'still_processing': "⏳ Your payment is still processing. Ask again in a moment.",
+    'already_complete': "Your payment is already complete ({card}). Start a new session to make another payment.",
+    'already_cancelled': "This payment was cancelled. Start a new session to make a payment.",
+}
+
+
+class State(NamedTuple):
+    """One conversation state."""
+    name: str
+    status: str  # session status while in this state
+    events: Tuple[str, ...]  # message events it handles, checked in order
+    prompt: Optional[str] = None  # template shown on entering it; None: ask the model
+
+
+class Transition(NamedTuple):
+    """What an event does in a state."""
+    target: str  # state name, NEXT or SAME
+    reply: Optional[str] = None  # template key; None: the target state's prompt
+    action: Optional[str] = None  # side effect for the handler
+
+
+class Turn(NamedTuple):
+    """Result of PaymentFlow.handle."""
+    state: str  # state after the turn
+    reply: Optional[str]  # None: ask the model
+    hint: Optional[str]  # note appended to the user's message for the model
+    action: Optional[str]  # TOKENIZE: call PaymentFlow.finish with the result
+
+
+# Intents come before fields, so "what's my status?" is not taken as a name
+_FIELD_EVENTS = (CANCEL, HELP, STATUS, INVALID, FIELDS, MESSAGE)
+_CONFIRM_EVENTS = (CANCEL, CONFIRMED, HELP, STATUS, INVALID, FIELDS, MESSAGE)
+
+# Transitions shared by every field state
+_FIELD_TRANSITIONS = {
+    CANCEL: Transition(CANCELLED, 'cancelled'),
+    INVALID: Transition(NEXT, 'invalid'),
+    FIELDS: Transition(NEXT),
+    HELP: Transition(SAME, 'help'),
+    STATUS: Transition(SAME, 'status'),
+    MESSAGE: Transition(SAME),
+}
+
+# Confirmation, and a failed payment (which can be corrected and retried)
+_CONFIRM_TRANSITIONS = {
+    CANCEL: Transition(CANCELLED, 'cancelled'),
+    CONFIRMED: Transition(SAME, action=TOKENIZE),
+    INVALID: Transition(CONFIRM, 'invalid'),
+    FIELDS: Transition(NEXT),
+    HELP: Transition(SAME, 'confirm_help'),
+    STATUS: Transition(SAME),
+    MESSAGE: Transition(CONFIRM),
+    QUEUED: Transition(PROCESSING, 'processing'),
+    TOKENIZED: Transition(COMPLETE, 'complete'),
+    DECLINED: Transition(ERROR, 'failed'),
+}
+
+# Waiting for a queued tokenization: messages only get the status
+_PROCESSING_TRANSITIONS = {
+    MESSAGE: Transition(SAME),
+    TOKENIZED: Transition(COMPLETE, 'complete'),
+    DECLINED: Transition(ERROR, 'failed'),
+}
+
+
+class PaymentFlow:
+    """Declarative payment conversation over a configurable list of fields."""
+
+    def __init__(self, fields: Iterable[str] = DEFAULT_FIELDS, templates: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            fields: Keys of FIELD_SPECS to collect, in order
+            templates: Overrides for TEMPLATES
+        """
+        fields = tuple(fields)
+        unknown = [key for key in fields if key not in FIELD_SPECS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown payment fields {unknown}; known: {', '.join(FIELD_SPECS)}")
+        self.extractor = FieldExtractor([FIELD_SPECS[key] for key in fields])
+        self.templates = {**TEMPLATES, **(templates or {})}
+
+        states = [State(key, 'collecting', _FIELD_EVENTS) for key in fields] + [
+            State(CONFIRM, 'awaiting_confirmation', _CONFIRM_EVENTS, prompt='summary'),
+            State(ERROR, 'error', _CONFIRM_EVENTS, prompt='summary'),
+            State(PROCESSING, 'processing', (MESSAGE,), prompt='still_processing'),
+            State(COMPLETE, 'complete', (MESSAGE,), prompt='already_complete'),
+            State(CANCELLED, 'cancelled', (MESSAGE,), prompt='already_cancelled'),
+        ]
+        self.states = {state.name: state for state in states}
+
+        self.transitions: Dict[Tuple[str, str], Transition] = {}
+        for key in fields:
+            for event, transition in _FIELD_TRANSITIONS.items():
+                self.transitions[key, event] = transition
+        for name in (CONFIRM, ERROR):
+            for event, transition in _CONFIRM_TRANSITIONS.items():
+                self.transitions[name, event] = transition
+        for event, transition in _PROCESSING_TRANSITIONS.items():
+            self.transitions[PROCESSING, event] = transition
+        for name in (COMPLETE, CANCELLED):
+            self.transitions[name, MESSAGE] = Transition(SAME)
+
+    @classmethod
+    def from_config(cls, value: str) -> 'PaymentFlow':
+        """Flow from a comma-separated field list ("name,card,expiry,cvv,zip")."""
+        fields = [key.strip().lower() for key in value.split(',') if key.strip()]
+        return cls(fields or DEFAULT_FIELDS)
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        return self.extractor.keys
+
+    def state_of(self, session: Dict[str, Any]) -> str:
+        """
+        Current state of a session.
+
+        Terminal and error states come from the status, the others from the
+        current step. A step this flow does not collect (the field list
+        changed since the session started) resumes at the first missing field.
+        """
+        status = session.get('status')
+        if status in (COMPLETE, CANCELLED, ERROR, PROCESSING):
+            return status
+        step = session.get('currentStep')
+        if step in self.fields or step == CONFIRM:
+            return step
+        return self._next(session['collectedData'])
+
+    def handle(self, session: Dict[str, Any], message: str) -> Turn:
+        """
+        Run one user message through the state machine.
+
+        Updates the session's collected data, current step and status.
+
+        Args:
+            session: Session with 'collectedData', 'currentStep' and 'status'
+            message: User's message
+
+        Returns:
+            Turn with the reply, or the note for the model when the reply
+            should come from the model
+        """
+        state = self.state_of(session)
+        event, extraction = self._event(state, session, message)
+        transition = self.transitions[state, event]
+        if extraction is not None:
+            self.extractor.apply(session['collectedData'], extraction.fields)
+
+        target = self._target(transition.target, state, session)
+        if transition.action is None:
+            self._enter(session, target)
+
+        context = {}
+        if extraction is not None and extraction.errors:
+            context['error'] = next(iter(extraction.errors.values()))
+        reply_key = transition.reply or self.states[target].prompt
+        if target in self.extractor.specs:
+            context.update(label=self.extractor.specs[target].label, hint=self.extractor.specs[target].hint)
+        reply = self.render(reply_key, session, context) if reply_key and not transition.action else None
+
+        hint = None
+        if reply is None and event == FIELDS and target in self.fields:
+            received = ', '.join(self.extractor.specs[key].label for key in extraction.fields)
+            hint = f"[SYSTEM: Received {received}. Next ask for the {self.extractor.specs[target].label}.]"
+        return Turn(target, reply, hint, transition.action)
+
+    def queued(self, session: Dict[str, Any]) -> str:
+        """
+        Move a TOKENIZE turn to processing, for tokenization on a queue.
+
+        Returns:
+            Reply for the user
+        """
+        transition = self.transitions[self.state_of(session), QUEUED]
+        self._enter(session, transition.target)
+        return self.render(transition.reply, session)
+
+    def finish(self, session: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """
+        Apply a tokenization result after a TOKENIZE turn, or to a session
+        in processing.
+
+        On success the card number is masked and the CVV removed before the
+        session is saved.
+
+        Args:
+            session: Session the turn ran on
+            result: tokenize_payment result ('success', then 'token',
+                'card_brand' and 'last4', or 'error')
+
+        Returns:
+            Reply for the user
+        """
+        state = self.state_of(session)
+        event = TOKENIZED if result['success'] else DECLINED
+        transition = self.transitions[state, event]
+        self._enter(session, transition.target)
+        if transition.target == COMPLETE:
+            collected = session['collectedData']
+            session['paymentToken'] = result['token']
+            if 'card' in collected:
+                collected['card'] = mask_card_number(collected['card'])
+            collected.pop('cvv', None)  # Never store CVV
+        return self.render(transition.reply, session, result)
+
+    def render(self, key: str, session: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+        """Fill in a template from the session and extra values."""
+        collected = session['collectedData']
+        summary = '\n'.join(
+            f"{spec.title}: {spec.display(collected[spec.key])}"
+            for spec in self.extractor.fields if spec.key in collected
+        )
+        values = {'summary': summary or '(none yet)', 'card': collected.get('card', ''), **(context or {})}
+        return self.templates[key].format(**values)
+
+    def _event(self, state: str, session: Dict[str, Any], message: str) -> Tuple[str, Optional[Extraction]]:
+        """First event of the state's list that the message triggers."""
+        found = None
+        extraction = None
+        for event in self.states[state].events:
+            if event in _INTENT_EVENTS:
+                if found is None:
+                    found = intents.detect_intents(message)
+                if _INTENT_EVENTS[event] in found:
+                    return event, extraction
+            elif event in (INVALID, FIELDS):
+                if extraction is None:
+                    step = state if state in self.extractor.specs else None
+                    extraction = self.extractor.extract(
+                        message, step, session['collectedData'], correcting=state in (CONFIRM, ERROR)
+                    )
+                if event == INVALID and extraction.errors:
+                    return event, extraction
+                if event == FIELDS and extraction.fields:
+                    return event, extraction
+            else:
+                return event, extraction
+        return MESSAGE, extraction
+
+    def _next(self, collected: Dict[str, str]) -> str:
+        return self.extractor.next_field(collected) or CONFIRM
+
+    def _target(self, target: str, state: str, session: Dict[str, Any]) -> str:
+        if target == SAME:
+            return state
+        if target == NEXT:
+            return self._next(session['collectedData'])
+        return target
+
+    def _enter(self, session: Dict[str, Any], target: str) -> None:
+        session['status'] = self.states[target].status
+        if target in self.fields or target == CONFIRM:
+            session['currentStep'] = target
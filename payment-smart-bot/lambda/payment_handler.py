@@ -7,15 +7,25 @@ It uses Amazon Bedrock for natural language processing and implements PCI-DSS
 compliant payment validation.
 """
 
+import hashlib
 import json
 import os
+import time
 import boto3
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Any, Optional
 from datetime import datetime
-from calendar import monthrange
-import re
 import threading
-import stripe
+import uuid
+
+import inference_profiles
+import metrics
+# The validators moved to card_validation; re-exported for existing imports
+from card_validation import luhn_checksum, mask_card_number, validate_cvv, validate_expiry  # noqa: F401
+from payment_flow import PROCESSING, TOKENIZE, PaymentFlow
+from session_store import DEFAULT_ITEM_LIMIT, IDEMPOTENCY_PREFIX, REQUEST_DONE, SessionStore
+from tokenization_queue import LocalQueue, RateLimiter, SqsQueue, TokenizationJob
 
 # Load .env file for local testing (ignored in Lambda)
 try:
@@ -26,18 +36,65 @@ except ImportError:
 
 # Initialize AWS clients
 bedrock_runtime = boto3.client('bedrock-runtime', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+dynamodb = boto3.client('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
 secrets_manager = boto3.client('secretsmanager', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
 
 # Configuration
 MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'meta.llama3-2-1b-instruct-v1:0')
 SESSION_TABLE = os.environ.get('DYNAMODB_TABLE', 'payment-bot-sessions')
 STRIPE_SECRET_ARN = os.environ.get('STRIPE_SECRET_ARN', '')
+SESSION_ITEM_LIMIT = int(os.environ.get('SESSION_ITEM_LIMIT_BYTES', str(DEFAULT_ITEM_LIMIT)))
+# Sessions expire this long after their last turn (0: never)
+SESSION_TTL_SECONDS = int(float(os.environ.get('SESSION_TTL_HOURS', '1')) * 3600)
+
+session_store = SessionStore(dynamodb, SESSION_TABLE, max_item_bytes=SESSION_ITEM_LIMIT,
+                             ttl_seconds=SESSION_TTL_SECONDS)
+
+# Responses to requests with an Idempotency-Key are kept this long for replay
+IDEMPOTENCY_TTL_SECONDS = int(float(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24')) * 3600)
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+DEFAULT_LEASE_SECONDS = 60  # when the remaining invocation time is unknown (local runs)
+
+# Fields to collect, in order (see field_extraction.FIELD_SPECS); the state
+# machine is built once per container
+payment_flow = PaymentFlow.from_config(os.environ.get('PAYMENT_BOT_FIELDS', 'name,card,expiry,cvv'))
+
+# Tokenization on the confirm turn: "inline" (during the request), "sqs"
+# (answer "processing", the worker Lambda tokenizes from TOKENIZE_QUEUE_URL)
+# or "local" (same, with an in-process worker pool, for local runs)
+TOKENIZE_MODE = os.environ.get('TOKENIZE_MODE', 'inline').lower()
+TOKENIZE_QUEUE_URL = os.environ.get('TOKENIZE_QUEUE_URL', '')
+TOKENIZE_WORKERS = int(os.environ.get('TOKENIZE_WORKERS', '2'))  # local mode
+TOKENIZE_RATE = float(os.environ.get('TOKENIZE_RATE_PER_SECOND', '5'))  # per worker process
+
+# Tokenization queue (created on the first queued confirmation)
+_tokenize_queue = None
+_tokenize_queue_lock = threading.Lock()
+_tokenize_limiter = RateLimiter(TOKENIZE_RATE)
+
+# Bedrock prompt caching (cachePoint blocks): "auto" (model families that
+# support it), "on" or "off"
+PROMPT_CACHE_MODE = os.environ.get('BEDROCK_PROMPT_CACHE', 'auto').lower()
+PROMPT_CACHE_MODELS = ('anthropic.claude', 'amazon.nova')
+
+# Inference settings: "adaptive" (profile per kind of turn, token caps from
+# inference_profiles.json) or "fixed" (512 tokens, temperature 0.5 always)
+INFERENCE_PROFILE_MODE = os.environ.get('BEDROCK_INFERENCE_PROFILES', 'adaptive').lower()
+INFERENCE_PROFILES = inference_profiles.load_profiles()
+
+# Pre-initialization during the init phase: "auto" (only under provisioned
+# concurrency, where init is free), "on" or "off"
+PREINIT_MODE = os.environ.get('PAYMENT_BOT_PREINIT', 'auto').lower()
+PREINIT_TIMEOUT = float(os.environ.get('PAYMENT_BOT_PREINIT_TIMEOUT', '3'))  # seconds
 
 # Cache for Stripe key (fetch once, reuse across invocations)
 _stripe_key_cache = None
 _stripe_key_cache_lock = threading.Lock()
 
+# Stripe SDK (lazy load, only needed to tokenize)
+stripe = None
+_stripe_lock = threading.Lock()
+
 # System prompt for the payment bot
 SYSTEM_PROMPT = """You are a polite and secure payment assistant. Your job is to collect payment information step-by-step:
 
@@ -57,88 +114,34 @@ Rules:
 
 Be conversational but efficient. Make users feel their payment is secure."""
 
+CACHE_POINT = {"cachePoint": {"type": "default"}}
 
-def luhn_checksum(card_number: str) -> bool:
-    """
-    Validate credit card number using Luhn algorithm.
-    
-    Args:
-        card_number: Card number as string (spaces will be stripped)
-    
-    Returns:
-        True if valid, False otherwise
-    """
-    def digits_of(n):
-        return [int(d) for d in str(n)]
-    
-    card_number = card_number.replace(' ', '').replace('-', '')
-    
-    if not card_number.isdigit() or len(card_number) < 13 or len(card_number) > 19:
-        return False
-    
-    digits = digits_of(card_number)
-    odd_digits = digits[-1::-2]
-    even_digits = digits[-2::-2]
-    checksum = sum(odd_digits)
-    
-    for d in even_digits:
-        checksum += sum(digits_of(d * 2))
-    
-    return checksum % 10 == 0
+# System blocks, built once: with a cache checkpoint after the prompt, and
+# without for models that do not cache
+SYSTEM_BLOCKS = [{"text": SYSTEM_PROMPT}]
+SYSTEM_BLOCKS_CACHED = SYSTEM_BLOCKS + [CACHE_POINT]
 
 
-def validate_expiry(expiry: str) -> bool:
-    """
-    Validate expiry date format (MM/YY) and check if not expired.
-    Uses last day of the expiry month for accurate validation.
-    
-    Args:
-        expiry: Date string in MM/YY format
-    
-    Returns:
-        True if valid and not expired
-    """
-    pattern = r'^(0[1-9]|1[0-2])/([0-9]{2})$'
-    match = re.match(pattern, expiry)
-    
-    if not match:
-        return False
-    
-    month = int(match.group(1))
-    year = int('20' + match.group(2))
-    
-    # Get last day of the expiry month
-    last_day = monthrange(year, month)[1]
-    expiry_date = datetime(year, month, last_day)
-    
-    # Compare with current date (set time to midnight for accurate comparison)
-    now = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    return expiry_date >= now
+def prompt_cache_supported(model_id: str) -> bool:
+    """Whether to send cache checkpoints to a model (BEDROCK_PROMPT_CACHE)."""
+    if PROMPT_CACHE_MODE in ('on', 'true', '1'):
+        return True
+    if PROMPT_CACHE_MODE == 'auto':
+        return any(family in model_id for family in PROMPT_CACHE_MODELS)
+    return False
 
 
-def validate_cvv(cvv: str, card_number: str) -> bool:
-    """
-    Validate CVV format (3 digits for most cards, 4 for Amex).
-    
-    Args:
-        cvv: CVV string
-        card_number: Card number to determine card type
-    
-    Returns:
-        True if valid format
-    """
-    # Amex cards start with 34 or 37 and use 4-digit CVV
-    is_amex = card_number.startswith(('34', '37'))
-    expected_length = 4 if is_amex else 3
-    
-    return cvv.isdigit() and len(cvv) == expected_length
+# Cleared if the model rejects cache checkpoints or stop sequences (for
+# this container)
+_prompt_cache_enabled = prompt_cache_supported(MODEL_ID)
+_stop_sequences_enabled = True
 
 
-def mask_card_number(card_number: str) -> str:
-    """Mask all but last 4 digits of card number."""
-    clean = card_number.replace(' ', '').replace('-', '')
-    return '****' + clean[-4:]
+def inference_profile(state: str, hint: Optional[str]) -> inference_profiles.InferenceProfile:
+    """Inference settings for a turn the model answers (BEDROCK_INFERENCE_PROFILES)."""
+    if INFERENCE_PROFILE_MODE != 'adaptive':
+        return INFERENCE_PROFILES[inference_profiles.DEFAULT]
+    return INFERENCE_PROFILES[inference_profiles.choose(state, hint, payment_flow.fields)]
 
 
 def get_stripe_key() -> str:
@@ -171,17 +174,38 @@ def get_stripe_key() -> str:
             return ""
 
 
-def tokenize_payment(collected_data: Dict[str, str]) -> Dict[str, Any]:
+def get_stripe():
+    """
+    Import the Stripe SDK on first use.
+    
+    Returns:
+        The stripe module
+    """
+    global stripe
+    
+    with _stripe_lock:
+        if stripe is None:
+            import stripe as stripe_sdk
+            stripe = stripe_sdk
+    return stripe
+
+
+def tokenize_payment(collected_data: Dict[str, str], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
     """
     Tokenize payment data using Stripe API with test tokens.
     Uses pre-generated test tokens for development/testing safety.
     
     Args:
-        collected_data: Dict with 'name', 'card', 'expiry', 'cvv'
+        collected_data: Dict with 'name', 'card', 'expiry', 'cvv' and
+            optionally 'zip'
+        idempotency_key: Stripe idempotency key; a repeated call with the
+            same key returns the first PaymentMethod instead of a new one
     
     Returns:
         Dict with 'success' bool and either 'token' or 'error'
     """
+    stripe = get_stripe()
+    
     try:
         # Set Stripe API key
         stripe.api_key = get_stripe_key()
@@ -219,6 +243,10 @@ def tokenize_payment(collected_data: Dict[str, str]) -> Dict[str, Any]:
             print(f"Test token lookup failed: {error_msg}")
             return {"success": False, "error": error_msg}
         
+        billing_details = {"name": collected_data['name']}
+        if collected_data.get('zip'):
+            billing_details["address"] = {"postal_code": collected_data['zip']}
+        
         # Create PaymentMethod using test token instead of raw card data
         # This is the safe way to tokenize in test mode
         payment_method = stripe.PaymentMethod.create(
@@ -226,9 +254,8 @@ def tokenize_payment(collected_data: Dict[str, str]) -> Dict[str, Any]:
             card={
                 "token": test_token,  # Use test token instead of raw card data
             },
-            billing_details={
-                "name": collected_data['name']
-            }
+            billing_details=billing_details,
+            idempotency_key=idempotency_key
         )
         
         print(f"Stripe PaymentMethod created with test token: {payment_method.id}")
@@ -257,12 +284,83 @@ def tokenize_payment(collected_data: Dict[str, str]) -> Dict[str, Any]:
         return {"success": False, "error": "Payment processing failed"}
 
 
+def get_tokenize_queue():
+    """
+    Queue for asynchronous tokenization (thread-safe, created once).
+    
+    Returns:
+        SqsQueue or LocalQueue, or None to tokenize inline
+    """
+    global _tokenize_queue
+    
+    if TOKENIZE_MODE not in ('sqs', 'local'):
+        return None
+    with _tokenize_queue_lock:
+        if _tokenize_queue is None:
+            if TOKENIZE_MODE == 'local':
+                _tokenize_queue = LocalQueue(process_tokenization_job, workers=TOKENIZE_WORKERS, rate=TOKENIZE_RATE)
+            elif TOKENIZE_QUEUE_URL:
+                sqs = boto3.client('sqs', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+                _tokenize_queue = SqsQueue(sqs, TOKENIZE_QUEUE_URL)
+            else:
+                print("Warning: TOKENIZE_MODE is sqs but TOKENIZE_QUEUE_URL is not set; tokenizing inline")
+    return _tokenize_queue
+
+
+def process_tokenization_job(job: TokenizationJob) -> None:
+    """
+    Tokenize a queued confirmation and record the result in its session.
+    
+    Jobs for sessions that are no longer processing (already handled by an
+    earlier delivery, or expired) are skipped. The job's Stripe key makes a
+    repeated call return the first PaymentMethod.
+    
+    Raises:
+        RuntimeError: if the result could not be saved (the job is retried)
+    """
+    session = get_session(job.session_id)
+    if session is None or session.get('status') != PROCESSING:
+        print(f"Skipping tokenization job for session {job.session_id}: not processing")
+        return
+    
+    result = tokenize_payment(session['collectedData'], idempotency_key=job.stripe_key)
+    bot_response = payment_flow.finish(session, result)
+    conversation_history = session.get('conversationHistory', [])
+    conversation_history.append({"role": "assistant", "text": bot_response})
+    session['conversationHistory'] = conversation_history[-10:]
+    
+    if not save_session(job.session_id, session):
+        raise RuntimeError(f"Could not save tokenization result for session {job.session_id}")
+    print(f"Tokenization job for session {job.session_id}: {session['status']} "
+          f"after {time.time() - job.enqueued_at:.2f} s in queue and processing")
+
+
+def tokenize_worker(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    SQS handler of the tokenization worker Lambda.
+    
+    Jobs are started at most TOKENIZE_RATE_PER_SECOND per instance; the
+    event source mapping's maximum concurrency bounds the instances.
+    
+    Returns:
+        Partial batch response: the jobs to deliver again
+    """
+    failures = []
+    for record in event.get('Records', []):
+        try:
+            job = TokenizationJob.decode(record['body'])
+            _tokenize_limiter.acquire()
+            process_tokenization_job(job)
+        except Exception as e:
+            print(f"Tokenization job {record.get('messageId')} failed: {e}")
+            failures.append({'itemIdentifier': record['messageId']})
+    return {'batchItemFailures': failures}
+
+
 def get_session(session_id: str) -> Optional[Dict[str, Any]]:
-    """Retrieve session data from DynamoDB."""
+    """Retrieve session data from DynamoDB (None if missing or expired)."""
     try:
-        table = dynamodb.Table(SESSION_TABLE)
-        response = table.get_item(Key={'sessionId': session_id})
-        return response.get('Item')
+        return session_store.get(session_id)
     except Exception as e:
         print(f"Error getting session: {e}")
         return None
@@ -271,54 +369,144 @@ def get_session(session_id: str) -> Optional[Dict[str, Any]]:
 def save_session(session_id: str, session_data: Dict[str, Any]) -> bool:
     """Save session data to DynamoDB (non-sensitive data only)."""
     try:
-        table = dynamodb.Table(SESSION_TABLE)
         session_data['sessionId'] = session_id
         session_data['lastUpdated'] = datetime.utcnow().isoformat()
-        table.put_item(Item=session_data)
+        session_store.put(session_data)
         return True
     except Exception as e:
         print(f"Error saving session: {e}")
         return False
 
 
-def invoke_bedrock(conversation_history: list, user_message: str) -> str:
+def get_idempotency_key(event: Dict[str, Any], body: Dict[str, Any]) -> Optional[str]:
+    """
+    Idempotency key of a request: the Idempotency-Key header (any case), or
+    'idempotencyKey' in the body for direct invocations.
+    
+    Returns:
+        The key, or None if the request has none
+    
+    Raises:
+        ValueError: if the key is empty, too long or not printable ASCII
+    """
+    headers = event.get('headers') or {}
+    key = next((value for name, value in headers.items() if name.lower() == 'idempotency-key'), None)
+    if key is None:
+        key = body.get('idempotencyKey')
+    if key is None:
+        return None
+    key = str(key).strip()
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH or not key.isprintable() or not key.isascii():
+        raise ValueError(f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} printable ASCII characters")
+    return key
+
+
+def stripe_idempotency_key(session_id: str, idempotency_key: str) -> str:
+    """Stripe idempotency key for a turn (fixed length, no raw session id)."""
+    digest = hashlib.sha256(f"{session_id}#{idempotency_key}".encode('utf-8')).hexdigest()
+    return f"payment-bot-{digest}"
+
+
+def build_messages(conversation_history: list, user_message: str, cache: bool) -> list:
+    """
+    Converse messages for a turn.
+    
+    With cache, a checkpoint follows the history, so the next turn (same
+    history plus this exchange) reads the prefix from the cache.
+    """
+    messages = [
+        {
+            "role": "user" if msg["role"] == "user" else "assistant",
+            "content": [{"text": msg["text"]}]
+        }
+        for msg in conversation_history
+    ]
+    if cache and messages:
+        messages[-1]["content"].append(CACHE_POINT)
+    
+    # Add current user message
+    messages.append({
+        "role": "user",
+        "content": [{"text": user_message}]
+    })
+    return messages
+
+
+def is_unsupported(error: ClientError, feature: str) -> bool:
+    """Whether Bedrock rejected a request for a feature ('cach', 'stop')."""
+    return (error.response['Error']['Code'] == 'ValidationException'
+            and feature in error.response['Error'].get('Message', '').lower())
+
+
+def record_bedrock_usage(response: Dict[str, Any], profile: inference_profiles.InferenceProfile,
+                         cache: bool, elapsed_ms: float) -> None:
+    """
+    Token counts (cache reads and writes included), latency and whether the
+    reply hit the token cap, as metrics by model and profile.
+    """
+    usage = response.get('usage', {})
+    stop_reason = response.get('stopReason')
+    metrics.emit(
+        {
+            'InputTokens': usage.get('inputTokens', 0),
+            'OutputTokens': usage.get('outputTokens', 0),
+            'CacheReadInputTokens': usage.get('cacheReadInputTokens', 0),
+            'CacheWriteInputTokens': usage.get('cacheWriteInputTokens', 0),
+            'BedrockLatency': response.get('metrics', {}).get('latencyMs', elapsed_ms),
+            'Truncated': 1 if stop_reason == 'max_tokens' else 0,
+        },
+        dimensions={'ModelId': MODEL_ID, 'Profile': profile.name},
+        properties={'promptCache': cache, 'maxTokens': profile.max_tokens, 'stopReason': stop_reason},
+    )
+
+
+def invoke_bedrock(conversation_history: list, user_message: str,
+                   profile: Optional[inference_profiles.InferenceProfile] = None) -> str:
     """
     Call Amazon Bedrock with Llama 3.2 1B for conversational response.
     
+    Where the model supports prompt caching, the system prompt and the
+    history are sent with cache checkpoints. A model that rejects them, or
+    the profile's stop sequences, gets the request again without, and none
+    for the rest of the container's life.
+    
     Args:
         conversation_history: List of prior messages
         user_message: Current user input
+        profile: Inference settings (default: 512 tokens, temperature 0.5)
     
     Returns:
         Bot's response as string
     """
-    try:
-        # Build messages array for Bedrock Converse API
-        messages = [
-            {
-                "role": "user" if msg["role"] == "user" else "assistant",
-                "content": [{"text": msg["text"]}]
-            }
-            for msg in conversation_history
-        ]
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": [{"text": user_message}]
-        })
-        
-        # Call Bedrock
-        response = bedrock_runtime.converse(
+    global _prompt_cache_enabled, _stop_sequences_enabled
+    
+    profile = profile or INFERENCE_PROFILES[inference_profiles.DEFAULT]
+    
+    def converse(cache, stop):
+        return bedrock_runtime.converse(
             modelId=MODEL_ID,
-            messages=messages,
-            system=[{"text": SYSTEM_PROMPT}],
-            inferenceConfig={
-                "temperature": 0.5,
-                "maxTokens": 512,
-                "topP": 0.9
-            }
+            messages=build_messages(conversation_history, user_message, cache),
+            system=SYSTEM_BLOCKS_CACHED if cache else SYSTEM_BLOCKS,
+            inferenceConfig=profile.config(stop)
         )
+    
+    try:
+        cache, stop = _prompt_cache_enabled, _stop_sequences_enabled
+        started = time.perf_counter()
+        while True:
+            try:
+                response = converse(cache, stop)
+                break
+            except ClientError as e:
+                if cache and is_unsupported(e, 'cach'):
+                    print(f"Prompt caching not supported by {MODEL_ID}, sending without: {e}")
+                    _prompt_cache_enabled = cache = False
+                elif stop and profile.stop_sequences and is_unsupported(e, 'stop'):
+                    print(f"Stop sequences not supported by {MODEL_ID}, sending without: {e}")
+                    _stop_sequences_enabled = stop = False
+                else:
+                    raise
+        record_bedrock_usage(response, profile, cache, (time.perf_counter() - started) * 1000)
         
         # Extract response text (handle multi-content responses)
         output_message = response.get('output', {}).get('message', {})
@@ -337,45 +525,6 @@ def invoke_bedrock(conversation_history: list, user_message: str) -> str:
         return "I apologize, but I'm having trouble processing that. Could you try again?"
 
 
-def extract_payment_info(text: str, current_step: str) -> Optional[str]:
-    """
-    Extract payment information from user input based on current collection step.
-    
-    Args:
-        text: User's message
-        current_step: What info we're collecting (name, card, expiry, cvv)
-    
-    Returns:
-        Extracted value or None
-    """
-    text = text.strip()
-    
-    if current_step == "card":
-        # Extract digits only
-        digits = re.sub(r'[^\d]', '', text)
-        if len(digits) >= 13:
-            return digits
-    
-    elif current_step == "expiry":
-        # Look for MM/YY pattern
-        match = re.search(r'(0[1-9]|1[0-2])/([0-9]{2})', text)
-        if match:
-            return match.group(0)
-    
-    elif current_step == "cvv":
-        # Extract 3-4 digit number
-        match = re.search(r'\b([0-9]{3,4})\b', text)
-        if match:
-            return match.group(1)
-    
-    elif current_step == "name":
-        # Basic name extraction (2+ words)
-        if len(text.split()) >= 2 and not any(char.isdigit() for char in text):
-            return text.title()
-    
-    return None
-
-
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Main Lambda handler for payment bot.
@@ -386,12 +535,19 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         "message": "user input text"
     }
     
+    With an Idempotency-Key header, a repeated request (a client retry)
+    gets the first response back instead of running the turn again, and
+    409 while the first is still in progress.
+    
+    {"sessionId": "...", "action": "status"} returns the session's status
+    and last reply without running a turn (polling while processing).
+    
     Returns:
     {
         "statusCode": 200,
         "body": {
             "response": "bot response",
-            "status": "collecting|validating|complete|error",
+            "status": "collecting|awaiting_confirmation|processing|complete|error|cancelled",
             "sessionId": "session-id"
         }
     }
@@ -403,6 +559,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             body = event
         
+        if body.get('action') == 'status':
+            if not body.get('sessionId'):
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'No sessionId provided'})
+                }
+            return session_status(body['sessionId'])
+        
         session_id = body.get('sessionId', f"session-{datetime.now().timestamp()}")
         user_message = body.get('message', '').strip()
         
@@ -411,146 +575,62 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'statusCode': 400,
                 'body': json.dumps({'error': 'No message provided'})
             }
-        
-        # Get or create session
-        session = get_session(session_id) or {
-            'conversationHistory': [],
-            'collectedData': {},
-            'currentStep': 'name',
-            'status': 'collecting'
-        }
-        
-        # Check for cancel/abort (expanded synonyms)
-        cancel_words = {'cancel', 'stop', 'quit', 'abort', 'exit', 'no', 'nevermind', 'never mind'}
-        if any(word in user_message.lower() for word in cancel_words):
-            session['status'] = 'cancelled'
-            save_session(session_id, session)
+        if session_id.startswith(IDEMPOTENCY_PREFIX):
             return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'response': 'No problem! Payment cancelled. Have a great day!',
-                    'status': 'cancelled',
-                    'sessionId': session_id
-                })
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Invalid sessionId'})
+            }
+        try:
+            idempotency_key = get_idempotency_key(event, body)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
             }
         
-        # Extract payment info based on current step
-        current_step = session['currentStep']
-        extracted = extract_payment_info(user_message, current_step)
-        
-        # Validate if we got data
-        validation_error = None
-        if extracted:
-            if current_step == 'card':
-                if not luhn_checksum(extracted):
-                    validation_error = "That card number doesn't pass validation. Could you double-check it?"
-                else:
-                    session['collectedData']['card'] = extracted
-                    session['currentStep'] = 'expiry'
-            
-            elif current_step == 'expiry':
-                if not validate_expiry(extracted):
-                    validation_error = "That expiry date seems invalid or expired. Please use MM/YY format."
-                else:
-                    session['collectedData']['expiry'] = extracted
-                    session['currentStep'] = 'cvv'
-            
-            elif current_step == 'cvv':
-                card = session['collectedData'].get('card', '')
-                if not validate_cvv(extracted, card):
-                    validation_error = "CVV should be 3 digits (4 for Amex). Please try again."
-                else:
-                    session['collectedData']['cvv'] = extracted
-                    session['currentStep'] = 'confirm'
-            
-            elif current_step == 'name':
-                session['collectedData']['name'] = extracted
-                session['currentStep'] = 'card'
-        
-        # Build conversation history for Bedrock
-        conversation_history = session.get('conversationHistory', [])
-        
-        # Add validation context if needed
-        if validation_error:
-            user_message_for_ai = f"{user_message} [SYSTEM: Validation failed - {validation_error}]"
-        else:
-            user_message_for_ai = user_message
-        
-        # Get AI response
-        bot_response = invoke_bedrock(conversation_history, user_message_for_ai)
-        
-        # Override with validation error if present
-        if validation_error:
-            bot_response = validation_error
-        
-        # Update conversation history (store only non-sensitive parts)
-        conversation_history.append({"role": "user", "text": user_message})
-        conversation_history.append({"role": "assistant", "text": bot_response})
-        session['conversationHistory'] = conversation_history[-10:]  # Keep last 10 messages
-        
-        # Check if we're at confirmation step
-        if session['currentStep'] == 'confirm':
-            collected = session['collectedData']
-            if all(k in collected for k in ['name', 'card', 'expiry', 'cvv']):
-                # Show summary with masked data
-                summary = (
-                    f"Please confirm:\n"
-                    f"Name: {collected['name']}\n"
-                    f"Card: {mask_card_number(collected['card'])}\n"
-                    f"Expiry: {collected['expiry']}\n"
-                    f"CVV: ***\n"
-                    f"Reply 'confirm' to proceed or 'cancel' to abort."
-                )
-                bot_response = summary
-                session['status'] = 'awaiting_confirmation'
+        if idempotency_key is None:
+            return process_message(session_id, user_message)
         
-        # Handle final confirmation
-        if session.get('status') == 'awaiting_confirmation' and 'confirm' in user_message.lower():
-            # Tokenize payment data with Stripe
-            collected_data = session['collectedData']
-            tokenization_result = tokenize_payment(collected_data)
-            
-            if tokenization_result['success']:
-                session['status'] = 'complete'
-                session['paymentToken'] = tokenization_result['token']
-                
-                bot_response = (
-                    f"✅ Payment processed successfully!\n\n"
-                    f"Token: {tokenization_result['token']}\n"
-                    f"Card: {tokenization_result['card_brand']} ending in {tokenization_result['last4']}\n\n"
-                    f"Thank you for your payment!"
-                )
-                
-                # Remove sensitive data from session before saving
-                if 'card' in collected_data:
-                    collected_data['card'] = mask_card_number(collected_data['card'])
-                if 'cvv' in collected_data:
-                    collected_data.pop('cvv')  # Never store CVV
-            else:
-                # Tokenization failed
-                bot_response = (
-                    f"❌ Payment processing failed: {tokenization_result['error']}\n\n"
-                    f"Please check your card details and try again."
-                )
-                session['status'] = 'error'
+        # Claim the key for the rest of this invocation; a duplicate gets the
+        # stored response (or 409 while the first request is running)
+        lease = context.get_remaining_time_in_millis() / 1000 if context else DEFAULT_LEASE_SECONDS
+        try:
+            record = session_store.claim_request(session_id, idempotency_key, lease)
+        except Exception as e:
+            # Dedup is best effort; tokenization still has its Stripe key
+            print(f"Error claiming idempotency key: {e}")
+            return process_message(session_id, user_message, idempotency_key)
+        
+        if record is not None:
+            if record.state == REQUEST_DONE:
+                print(f"Replaying response for idempotency key {idempotency_key}")
+                response = record.response
+                response['headers'] = {**response.get('headers', {}), 'Idempotent-Replayed': 'true'}
+                return response
+            return {
+                'statusCode': 409,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Retry-After': '1'
+                },
+                'body': json.dumps({'error': 'A request with this Idempotency-Key is still in progress'})
+            }
         
-        # Save session
-        save_session(session_id, session)
+        try:
+            response = process_message(session_id, user_message, idempotency_key)
+        except Exception:
+            try:
+                session_store.release_request(session_id, idempotency_key)
+            except Exception as e:
+                print(f"Error releasing idempotency key: {e}")
+            raise
         
-        # Return response
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'response': bot_response,
-                'status': session['status'],
-                'sessionId': session_id,
-                'currentStep': session['currentStep']
-            })
-        }
+        try:
+            session_store.complete_request(session_id, idempotency_key, response, IDEMPOTENCY_TTL_SECONDS)
+        except Exception as e:
+            print(f"Error storing idempotent response: {e}")
+        return response
     
     except Exception as e:
         # Log the full error with stack trace
@@ -564,6 +644,183 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         raise Exception(f"Payment handler error: {str(e)}") from e
 
 
+def process_message(session_id: str, user_message: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run one conversation turn and save the session.
+    
+    Args:
+        session_id: Session identifier
+        user_message: User input (non-empty)
+        idempotency_key: Request's Idempotency-Key; also keys the Stripe call
+    
+    Returns:
+        API Gateway response
+    """
+    # Get or create session
+    session = get_session(session_id) or {
+        'conversationHistory': [],
+        'collectedData': {},
+        'currentStep': payment_flow.fields[0],
+        'status': 'collecting'
+    }
+    
+    # One state machine step: updates the session and picks the reply
+    turn = payment_flow.handle(session, user_message)
+    conversation_history = session.get('conversationHistory', [])
+    
+    if turn.state == PROCESSING and turn.action is None:
+        # The worker owns the session until it records the result: answer
+        # without saving, so its update is not overwritten
+        return turn_response(session_id, session, turn.reply)
+    
+    tokenize_queue = None
+    if turn.action == TOKENIZE:
+        # Confirmed on the summary: tokenize payment data with Stripe, or
+        # queue it and answer "processing"
+        tokenize_queue = get_tokenize_queue()
+        if tokenize_queue is not None:
+            stripe_key = stripe_idempotency_key(session_id, idempotency_key or uuid.uuid4().hex)
+            bot_response = payment_flow.queued(session)
+        else:
+            stripe_key = stripe_idempotency_key(session_id, idempotency_key) if idempotency_key else None
+            result = tokenize_payment(session['collectedData'], idempotency_key=stripe_key)
+            bot_response = payment_flow.finish(session, result)
+    elif turn.reply is None:
+        user_message_for_ai = f"{user_message} {turn.hint}" if turn.hint else user_message
+        bot_response = invoke_bedrock(conversation_history, user_message_for_ai,
+                                      inference_profile(turn.state, turn.hint))
+    else:
+        bot_response = turn.reply
+    
+    # Update conversation history (store only non-sensitive parts)
+    conversation_history.append({"role": "user", "text": user_message})
+    conversation_history.append({"role": "assistant", "text": bot_response})
+    session['conversationHistory'] = conversation_history[-10:]  # Keep last 10 messages
+    
+    # Save session
+    saved = save_session(session_id, session)
+    
+    if tokenize_queue is not None:
+        # Queued only once the worker can read the processing session
+        try:
+            if not saved:
+                raise RuntimeError("session not saved")
+            tokenize_queue.put(TokenizationJob(session_id, stripe_key, time.time()))
+        except Exception as e:
+            print(f"Error queueing tokenization, tokenizing inline: {e}")
+            result = tokenize_payment(session['collectedData'], idempotency_key=stripe_key)
+            bot_response = payment_flow.finish(session, result)
+            session['conversationHistory'][-1] = {"role": "assistant", "text": bot_response}
+            save_session(session_id, session)
+    
+    return turn_response(session_id, session, bot_response)
+
+
+def session_status(session_id: str) -> Dict[str, Any]:
+    """
+    Status of a session and its last reply, without running a turn.
+    
+    Returns:
+        API Gateway response (404 if the session is missing or expired)
+    """
+    session = get_session(session_id)
+    if session is None:
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Session not found'})
+        }
+    last_reply = next(
+        (msg['text'] for msg in reversed(session.get('conversationHistory', [])) if msg['role'] == 'assistant'),
+        None
+    )
+    return turn_response(session_id, session, last_reply)
+
+
+def turn_response(session_id: str, session: Dict[str, Any], bot_response: Optional[str]) -> Dict[str, Any]:
+    """API Gateway response with a reply and the session's status."""
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'response': bot_response,
+            'status': session['status'],
+            'sessionId': session_id,
+            'currentStep': session['currentStep']
+        })
+    }
+
+
+def preinit_enabled() -> bool:
+    """
+    Whether to pre-initialize during the init phase.
+    
+    Returns:
+        True for PAYMENT_BOT_PREINIT=on, or =auto under provisioned concurrency
+    """
+    if PREINIT_MODE in ('on', 'true', '1'):
+        return True
+    if PREINIT_MODE == 'auto':
+        return os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency'
+    return False
+
+
+def pre_initialize() -> Dict[str, float]:
+    """
+    Move first-request work into the init phase.
+    
+    Imports Stripe, fetches the Stripe key and opens a TLS connection to
+    DynamoDB, Secrets Manager and Bedrock. Stripe
+    itself is not called (no API requests during init). Failures are logged
+    and left for the first request to retry. Network steps run in parallel
+    and init waits at most PREINIT_TIMEOUT seconds for them.
+    
+    Returns:
+        Duration of each step in ms (None if it did not finish in time)
+    """
+    def timed(step):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Pre-initialization step failed: {e}")
+        return round((time.perf_counter() - started) * 1000, 1)
+    
+    def warm_dynamodb():
+        # Any key works; a miss still costs only a GetItem
+        session_store.get('__preinit__')
+    
+    def warm_bedrock():
+        try:
+            bedrock_runtime.list_async_invokes(maxResults=1)
+        except ClientError:
+            pass  # AccessDenied still leaves a warm connection
+    
+    started = time.perf_counter()
+    timings = {'stripe_import_ms': timed(get_stripe)}
+    
+    steps = {'dynamodb_ms': warm_dynamodb, 'secret_ms': get_stripe_key, 'bedrock_ms': warm_bedrock}
+    pool = ThreadPoolExecutor(max_workers=len(steps))
+    futures = {name: pool.submit(timed, step) for name, step in steps.items()}
+    done, _ = wait(futures.values(), timeout=PREINIT_TIMEOUT)
+    pool.shutdown(wait=False)
+    timings.update({name: future.result() if future in done else None for name, future in futures.items()})
+    timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    print(f"Pre-initialization complete: {json.dumps(timings)}")
+    return timings
+
+
+if preinit_enabled():
+    pre_initialize()
+
+
 # For local testing
 if __name__ == "__main__":
     # Test event
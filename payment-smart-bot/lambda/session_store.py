@@ -0,0 +1,501 @@
+"""
+Session persistence for the payment bot.
+
+Talks to DynamoDB through one low-level client and one table name instead
+of building a boto3 Table resource per request.
+
+Items are written in a compact, versioned encoding (version 2): besides the
+sessionId key, an item holds a schema version number and one binary
+attribute. The binary attribute is a codec byte followed by the encoded
+session. Steps, statuses and message roles are stored as small integers,
+and the timestamp as epoch microseconds. The payload is msgpack + zstd when
+both packages are installed, and JSON + deflate otherwise. Compression is
+only used when it makes the payload smaller.
+
+Older items are still read:
+  - version 1: typed attributes, history as zlib-compressed JSON
+  - version 0: typed attributes, history as a DynamoDB list of maps
+
+Writes are kept under a configurable item size. Over it, the oldest history
+messages are dropped; if the session still does not fit, SessionTooLarge is
+raised.
+
+With a TTL configured, every write sets the table's "ttl" attribute (epoch
+seconds) to now + TTL, so a session expires a fixed time after its last
+turn. DynamoDB deletes expired items only eventually (typically within a
+few days), so reads treat an item past its ttl as absent.
+
+The same table also holds idempotency records, one per retried-safe request,
+keyed "idem#<sessionId>#<Idempotency-Key>". A request claims its record with
+a conditional write before it runs; a duplicate finds the record and replays
+the stored response instead of running the turn again.
+"""
+
+import json
+import math
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+# Optional: smaller and faster than JSON + deflate, not in the Lambda package
+# by default
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = None
+    zstandard = None
+
+# Built once, reused for every item
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+SCHEMA_VERSION = 2
+VERSION_ATTRIBUTE = 'v'
+DATA_ATTRIBUTE = 'd'
+
+HISTORY_ATTRIBUTE = 'history'  # version 1
+LEGACY_HISTORY_ATTRIBUTE = 'conversationHistory'  # version 0, list of maps
+
+# Top-level string attributes of a version 0/1 session item
+STRING_ATTRIBUTES = ('sessionId', 'currentStep', 'status', 'lastUpdated', 'paymentToken')
+
+HISTORY_COMPRESSION_LEVEL = 6
+
+# Codec byte at the start of the data attribute
+CODEC_JSON = 0
+CODEC_JSON_DEFLATE = 1
+CODEC_MSGPACK = 2
+CODEC_MSGPACK_ZSTD = 3
+ZSTD_LEVEL = 3
+
+# Append only: the position is what gets stored
+STEPS = ('name', 'card', 'expiry', 'cvv', 'confirm')
+STATUSES = ('collecting', 'awaiting_confirmation', 'complete', 'error', 'cancelled', 'processing')
+ROLES = ('user', 'assistant')
+
+STEP_CODES = {step: code for code, step in enumerate(STEPS)}
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+EPOCH = datetime(1970, 1, 1)
+
+MAX_ITEM_BYTES = 400 * 1024  # DynamoDB hard limit
+# Only guards the DynamoDB limit: history is kept whole unless a smaller
+# limit is configured (e.g. 4096 to stay within one read unit)
+DEFAULT_ITEM_LIMIT = MAX_ITEM_BYTES
+
+
+TTL_ATTRIBUTE = 'ttl'  # the table's TTL attribute (epoch seconds)
+
+# Idempotency records
+IDEMPOTENCY_PREFIX = 'idem#'
+REQUEST_PENDING = 'pending'
+REQUEST_DONE = 'done'
+
+
+class SessionTooLarge(ValueError):
+    """Raised when a session does not fit the item size limit even without history."""
+
+
+class RequestRecord(NamedTuple):
+    """Idempotency record of a request that was already claimed."""
+    state: str  # REQUEST_PENDING or REQUEST_DONE
+    response: Optional[Dict[str, Any]]  # stored response, once done
+
+
+def encode_history(history: List[Dict[str, str]]) -> bytes:
+    """
+    Serialize conversation history to compact compressed bytes (version 1).
+
+    Args:
+        history: List of {"role": ..., "text": ...} messages
+
+    Returns:
+        zlib-compressed JSON
+    """
+    payload = json.dumps(history, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return zlib.compress(payload, HISTORY_COMPRESSION_LEVEL)
+
+
+def decode_history(blob: bytes) -> List[Dict[str, str]]:
+    """Inverse of encode_history."""
+    return json.loads(zlib.decompress(blob))
+
+
+def _encode_code(value: Any, codes: Dict[str, int]) -> Any:
+    # Unknown values are stored as-is, so new steps never fail to save
+    return codes.get(value, value) if isinstance(value, str) else value
+
+
+def _decode_code(value: Any, names: tuple) -> Any:
+    return names[value] if isinstance(value, int) and 0 <= value < len(names) else value
+
+
+def _encode_timestamp(value: Any) -> Any:
+    """Naive ISO timestamp -> epoch microseconds, if that round-trips exactly."""
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return value
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _decode_timestamp(value: Any) -> Any:
+    if isinstance(value, int):
+        return (EPOCH + timedelta(microseconds=value)).isoformat()
+    return value
+
+
+def _encode_message(message: Dict[str, Any]) -> Any:
+    if set(message) == {'role', 'text'} and message['role'] in ROLE_CODES:
+        return [ROLE_CODES[message['role']], message['text']]
+    return message
+
+
+def _decode_message(message: Any) -> Dict[str, Any]:
+    if isinstance(message, list):
+        return {'role': ROLES[message[0]], 'text': message[1]}
+    return message
+
+
+def pack_session(session: Dict[str, Any]) -> List[Any]:
+    """
+    Session dict -> compact positional form (without sessionId).
+
+    Layout: [step, status, collectedData, history, lastUpdated, other attributes]
+    """
+    known = ('sessionId', 'currentStep', 'status', 'collectedData', LEGACY_HISTORY_ATTRIBUTE, 'lastUpdated')
+    return [
+        _encode_code(session.get('currentStep'), STEP_CODES),
+        _encode_code(session.get('status'), STATUS_CODES),
+        session.get('collectedData'),
+        [_encode_message(m) for m in session.get(LEGACY_HISTORY_ATTRIBUTE) or []],
+        _encode_timestamp(session.get('lastUpdated')),
+        {k: v for k, v in session.items() if k not in known and v is not None},
+    ]
+
+
+def unpack_session(packed: List[Any]) -> Dict[str, Any]:
+    """Inverse of pack_session."""
+    step, status, collected, history, updated, other = packed
+    session = {
+        'currentStep': _decode_code(step, STEPS),
+        'status': _decode_code(status, STATUSES),
+        'collectedData': collected,
+        LEGACY_HISTORY_ATTRIBUTE: [_decode_message(m) for m in history],
+        'lastUpdated': _decode_timestamp(updated),
+    }
+    session = {k: v for k, v in session.items() if v is not None}
+    session.update(other)
+    return session
+
+
+def encode_payload(packed: List[Any]) -> bytes:
+    """
+    Encode a packed session: codec byte + body.
+
+    Compression is skipped when it would not make the body smaller, which is
+    the case for sessions that have just started.
+    """
+    if msgpack is not None:
+        raw = msgpack.packb(packed, use_bin_type=True)
+        compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+        if len(compressed) < len(raw):
+            return bytes([CODEC_MSGPACK_ZSTD]) + compressed
+        return bytes([CODEC_MSGPACK]) + raw
+
+    raw = json.dumps(packed, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    deflate = zlib.compressobj(HISTORY_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = deflate.compress(raw) + deflate.flush()
+    if len(compressed) < len(raw):
+        return bytes([CODEC_JSON_DEFLATE]) + compressed
+    return bytes([CODEC_JSON]) + raw
+
+
+def decode_payload(blob: bytes) -> List[Any]:
+    """Inverse of encode_payload."""
+    codec, body = blob[0], blob[1:]
+    if codec == CODEC_JSON:
+        return json.loads(body)
+    if codec == CODEC_JSON_DEFLATE:
+        return json.loads(zlib.decompress(body, -zlib.MAX_WBITS))
+    if codec in (CODEC_MSGPACK, CODEC_MSGPACK_ZSTD):
+        if msgpack is None:
+            raise RuntimeError("Session was written with msgpack; install msgpack and zstandard to read it")
+        if codec == CODEC_MSGPACK_ZSTD:
+            body = zstandard.ZstdDecompressor().decompress(body)
+        return msgpack.unpackb(body, raw=False)
+    raise ValueError(f"Unknown session codec: {codec}")
+
+
+def serialize_session(session: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert a session dict to a DynamoDB wire-format item (version 2).
+
+    Args:
+        session: Session data as used by the handler; must contain 'sessionId'
+
+    Returns:
+        Item for the low-level client's put_item
+    """
+    return {
+        'sessionId': {'S': session['sessionId']},
+        VERSION_ATTRIBUTE: {'N': str(SCHEMA_VERSION)},
+        DATA_ATTRIBUTE: {'B': encode_payload(pack_session(session))},
+    }
+
+
+def serialize_session_v1(session: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Version 1 item: typed attributes with compressed history.
+
+    No longer written by the store; kept for comparisons and tests of the
+    legacy read path.
+    """
+    item = {}
+    for key, value in session.items():
+        if value is None:
+            continue
+        if key == LEGACY_HISTORY_ATTRIBUTE:
+            item[HISTORY_ATTRIBUTE] = {'B': encode_history(value)}
+        elif key in STRING_ATTRIBUTES:
+            item[key] = {'S': str(value)}
+        elif key == 'collectedData' and all(isinstance(v, str) for v in value.values()):
+            item[key] = {'M': {k: {'S': v} for k, v in value.items()}}
+        else:
+            item[key] = _serializer.serialize(value)
+    return item
+
+
+def deserialize_session(item: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert a DynamoDB wire-format item back to a session dict.
+
+    Reads version 2 items as well as legacy version 1 (compressed history
+    attribute) and version 0 (history as a list of maps) items.
+
+    Args:
+        item: Item from the low-level client's get_item
+
+    Returns:
+        Session data with 'conversationHistory' as a list of messages
+    """
+    if VERSION_ATTRIBUTE in item:
+        version = int(item[VERSION_ATTRIBUTE]['N'])
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported session schema version: {version}")
+        session = unpack_session(decode_payload(item[DATA_ATTRIBUTE]['B']))
+        session['sessionId'] = item['sessionId']['S']
+        return session
+
+    session = {}
+    for key, value in item.items():
+        if key == TTL_ATTRIBUTE:
+            continue
+        if key == HISTORY_ATTRIBUTE:
+            session[LEGACY_HISTORY_ATTRIBUTE] = decode_history(value['B'])
+        elif 'S' in value:
+            session[key] = value['S']
+        elif key == 'collectedData' and 'M' in value and all('S' in v for v in value['M'].values()):
+            session[key] = {k: v['S'] for k, v in value['M'].items()}
+        else:
+            session[key] = _deserializer.deserialize(value)
+    return session
+
+
+def _value_size(value: Dict[str, Any]) -> int:
+    (kind, data), = value.items()
+    if kind == 'S':
+        return len(data.encode('utf-8'))
+    if kind == 'B':
+        return len(data)
+    if kind == 'N':
+        return (len(data.lstrip('-').replace('.', '')) + 1) // 2 + 1
+    if kind in ('BOOL', 'NULL'):
+        return 1
+    if kind == 'M':
+        return 3 + sum(len(k.encode('utf-8')) + _value_size(v) + 1 for k, v in data.items())
+    if kind == 'L':
+        return 3 + sum(_value_size(v) + 1 for v in data)
+    if kind in ('SS', 'BS'):
+        return sum(len(v.encode('utf-8') if kind == 'SS' else v) for v in data)
+    if kind == 'NS':
+        return sum(_value_size({'N': v}) for v in data)
+    raise ValueError(f"Unknown DynamoDB type: {kind}")
+
+
+def item_size(item: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Approximate stored size of a wire-format item, following DynamoDB's
+    item size rules (attribute names + values, 400 KB limit).
+    """
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def is_expired(item: Dict[str, Dict[str, Any]], now: Optional[float] = None) -> bool:
+    """Whether a wire-format item is past its TTL (items without one never expire)."""
+    ttl = item.get(TTL_ATTRIBUTE)
+    if ttl is None or 'N' not in ttl:
+        return False
+    return int(ttl['N']) <= (time.time() if now is None else now)
+
+
+def write_units(size: int) -> int:
+    """Write capacity units for one write of an item of this size (1 KB each)."""
+    return max(1, math.ceil(size / 1024))
+
+
+def read_units(size: int, consistent: bool = False) -> float:
+    """Read capacity units for one read (4 KB each, halved when eventually consistent)."""
+    units = max(1, math.ceil(size / 4096))
+    return units if consistent else units / 2
+
+
+class SessionStore:
+    """DynamoDB session table accessed through a shared low-level client."""
+
+    def __init__(self, client: Any, table_name: str, max_item_bytes: int = DEFAULT_ITEM_LIMIT,
+                 ttl_seconds: Optional[int] = None):
+        """
+        Args:
+            client: boto3 DynamoDB client
+            table_name: Session table
+            max_item_bytes: Largest item written (capped at the DynamoDB limit)
+            ttl_seconds: Session lifetime after its last write; None or 0
+                writes no ttl attribute
+        """
+        self.client = client
+        self.table_name = table_name
+        self.max_item_bytes = min(max_item_bytes, MAX_ITEM_BYTES)
+        self.ttl_seconds = ttl_seconds or None
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a session.
+
+        Returns:
+            Session dict, or None if not found or expired
+        """
+        response = self.client.get_item(TableName=self.table_name, Key={'sessionId': {'S': session_id}})
+        item = response.get('Item')
+        if not item or is_expired(item):
+            return None
+        return deserialize_session(item)
+
+    def encode(self, session: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Serialize a session within the item size limit.
+
+        Drops the oldest history messages until the item fits. Sets the
+        ttl attribute when the store has a TTL.
+
+        Raises:
+            SessionTooLarge: if the item is over the limit even without history
+        """
+        extra = {}
+        if self.ttl_seconds:
+            extra[TTL_ATTRIBUTE] = {'N': str(int(time.time()) + self.ttl_seconds)}
+        item = {**serialize_session(session), **extra}
+        size = item_size(item)
+        history = session.get(LEGACY_HISTORY_ATTRIBUTE) or []
+        dropped = 0
+        while size > self.max_item_bytes and dropped < len(history):
+            dropped += 1
+            item = {**serialize_session({**session, LEGACY_HISTORY_ATTRIBUTE: history[dropped:]}), **extra}
+            size = item_size(item)
+        if size > self.max_item_bytes:
+            raise SessionTooLarge(
+                f"Session {session['sessionId']} is {size} bytes, over the {self.max_item_bytes} byte limit"
+            )
+        if dropped:
+            print(f"Session {session['sessionId']}: dropped {dropped} history messages "
+                  f"to fit {self.max_item_bytes} bytes ({size} bytes)")
+        return item
+
+    def put(self, session: Dict[str, Any]) -> None:
+        """Write a session; it must contain 'sessionId'."""
+        self.client.put_item(TableName=self.table_name, Item=self.encode(session))
+
+    def _request_key(self, session_id: str, key: str) -> Dict[str, Dict[str, str]]:
+        return {'sessionId': {'S': f"{IDEMPOTENCY_PREFIX}{session_id}#{key}"}}
+
+    def claim_request(self, session_id: str, key: str, lease_seconds: float) -> Optional[RequestRecord]:
+        """
+        Claim an idempotency key before processing a request.
+
+        One conditional write: it succeeds if the key is new or its record
+        has expired, including a claim whose lease ran out without finishing
+        (the invocation died). Otherwise the existing record comes back with
+        the error, so a duplicate costs a single write request.
+
+        Args:
+            session_id: Session the request belongs to
+            key: Client's Idempotency-Key
+            lease_seconds: How long the claim blocks duplicates if never finished
+
+        Returns:
+            None if claimed (process the request), else the existing record
+        """
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    **self._request_key(session_id, key),
+                    'state': {'S': REQUEST_PENDING},
+                    TTL_ATTRIBUTE: {'N': str(now + math.ceil(lease_seconds))},  # the lease
+                },
+                ConditionExpression='attribute_not_exists(sessionId) OR #ttl <= :now',
+                ExpressionAttributeNames={'#ttl': TTL_ATTRIBUTE},
+                ExpressionAttributeValues={':now': {'N': str(now)}},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            item = e.response.get('Item')
+        if item is None:
+            item = self.client.get_item(
+                TableName=self.table_name, Key=self._request_key(session_id, key), ConsistentRead=True
+            ).get('Item')
+        if item is None or is_expired(item):  # deleted or expired in between
+            return self.claim_request(session_id, key, lease_seconds)
+        response = None
+        if 'response' in item:
+            response = json.loads(zlib.decompress(item['response']['B'], -zlib.MAX_WBITS))
+        return RequestRecord(item['state']['S'], response)
+
+    def complete_request(self, session_id: str, key: str, response: Dict[str, Any], ttl_seconds: int) -> None:
+        """Store the response of a claimed request for replay to duplicates."""
+        deflate = zlib.compressobj(HISTORY_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        blob = deflate.compress(json.dumps(response, separators=(',', ':')).encode('utf-8')) + deflate.flush()
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                **self._request_key(session_id, key),
+                'state': {'S': REQUEST_DONE},
+                'response': {'B': blob},
+                TTL_ATTRIBUTE: {'N': str(int(time.time()) + ttl_seconds)},
+            },
+        )
+
+    def release_request(self, session_id: str, key: str) -> None:
+        """Drop a claim whose request failed, so a retry can run it."""
+        self.client.delete_item(
+            TableName=self.table_name,
+            Key=self._request_key(session_id, key),
+            ConditionExpression='#state = :pending',
+            ExpressionAttributeNames={'#state': 'state'},
+            ExpressionAttributeValues={':pending': {'S': REQUEST_PENDING}},
+        )
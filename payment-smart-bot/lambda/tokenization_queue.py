@@ -0,0 +1,116 @@
+"""
+Asynchronous tokenization jobs for the payment bot.
+
+In queued mode the confirm turn saves the session as "processing", puts a
+job on a queue and answers right away. A worker then tokenizes the card
+and records the result in the session. Jobs carry only the session id and
+the Stripe idempotency key: the worker reads the card details from the
+session, so they never travel through the queue.
+
+Two queues share one interface:
+  - SqsQueue: jobs go to SQS and a separate worker Lambda (event source
+    mapping with a maximum concurrency) processes them
+  - LocalQueue: an in-process stand-in with a bounded worker pool, for local
+    runs and benchmarks. Inside Lambda the process is frozen between
+    invocations, so it is not meant for deployment.
+
+Both workers apply a token-bucket rate limit per process.
+"""
+
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class TokenizationJob(NamedTuple):
+    """One queued tokenization."""
+    session_id: str
+    stripe_key: Optional[str]  # Stripe idempotency key, so redelivery cannot tokenize twice
+    enqueued_at: float  # epoch seconds
+
+    def encode(self) -> str:
+        return json.dumps(self._asdict(), separators=(',', ':'))
+
+    @classmethod
+    def decode(cls, body: str) -> 'TokenizationJob':
+        return cls(**json.loads(body))
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` jobs per second, bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, waiting for it if needed.
+
+        Returns:
+            Seconds waited
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class SqsQueue:
+    """Jobs sent to an SQS queue, processed by the worker Lambda."""
+
+    def __init__(self, client: Any, queue_url: str):
+        self.client = client
+        self.queue_url = queue_url
+
+    def put(self, job: TokenizationJob) -> None:
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=job.encode())
+
+
+class LocalQueue:
+    """In-process queue with a bounded, rate-limited worker pool."""
+
+    def __init__(self, process: Callable[[TokenizationJob], Any], workers: int = 2, rate: float = 5.0):
+        """
+        Args:
+            process: Called with each job on a worker thread; exceptions are
+                logged and the job is dropped
+            workers: Jobs processed at the same time
+            rate: Jobs started per second, across all workers
+        """
+        self.process = process
+        self.jobs: 'queue.Queue[TokenizationJob]' = queue.Queue()
+        self.limiter = RateLimiter(rate)
+        self.threads = [
+            threading.Thread(target=self._work, name=f"tokenize-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, job: TokenizationJob) -> None:
+        self.jobs.put(job)
+
+    def join(self) -> None:
+        """Wait until every queued job has been processed."""
+        self.jobs.join()
+
+    def _work(self) -> None:
+        while True:
+            job = self.jobs.get()
+            try:
+                self.limiter.acquire()
+                self.process(job)
+            except Exception as e:
+                print(f"Tokenization job for session {job.session_id} failed: {e}")
+            finally:
+                self.jobs.task_done()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Bulk card validation benchmark
+
+Generates card numbers, expiry dates and CVVs (valid and invalid, across
+card networks, with spaces, dashes and non-ASCII edge cases), checks that
+lambda/bulk_validation.py agrees with the scalar functions in
+lambda/card_validation.py and the BIN index in lambda/card_networks.py on
+every row, and compares throughput.
+
+Needs NumPy (not part of the Lambda package).
+
+Usage:
+    python benchmark_bulk_validation.py
+    python benchmark_bulk_validation.py --rows 1000000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+import bulk_validation
+from card_networks import card_network, cvv_length
+from card_validation import luhn_checksum, validate_cvv, validate_expiry
+
+# Inputs the scalar functions handle in non-obvious ways
+EDGE_CASES = [
+    ("4242 4242 4242 4242", "12/28", "123"),
+    ("4242-4242-4242-4242", "12/28\n", "123"),  # "$" matches before a final newline
+    ("3782 822463 10005", "03/29", "1234"),  # Amex, 4-digit CVV
+    ("378282246310005", "03/29", "123"),
+    ("", "", ""),
+    ("4242424242424242\x00", "12/28\x00", "12\x00"),
+    ("٤٢٤٢٤٢٤٢٤٢٤٢٤٢٤٢", "١٢/٢٨", "١٢٣"),  # Arabic-Indic digits pass isdigit()
+    ("4242²42424242424", "12/28", "12³"),  # isdigit() but not int()
+    ("4242\t4242 4242 4242", " 12/28", "123 "),
+    ("00/28", "13/28", "00/00"),
+    ("1234567890123", "01/00", "9999"),
+    ("34", "12/99", "1234"),
+    (" 3782-822463-10005", "03/29", "1234"),  # network ignores spaces and dashes
+    ("2223003122003222", "05/30", "123"),  # Mastercard 2-series
+    ("6221260000000000", "05/30", "123"),  # Discover range inside UnionPay's 62
+    ("3", "05/30", "123"),
+]
+
+
+def luhn_digit(partial):
+    """Check digit that makes partial + digit pass Luhn"""
+    total = 0
+    for i, ch in enumerate(reversed(partial)):
+        d = int(ch)
+        if i % 2 == 0:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return str((10 - total % 10) % 10)
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    cards, expiries, cvvs = [], [], []
+    year = datetime.now().year % 100
+    for _ in range(count):
+        prefix, length = rng.choice([
+            ("4", 16), ("4", 13), ("4", 19), ("51", 16), ("2221", 16), ("34", 15), ("37", 15),
+            ("6011", 16), ("65", 16), ("3528", 16), ("62", 17), ("36", 14), ("9", 16),
+        ])
+        partial = prefix + "".join(rng.choice("0123456789") for _ in range(length - len(prefix) - 1))
+        card = partial + luhn_digit(partial)
+        roll = rng.random()
+        if roll < 0.1:
+            card = card[:-1] + str((int(card[-1]) + 1) % 10)  # fails Luhn
+        elif roll < 0.2:
+            card = " ".join(card[i:i + 4] for i in range(0, len(card), 4))
+        elif roll < 0.25:
+            card = "-".join(card[i:i + 4] for i in range(0, len(card), 4))
+        elif roll < 0.28:
+            card = card[:rng.randrange(len(card))]
+        elif roll < 0.30:
+            card = card[:5] + "x" + card[6:]
+        cards.append(card)
+
+        month, yy = rng.randint(0, 13), (year + rng.randint(-3, 8)) % 100
+        expiry = f"{month:02d}/{yy:02d}"
+        if rng.random() < 0.05:
+            expiry = rng.choice([f"{month}/{yy:02d}", f"{month:02d}/20{yy:02d}", f"{month:02d}-{yy:02d}"])
+        expiries.append(expiry)
+
+        digits = cvv_length(card)
+        if rng.random() < 0.1:
+            digits = rng.choice([2, 3, 4, 5])
+        cvv = "".join(rng.choice("0123456789") for _ in range(digits))
+        if rng.random() < 0.02:
+            cvv = cvv[:-1] + "a"
+        cvvs.append(cvv)
+    for card, expiry, cvv in EDGE_CASES:
+        cards.append(card)
+        expiries.append(expiry)
+        cvvs.append(cvv)
+    return cards, expiries, cvvs
+
+
+def scalar_validate(cards, expiries, cvvs):
+    card_ok, expiry_ok, cvv_ok, networks = [], [], [], []
+    for card, expiry, cvv in zip(cards, expiries, cvvs):
+        network = card_network(card)
+        networks.append(network.key if network else None)
+        try:
+            card_ok.append(luhn_checksum(card))
+        except ValueError:
+            card_ok.append(False)  # see bulk_validation._card_reason
+        expiry_ok.append(validate_expiry(expiry))
+        cvv_ok.append(validate_cvv(cvv, card))
+    return card_ok, expiry_ok, cvv_ok, networks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk card validation benchmark")
+    parser.add_argument("--rows", type=int, default=200_000, help="generated rows (default: 200000)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    cards, expiries, cvvs = make_rows(args.rows, args.seed)
+    rows = len(cards)
+
+    started = time.perf_counter()
+    card_ok, expiry_ok, cvv_ok, networks = scalar_validate(cards, expiries, cvvs)
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = bulk_validation.validate_bulk(cards, expiries, cvvs)
+    bulk_s = time.perf_counter() - started
+
+    keys = bulk_validation.network_keys()
+    bulk_networks = [keys[n] if n >= 0 else None for n in result.network.tolist()]
+    mismatches = [
+        (i, field)
+        for field, expected, actual in (
+            ("card", card_ok, result.card_valid.tolist()),
+            ("expiry", expiry_ok, result.expiry_valid.tolist()),
+            ("cvv", cvv_ok, result.cvv_valid.tolist()),
+            ("network", networks, bulk_networks),
+        )
+        for i in range(rows)
+        if expected[i] != actual[i]
+    ]
+    reason_names = bulk_validation.REASONS
+    counts = {name: int((result.reason == code).sum()) for code, name in enumerate(reason_names)}
+
+    print(f"{rows} rows ({len(EDGE_CASES)} edge cases)")
+    print(f"  scalar    {scalar_s:8.3f} s  {rows / scalar_s:>12,.0f} rows/s")
+    print(f"  bulk      {bulk_s:8.3f} s  {rows / bulk_s:>12,.0f} rows/s  ({scalar_s / bulk_s:.1f}x)")
+    print("  reasons   " + ", ".join(f"{name} {count}" for name, count in counts.items() if count))
+    network_counts = {key: bulk_networks.count(key) for key in keys + [None]}
+    print("  networks  " + ", ".join(f"{key or 'unknown'} {count}" for key, count in network_counts.items()))
+    if mismatches:
+        for i, field in mismatches[:10]:
+            print(f"[FAIL] row {i} {field}: {cards[i]!r} {expiries[i]!r} {cvvs[i]!r}")
+        print(f"[FAIL] {len(mismatches)} mismatches with the scalar functions")
+        return 1
+    print("[PASS] bulk results match the scalar functions on every row")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Intent detection benchmark
+
+Checks lambda/intents.py against the labeled messages in
+tests/intent_corpus.json (cancel, confirm, help, status, or none), compares
+it with the substring checks the handler used before (any cancel word in the
+message, 'confirm' in the message), and measures throughput of both.
+
+Exits non-zero if any labeled message is misclassified.
+
+Usage:
+    python benchmark_intents.py
+    python benchmark_intents.py --iterations 2000 --verbose
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+from intents import INTENTS, detect_intents
+
+CORPUS = Path(__file__).resolve().parents[1] / "tests" / "intent_corpus.json"
+
+LEGACY_CANCEL_WORDS = {'cancel', 'stop', 'quit', 'abort', 'exit', 'no', 'nevermind', 'never mind'}
+
+
+def legacy_intents(text):
+    """The substring checks the handler used before intents.py (cancel and confirm only)."""
+    lowered = text.lower()
+    found = set()
+    if any(word in lowered for word in LEGACY_CANCEL_WORDS):
+        found.add('cancel')
+    if 'confirm' in lowered:
+        found.add('confirm')
+    return frozenset(found)
+
+
+def score(classify, messages, intents):
+    """Per-intent true/false positives and false negatives, plus wrong messages."""
+    counts = {intent: {'tp': 0, 'fp': 0, 'fn': 0} for intent in intents}
+    wrong = []
+    for message in messages:
+        expected = set(message['intents']) & set(intents)
+        got = set(classify(message['text'])) & set(intents)
+        for intent in intents:
+            if intent in got and intent in expected:
+                counts[intent]['tp'] += 1
+            elif intent in got:
+                counts[intent]['fp'] += 1
+            elif intent in expected:
+                counts[intent]['fn'] += 1
+        if got != expected:
+            wrong.append((message['text'], sorted(expected), sorted(got)))
+    return counts, wrong
+
+
+def throughput(classify, texts, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            classify(text)
+    elapsed = time.perf_counter() - started
+    return len(texts) * iterations / elapsed, elapsed / (len(texts) * iterations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent detection benchmark")
+    parser.add_argument("--iterations", type=int, default=500, help="passes over the corpus (default: 500)")
+    parser.add_argument("--verbose", action="store_true", help="list every legacy misclassification")
+    args = parser.parse_args()
+
+    messages = json.loads(CORPUS.read_text(encoding="utf-8"))["messages"]
+    texts = [message["text"] for message in messages]
+    print(f"{len(messages)} labeled messages ({CORPUS.name})")
+
+    counts, wrong = score(detect_intents, messages, INTENTS)
+    legacy_counts, legacy_wrong = score(legacy_intents, messages, ('cancel', 'confirm'))
+    legacy_wrong.sort(key=lambda wrong_message: not wrong_message[2])  # false positives first
+
+    print(f"\n{'intent':10} {'tp':>4} {'fp':>4} {'fn':>4}   legacy tp   fp   fn")
+    for intent in INTENTS:
+        c = counts[intent]
+        legacy = legacy_counts.get(intent)
+        legacy_text = f"{legacy['tp']:>11} {legacy['fp']:>4} {legacy['fn']:>4}" if legacy else f"{'-':>11}"
+        print(f"{intent:10} {c['tp']:>4} {c['fp']:>4} {c['fn']:>4} {legacy_text}")
+    print(f"\nmisclassified: intents.py {len(wrong)}, legacy substring checks {len(legacy_wrong)} "
+          f"(cancel and confirm only)")
+    for text, expected, got in legacy_wrong if args.verbose else legacy_wrong[:8]:
+        print(f"  legacy: {text!r} expected {expected or 'none'}, got {got or 'none'}")
+
+    rate, per = throughput(detect_intents, texts, args.iterations)
+    legacy_rate, legacy_per = throughput(legacy_intents, texts, args.iterations)
+    print(f"\nthroughput ({args.iterations} passes)")
+    print(f"  intents.py   {rate:>12,.0f} msg/s  {per:6.2f} µs/msg")
+    print(f"  legacy       {legacy_rate:>12,.0f} msg/s  {legacy_per:6.2f} µs/msg")
+
+    if wrong:
+        for text, expected, got in wrong:
+            print(f"[FAIL] {text!r}: expected {expected or 'none'}, got {got or 'none'}")
+        return 1
+    print("[PASS] every labeled message classified correctly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Session store microbenchmark
+
+Compares three session item formats:
+  - list of maps: a boto3 Table resource built per request, history stored
+    as a DynamoDB list of maps (version 0)
+  - v1 compressed: typed attributes, zlib-compressed history (version 1)
+  - v2 compact: one versioned binary attribute with enum-coded steps and
+    statuses (version 2, what lambda/session_store.py writes)
+on:
+  - serialize / deserialize cost of a session item
+  - client-side cost of a full put_item + get_item round trip, with
+    DynamoDB answered in-process (no network)
+  - stored item size
+and reports the item size distribution and read/write capacity per turn over
+whole conversations, one per customer in tests/mock_data.json: the short
+scripted payment, and long sessions where the customer asks --questions
+questions first and the model answers in full paragraphs. Capacity is
+billed in 1 KB write and 4 KB read units, so the encoding only saves
+capacity once items outgrow one unit, as the long sessions do.
+
+Usage:
+    python benchmark_session_store.py
+    python benchmark_session_store.py --messages 2 10 50 --iterations 2000
+    python benchmark_session_store.py --history-limit 50 --questions 8
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.awsrequest import AWSResponse
+
+import session_store
+
+TABLE = "payment-bot-sessions-bench"
+
+MOCK_DATA = Path(__file__).resolve().parents[1] / "tests" / "mock_data.json"
+
+BOT_TURNS = [
+    "Great! I'll help you with that. What's the name on your card?",
+    "Thanks, John. Please enter your card number. Your details are encrypted and never stored.",
+    "Got it, card ending in 4242. What's the expiry date (MM/YY)?",
+    "Thanks! Finally, please enter the 3-digit security code on the back of your card.",
+    "Please confirm:\nName: John Smith\nCard: ****4242\nExpiry: 12/28\nCVV: ***\nReply 'confirm' to proceed.",
+]
+# Model answers to questions asked during collection (a few hundred characters)
+QUESTIONS = [
+    "Is it safe to type my card number here?",
+    "Why do you need the CVV if you already have the card number?",
+    "Can I use a debit card instead of a credit card?",
+    "What happens if the payment fails?",
+    "Will I get a receipt by email?",
+]
+LONG_REPLIES = [
+    "Yes. Your card number is sent over an encrypted connection and handed straight to Stripe, our payment "
+    "processor, which turns it into a one-time token. We never store the full number: once the payment is "
+    "made only the last four digits are kept so you can recognize the card later. When you're ready, please "
+    "send the card number and we'll continue from there.",
+    "The CVV is the 3 or 4 digit security code printed on your card. Card networks ask for it to check that "
+    "the card is physically in your hands, which protects you if someone else learned the number. It is "
+    "only used for this one authorization and is discarded right after, it is never saved with your "
+    "details. You'll find it on the back of most cards, or on the front above the number for American Express.",
+    "Absolutely. Any Visa, Mastercard, American Express, Discover, JCB, UnionPay or Diners card works, debit "
+    "or credit. With a debit card the amount is usually taken from your account straight away instead of "
+    "appearing on a monthly statement, and some banks may ask you to approve the payment in their app. "
+    "Just send the card number when you're ready and I'll take it from there.",
+    "If the payment fails, nothing is charged. I'll tell you what the bank or Stripe reported, for example an "
+    "expired card, insufficient funds or a declined authorization, and you can correct any detail and try "
+    "again, or use a different card. Your session stays open, so you won't have to start over or re-enter "
+    "the details that were correct. If it keeps failing, your bank can tell you more about the reason.",
+    "Yes. As soon as the payment goes through you'll see a confirmation here with the last four digits of the "
+    "card and a reference number, and a receipt is sent to the email address on your account. If you don't "
+    "see it within a few minutes, please check your spam folder. You can also ask me for the payment status "
+    "at any time using your session ID.",
+]
+USER_TURNS = ["I want to make a payment", "John Smith", "4242 4242 4242 4242", "12/28", "123", "confirm"]
+
+
+def make_session(messages):
+    history = []
+    for i in range(messages):
+        if i % 2 == 0:
+            history.append({"role": "user", "text": USER_TURNS[(i // 2) % len(USER_TURNS)]})
+        else:
+            history.append({"role": "assistant", "text": BOT_TURNS[(i // 2) % len(BOT_TURNS)]})
+    return {
+        "sessionId": "3f1c2a9e-8d4b-4e57-9a61-0c2f7b5d9e13",
+        "conversationHistory": history,
+        "collectedData": {"name": "John Smith", "card": "****4242", "expiry": "12/28"},
+        "currentStep": "confirm",
+        "status": "awaiting_confirmation",
+        "lastUpdated": "2026-10-19T12:00:00.000000",
+    }
+
+
+def conversation(customer, history_limit, questions=0):
+    """
+    Session snapshots as saved after each turn of one payment conversation,
+    with `questions` questions answered at length before the card number
+    """
+    name, card = customer["customerName"], customer["cardNumber"]
+    month, year = customer["expiryDate"].split("/")
+    expiry = f"{month}/{year[-2:]}"
+    turns = [
+        ("I want to make a payment", "name", "collecting", {}),
+        (name, "card", "collecting", {"name": name}),
+    ] + [
+        (QUESTIONS[i % len(QUESTIONS)], "card", "collecting", {"name": name}) for i in range(questions)
+    ] + [
+        (card, "expiry", "collecting", {"name": name, "card": card}),
+        (expiry, "cvv", "collecting", {"name": name, "card": card, "expiry": expiry}),
+        (customer["cvv"], "confirm", "awaiting_confirmation",
+         {"name": name, "card": card, "expiry": expiry, "cvv": customer["cvv"]}),
+        ("confirm", "confirm", "complete", {"name": name, "card": "****" + card[-4:], "expiry": expiry}),
+    ]
+    history = []
+    for index, (message, step, status, collected) in enumerate(turns):
+        if 2 <= index < 2 + questions:
+            reply = LONG_REPLIES[(index - 2) % len(LONG_REPLIES)]
+        else:
+            reply = BOT_TURNS[min(index - (questions if index >= 2 else 0), len(BOT_TURNS) - 1)]
+        history = (history + [
+            {"role": "user", "text": message},
+            {"role": "assistant", "text": reply},
+        ])[-history_limit:]
+        session = {
+            "sessionId": customer["sessionId"],
+            "conversationHistory": list(history),
+            "collectedData": dict(collected),
+            "currentStep": step,
+            "status": status,
+            "lastUpdated": f"2026-10-19T12:{index // 60:02d}:{index % 60:02d}.{index * 137:06d}",
+        }
+        if status == "complete":
+            session["paymentToken"] = "pm_1QbenchmarkTOKEN" + customer["sessionId"][-3:]
+        yield session
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timeit(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6  # us
+
+
+def wire_json(item):
+    """Low-level item as it travels over HTTP (binary base64-encoded)"""
+    def convert(value):
+        (kind, data), = value.items()
+        if kind == "B":
+            return {"B": base64.b64encode(data).decode()}
+        if kind == "M":
+            return {"M": {k: convert(v) for k, v in data.items()}}
+        if kind == "L":
+            return {"L": [convert(v) for v in data]}
+        return value
+    return {k: convert(v) for k, v in item.items()}
+
+
+def stubbed_clients(item):
+    """Resource and client whose GetItem returns item, with no network"""
+    body = json.dumps({"Item": wire_json(item)}).encode()
+
+    class Raw:
+        def __init__(self, payload):
+            self.payload = payload
+
+        def stream(self, **kwargs):
+            yield self.payload
+
+    def fake_send(request, event_name, **kwargs):
+        payload = body if event_name.endswith("GetItem") else b"{}"
+        return AWSResponse(request.url, 200, {"Content-Type": "application/x-amz-json-1.0"}, Raw(payload))
+
+    session = boto3.session.Session()
+    session.events.register("before-send", fake_send)
+    return session.resource("dynamodb"), session.client("dynamodb")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store microbenchmark")
+    parser.add_argument("--messages", type=int, nargs="+", default=[2, 10, 50],
+                        help="history lengths to test (default: 2 10 50; the handler keeps 10)")
+    parser.add_argument("--iterations", type=int, default=1000, help="iterations per measurement")
+    parser.add_argument("--history-limit", type=int, default=10,
+                        help="messages kept per session in the distribution (default: 10, as the handler)")
+    parser.add_argument("--questions", type=int, default=4,
+                        help="questions asked in the long sessions (default: 4)")
+    args = parser.parse_args()
+
+    serializer, deserializer = TypeSerializer(), TypeDeserializer()
+
+    def legacy_serialize(session):
+        return {k: serializer.serialize(v) for k, v in session.items()}
+
+    formats = {
+        "list of maps": legacy_serialize,
+        "v1 compressed": session_store.serialize_session_v1,
+        "v2 compact": session_store.serialize_session,
+    }
+
+    codec = "msgpack+zstd" if session_store.msgpack is not None else "json+deflate"
+    print(f"v2 codec: {codec}\n")
+    print(f"{'messages':>8} {'format':<14}{'serialize':>11}{'deserialize':>13}{'put+get':>10}{'item size':>11}")
+    for messages in args.messages:
+        session = make_session(messages)
+        legacy_item = legacy_serialize(session)
+        dynamodb_resource, _ = stubbed_clients(legacy_item)
+
+        def legacy_round_trip():
+            table = dynamodb_resource.Table(TABLE)
+            table.put_item(Item=session)
+            dynamodb_resource.Table(TABLE).get_item(Key={"sessionId": session["sessionId"]})
+
+        rows = [(
+            "list of maps",
+            timeit(lambda: legacy_serialize(session), args.iterations),
+            timeit(lambda: {k: deserializer.deserialize(v) for k, v in legacy_item.items()}, args.iterations),
+            timeit(legacy_round_trip, args.iterations // 10 or 1),
+            session_store.item_size(legacy_item),
+        )]
+        for name in ("v1 compressed", "v2 compact"):
+            item = formats[name](session)
+            assert session_store.deserialize_session(item) == session
+            # The store always writes v2; reads of v1 items go through the legacy path
+            store = session_store.SessionStore(stubbed_clients(item)[1], TABLE,
+                                               max_item_bytes=session_store.MAX_ITEM_BYTES)
+
+            def round_trip():
+                store.put(session)
+                store.get(session["sessionId"])
+
+            rows.append((
+                name,
+                timeit(lambda: formats[name](session), args.iterations),
+                timeit(lambda: session_store.deserialize_session(item), args.iterations),
+                timeit(round_trip, args.iterations // 10 or 1),
+                session_store.item_size(item),
+            ))
+        for name, encode_us, decode_us, round_trip_us, size in rows:
+            print(f"{messages:>8} {name:<14}{encode_us:>9.1f}us{decode_us:>11.1f}us"
+                  f"{round_trip_us / 1000:>8.2f}ms{size:>10}B")
+
+    # Size distribution over whole conversations: every saved turn is one
+    # eventually consistent get_item + one put_item
+    customers = json.loads(MOCK_DATA.read_text())
+    scenarios = [
+        (f"short, history {args.history_limit}", args.history_limit, 0),
+        (f"long, history {args.history_limit}", args.history_limit, args.questions),
+        ("long, history 50", 50, args.questions),
+    ]
+    print(f"\nitem size per saved turn ({MOCK_DATA.name}; long: {args.questions} questions answered at length)")
+    print(f"{'scenario':<20}{'format':<14}{'p50':>8}{'p95':>8}{'max':>8}{'RCU/turn':>10}{'WCU/turn':>10}")
+    for scenario, history_limit, questions in scenarios:
+        snapshots = [s for customer in customers for s in conversation(customer, history_limit, questions)]
+        for name, serialize in formats.items():
+            sizes = [session_store.item_size(serialize(s)) for s in snapshots]
+            rcu = sum(session_store.read_units(size) for size in sizes) / len(sizes)
+            wcu = sum(session_store.write_units(size) for size in sizes) / len(sizes)
+            print(f"{scenario:<20}{name:<14}{percentile(sizes, 50):>7}B{percentile(sizes, 95):>7}B"
+                  f"{max(sizes):>7}B{rcu:>10.2f}{wcu:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Lambda handlers
+
+Measures, for each handler, in fresh processes (like a Lambda cold start):
+  - init: time to import the handler module (Lambda "Init Duration"),
+    including how much of it is boto3 client creation
+  - first invocation latency
+  - steady-state invocation latency (p50/p95)
+and breaks init down per imported package using `python -X importtime`.
+
+AWS calls are answered by a botocore `before-send` hook with canned
+responses, so no credentials or network are needed and only handler
+overhead is measured. Exits with status 1 when a handler's init time is over
+its threshold.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 10 --max-init-ms 800
+    python benchmark_startup.py --handler payment_handler
+    python benchmark_startup.py --handler payment_handler --preinit
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# name -> where the handler lives, what to invoke it with, init budget (ms)
+HANDLERS = {
+    "payment_handler": {
+        "path": REPO_ROOT / "payment-smart-bot" / "lambda",
+        "module": "payment_handler",
+        "function": "lambda_handler",
+        "event": {"sessionId": "bench-{i}", "message": "John Smith"},
+        "max_init_ms": 1500,
+    },
+    "lambda_handler": {
+        "path": REPO_ROOT / "smart-payment-caller" / "src",
+        "module": "lambda_handler",
+        "function": "lambda_handler",
+        "event": {
+            "Details": {
+                "ContactData": {"ContactId": "bench-{i}"},
+                "Parameters": {"userInput": "I want to make a payment", "intentType": "general"},
+            }
+        },
+        "max_init_ms": 1500,
+    },
+}
+
+# Canned service responses, keyed by "<service>.<operation>"
+STUB_RESPONSES = {
+    "dynamodb.GetItem": {},
+    "dynamodb.PutItem": {},
+    "dynamodb.UpdateItem": {},
+    "bedrock-runtime.Converse": {
+        "output": {"message": {"role": "assistant", "content": [{"text": "Thanks! What's your card number?"}]}},
+        "stopReason": "end_turn",
+        "usage": {"inputTokens": 120, "outputTokens": 9, "totalTokens": 129},
+        "metrics": {"latencyMs": 250},
+    },
+    "bedrock-runtime.InvokeModel": {"outputs": [{"text": "Sure, I can help you make a payment."}]},
+    "secrets-manager.GetSecretValue": {"SecretString": "sk_test_benchmark"},
+    "ssm.GetParameter": {"Parameter": {"Name": "/payment-bot/stripe-secret", "Value": "sk_test_benchmark"}},
+    "s3.PutObject": None,  # empty body, status 200
+}
+
+CHILD_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "DYNAMODB_TABLE": "payment-bot-sessions-bench",
+    "STRIPE_SECRET_ARN": "arn:aws:secretsmanager:us-east-1:000000000000:secret:bench",
+}
+
+
+def child(name, invocations):
+    """Run inside a fresh interpreter: import, invoke, print JSON results"""
+    import time
+
+    spec = HANDLERS[name]
+    sys.path.insert(0, str(spec["path"]))
+
+    # The window starts before boto3 is imported, so stub setup below is
+    # counted the same way the handler's own boto3 import would be
+    started = time.perf_counter()
+    import boto3
+    from botocore.awsrequest import AWSResponse
+
+    class _Raw:
+        def __init__(self, body):
+            self._body = body
+            self._read = False
+
+        def stream(self, **kwargs):
+            yield self.read()
+
+        def read(self, amt=None):
+            if self._read:
+                return b""
+            self._read = True
+            return self._body
+
+    def fake_send(request, event_name, **kwargs):
+        # event_name is "before-send.<service>.<operation>"
+        key = event_name.split(".", 1)[1]
+        body = STUB_RESPONSES.get(key, {})
+        payload = b"" if body is None else json.dumps(body).encode()
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(payload))}
+        return AWSResponse(request.url, 200, headers, _Raw(payload))
+
+    client_seconds = [0.0]
+    session_cls = boto3.session.Session
+
+    def timed(method):
+        def wrapper(self, *args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                client_seconds[0] += time.perf_counter() - t
+        return wrapper
+
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register("before-send", fake_send)
+    session_cls.client = timed(session_cls.client)
+    session_cls.resource = timed(session_cls.resource)
+
+    module = __import__(spec["module"])
+    init_seconds = time.perf_counter() - started
+    handler = getattr(module, spec["function"])
+
+    def event(i):
+        return json.loads(json.dumps(spec["event"]).replace("{i}", str(i)))
+
+    class Context:
+        request_id = "benchmark"
+
+    latencies = []
+    devnull = open(os.devnull, "w")
+    stdout = sys.stdout
+    for i in range(invocations + 1):
+        sys.stdout = devnull  # handlers print on every call
+        t = time.perf_counter()
+        try:
+            handler(event(i), Context())
+        finally:
+            latencies.append(time.perf_counter() - t)
+            sys.stdout = stdout
+
+    print(json.dumps({
+        "init_ms": init_seconds * 1000,
+        "client_ms": client_seconds[0] * 1000,
+        "first_ms": latencies[0] * 1000,
+        "steady_ms": [t * 1000 for t in latencies[1:]],
+    }))
+
+
+def parse_importtime(stderr, module):
+    """Break -X importtime output down for the handler module
+
+    Returns (self time per top-level package, cumulative time of each import
+    made directly by the benchmark window: boto3 plus the handler's own
+    imports), in ms.
+    """
+    entries = []  # (depth, name, self_ms, cumulative_ms)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+
+    packages = {}
+    for _, name, self_ms, _ in entries:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_ms
+
+    direct = {}
+    for index, (depth, name, _, cumulative_ms) in enumerate(entries):
+        if name in ("boto3", "botocore.awsrequest") and depth == 0:
+            direct[name] = cumulative_ms
+        if name == module:
+            # Children are printed before their parent
+            for child_depth, child_name, _, child_ms in reversed(entries[:index]):
+                if child_depth <= depth:
+                    break
+                if child_depth == depth + 1:
+                    direct[child_name] = child_ms
+    return packages, direct
+
+
+def run_child(name, invocations):
+    env = {**os.environ, **CHILD_ENV}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--child", name, "--invocations", str(invocations)],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} benchmark failed:\n{result.stderr[-2000:]}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data["packages"], data["imports"] = parse_importtime(result.stderr, HANDLERS[name]["module"])
+    return data
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def benchmark(name, runs, invocations, top, max_init_ms):
+    print(f"\n[BENCH] {name} ({runs} cold starts, {invocations} warm invocations each)")
+    run_child(name, 1)  # populate __pycache__ so every measured run sees warm bytecode
+    results = [run_child(name, invocations) for _ in range(runs)]
+
+    init = statistics.median(r["init_ms"] for r in results)
+    first = statistics.median(r["first_ms"] for r in results)
+    steady = [t for r in results for t in r["steady_ms"]]
+
+    print(f"   init (import)         {init:8.1f} ms   (min {min(r['init_ms'] for r in results):.1f}, "
+          f"max {max(r['init_ms'] for r in results):.1f})")
+    print(f"   first invocation      {first:8.1f} ms")
+    print(f"   steady p50 / p95      {percentile(steady, 50):8.2f} / {percentile(steady, 95):.2f} ms")
+
+    # Import breakdown from the median run
+    median_run = sorted(results, key=lambda r: r["init_ms"])[len(results) // 2]
+    module = HANDLERS[name]["module"]
+    print("   init breakdown (median run):")
+    for imported, ms in sorted(median_run["imports"].items(), key=lambda item: -item[1]):
+        print(f"     import {imported:<24}{ms:8.1f} ms")
+    # Includes modules botocore imports lazily on first client creation
+    print(f"     {'boto3 client creation':<31}{median_run['client_ms']:8.1f} ms")
+
+    packages = sorted(median_run["packages"].items(), key=lambda item: -item[1])
+    print(f"   import self time by package (top {top}):")
+    for package, ms in packages[:top]:
+        if package == module:
+            continue
+        print(f"     {package:<24}{ms:8.1f} ms")
+
+    budget = max_init_ms if max_init_ms is not None else HANDLERS[name]["max_init_ms"]
+    if init > budget:
+        print(f"[FAIL] {name}: init {init:.1f} ms exceeds {budget} ms")
+        return False
+    print(f"[PASS] {name}: init {init:.1f} ms within {budget} ms")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambda handler startup benchmark")
+    parser.add_argument("--handler", choices=sorted(HANDLERS), action="append",
+                        help="handler to benchmark (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per handler (default: 5)")
+    parser.add_argument("--invocations", type=int, default=50,
+                        help="warm invocations per cold start (default: 50)")
+    parser.add_argument("--top", type=int, default=10, help="packages shown in the breakdown (default: 10)")
+    parser.add_argument("--max-init-ms", type=float, default=None,
+                        help="fail when median init exceeds this (default: per-handler budget)")
+    parser.add_argument("--preinit", action="store_true",
+                        help="run payment_handler's pre-initialization hook during init (PAYMENT_BOT_PREINIT=on)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.invocations)
+        return 0
+
+    if args.preinit:
+        os.environ["PAYMENT_BOT_PREINIT"] = "on"
+
+    passed = True
+    for name in args.handler or sorted(HANDLERS):
+        passed = benchmark(name, args.runs, args.invocations, args.top, args.max_init_ms) and passed
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tokenization queue benchmark
+
+Simulates Stripe calls with a given latency (and occasional spikes) and
+compares the confirm turn's wait when tokenizing inline with the time to
+queue a job (TOKENIZE_MODE=local/sqs). Then drains the jobs through
+lambda/tokenization_queue.py's LocalQueue and checks that the worker pool
+stays within its concurrency and rate limits.
+
+No AWS or Stripe calls are made.
+
+Usage:
+    python benchmark_tokenization_queue.py
+    python benchmark_tokenization_queue.py --jobs 50 --latency 0.4 --spike 3 --workers 4 --rate 10
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+from tokenization_queue import LocalQueue, TokenizationJob
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline vs queued tokenization")
+    parser.add_argument("--jobs", type=int, default=30, help="confirmations to simulate (default: 30)")
+    parser.add_argument("--latency", type=float, default=0.3, help="typical Stripe latency, s (default: 0.3)")
+    parser.add_argument("--spike", type=float, default=2.0, help="latency of a slow call, s (default: 2.0)")
+    parser.add_argument("--spike-rate", type=float, default=0.1, help="share of slow calls (default: 0.1)")
+    parser.add_argument("--workers", type=int, default=2, help="worker pool size (default: 2)")
+    parser.add_argument("--rate", type=float, default=5.0, help="jobs started per second (default: 5)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    latencies = [args.spike if rng.random() < args.spike_rate else args.latency for _ in range(args.jobs)]
+
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+    starts = []
+
+    def stripe_call(job):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+            starts.append(time.monotonic())
+        time.sleep(latencies[int(job.session_id)])
+        with lock:
+            running -= 1
+
+    # The inline confirm turn waits for Stripe
+    inline = latencies
+
+    # The queued confirm turn only waits for the enqueue
+    pool = LocalQueue(stripe_call, workers=args.workers, rate=args.rate)
+    queued = []
+    started = time.monotonic()
+    for i in range(args.jobs):
+        t = time.perf_counter()
+        pool.put(TokenizationJob(str(i), f"payment-bot-{i}", time.time()))
+        queued.append(time.perf_counter() - t)
+    pool.join()
+    drained = time.monotonic() - started
+
+    print(f"{args.jobs} confirmations, Stripe {args.latency:.2f} s ({args.spike_rate:.0%} at {args.spike:.2f} s)")
+    print(f"\nconfirm turn wait    {'p50':>10} {'p95':>10} {'max':>10}")
+    print(f"  inline             {percentile(inline, 50):>9.3f}s {percentile(inline, 95):>9.3f}s {max(inline):>9.3f}s")
+    print(f"  queued             {percentile(queued, 50) * 1000:>8.3f}ms "
+          f"{percentile(queued, 95) * 1000:>8.3f}ms {max(queued) * 1000:>8.3f}ms")
+
+    # Token bucket: at most `rate` starts in any one-second window after the
+    # initial burst
+    window = max(sum(1 for s in starts if first <= s < first + 1.0) for first in starts)
+    burst = max(1.0, args.rate)
+    print(f"\nworker pool ({args.workers} workers, {args.rate:g} jobs/s)")
+    print(f"  drained in {drained:.2f} s, mean job {statistics.mean(latencies):.2f} s")
+    print(f"  peak concurrency {peak}, most starts in 1 s: {window}")
+
+    ok = peak <= args.workers and window <= burst + args.rate
+    print("[PASS] concurrency and rate within limits" if ok else "[FAIL] limits exceeded")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Payment flow check
+
+Runs the conversations in tests/flow_cases.json through
+lambda/payment_flow.py and checks the state, the collected data and the
+reply after each turn. No AWS or model calls are made: turns the model
+would answer only have their state checked.
+
+Exits non-zero if any turn differs.
+
+Usage:
+    python check_payment_flow.py
+    python check_payment_flow.py --verbose
+"""
+
+import argparse
+import copy
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+from payment_flow import DEFAULT_FIELDS, PaymentFlow
+
+CASES = Path(__file__).resolve().parents[1] / "tests" / "flow_cases.json"
+
+
+def run(conversation, verbose=False):
+    """Failure messages for one conversation (empty when it passes)."""
+    flow = PaymentFlow(conversation.get('fields', DEFAULT_FIELDS))
+    session = copy.deepcopy(conversation.get('session') or
+                            {'collectedData': {}, 'currentStep': flow.fields[0], 'status': 'collecting'})
+    failures = []
+    for number, turn in enumerate(conversation['turns'], 1):
+        result = flow.handle(session, turn['send'])
+        if verbose:
+            print(f"  > {turn['send']!r} -> {result.state} {session['collectedData']}")
+        where = f"turn {number} ({turn['send']!r})"
+        if result.state != turn['state']:
+            failures.append(f"{where}: state {result.state}, expected {turn['state']}")
+        if 'collected' in turn and session['collectedData'] != turn['collected']:
+            failures.append(f"{where}: collected {session['collectedData']}, expected {turn['collected']}")
+        if 'reply' in turn and turn['reply'] not in (result.reply or ''):
+            failures.append(f"{where}: reply {result.reply!r} lacks {turn['reply']!r}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payment flow check")
+    parser.add_argument("--verbose", action="store_true", help="print every turn")
+    args = parser.parse_args()
+
+    conversations = json.loads(CASES.read_text(encoding="utf-8"))["conversations"]
+    print(f"{len(conversations)} conversations ({CASES.name})")
+
+    failed = 0
+    for conversation in conversations:
+        if args.verbose:
+            print(conversation['name'])
+        failures = run(conversation, args.verbose)
+        for failure in failures:
+            print(f"[FAIL] {conversation['name']}: {failure}")
+        failed += bool(failures)
+
+    if failed:
+        print(f"{failed} of {len(conversations)} conversations failed")
+        return 1
+    print("[PASS] every conversation ran as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Inference profile fit
+
+Learns the token cap of each inference profile from the usage the handler
+logs: one metrics line per Bedrock call with the profile, OutputTokens and
+whether the reply hit the cap (see lambda/metrics.py). The cap is a high
+quantile of the observed output lengths plus a margin. Replies cut off by
+the cap only say the real length was larger, so a profile truncating more
+often than --max-truncated gets at least double its current cap instead.
+Profiles with fewer than --min-samples calls keep their cap.
+
+The result is written to lambda/inference_profiles.json, which the handler
+reads at startup; redeploy to apply it.
+
+Usage:
+    python fit_inference_profiles.py --log-group /aws/lambda/payment-smart-bot-handler-dev --days 7
+    python fit_inference_profiles.py --log-file usage.jsonl --dry-run
+    python fit_inference_profiles.py --log-group ... --quantile 0.995 --margin 0.25
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+from inference_profiles import DATA_FILE, DEFAULT, load_profiles
+
+MIN_TOKENS = 16
+MAX_TOKENS = 1024
+
+
+def usage_records(lines):
+    """Bedrock usage records (metrics lines with a profile) in log lines."""
+    for line in lines:
+        start = line.find('{"_aws"')
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if 'Profile' in record and 'OutputTokens' in record:
+            yield record
+
+
+def read_log_group(log_group, days, region):
+    import boto3
+    logs = boto3.client("logs", region_name=region)
+    paginator = logs.get_paginator("filter_log_events")
+    start = int((time.time() - days * 86400) * 1000)
+    for page in paginator.paginate(logGroupName=log_group, startTime=start, filterPattern='"OutputTokens"'):
+        for event in page["events"]:
+            yield event["message"]
+
+
+def quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def fit(records, profiles, q, margin, min_samples, max_truncated):
+    """
+    New cap per profile.
+
+    Returns:
+        {profile: {'max_tokens', 'samples', 'p50', 'p_q', 'truncated', 'reason'}}
+    """
+    lengths = defaultdict(list)
+    truncated = defaultdict(int)
+    for record in records:
+        lengths[record['Profile']].append(record['OutputTokens'])
+        truncated[record['Profile']] += record.get('Truncated', 0)
+
+    result = {}
+    for name, profile in profiles.items():
+        if name == DEFAULT:
+            continue
+        samples = lengths.get(name, [])
+        entry = {'max_tokens': profile.max_tokens, 'samples': len(samples)}
+        if len(samples) < min_samples:
+            entry['reason'] = f"kept: {len(samples)} < {min_samples} samples"
+            result[name] = entry
+            continue
+        share = truncated[name] / len(samples)
+        high = quantile(samples, q)
+        entry.update(p50=quantile(samples, 0.5), p_q=high, truncated=round(share, 4))
+        if share > max_truncated:
+            cap = profile.max_tokens * 2
+            entry['reason'] = f"{share:.1%} truncated: doubled"
+        else:
+            cap = math.ceil(high * (1 + margin))
+            entry['reason'] = f"p{q * 100:g} {high} + {margin:.0%}"
+        entry['max_tokens'] = max(MIN_TOKENS, min(MAX_TOKENS, cap))
+        result[name] = entry
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit inference profile token caps from logged usage")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--log-group", help="handler log group to read")
+    source.add_argument("--log-file", help="exported log lines (one per line)")
+    parser.add_argument("--days", type=float, default=7, help="log window with --log-group (default: 7)")
+    parser.add_argument("--region", default=None, help="AWS region (default: from the environment)")
+    parser.add_argument("--quantile", type=float, default=0.99, help="output length to cover (default: 0.99)")
+    parser.add_argument("--margin", type=float, default=0.2, help="headroom over the quantile (default: 0.2)")
+    parser.add_argument("--min-samples", type=int, default=50, help="calls needed to refit a profile (default: 50)")
+    parser.add_argument("--max-truncated", type=float, default=0.01,
+                        help="share of capped replies above which a cap is doubled (default: 0.01)")
+    parser.add_argument("--output", default=DATA_FILE, help="profile file (default: lambda/inference_profiles.json)")
+    parser.add_argument("--dry-run", action="store_true", help="print the fit, write nothing")
+    args = parser.parse_args()
+
+    if args.log_file:
+        with open(args.log_file, encoding="utf-8") as f:
+            records = list(usage_records(f))
+    else:
+        records = list(usage_records(read_log_group(args.log_group, args.days, args.region)))
+
+    profiles = load_profiles(args.output)
+    fitted = fit(records, profiles, args.quantile, args.margin, args.min_samples, args.max_truncated)
+
+    print(f"{len(records)} Bedrock calls")
+    print(f"\n{'profile':18} {'samples':>8} {'p50':>6} {'p' + format(args.quantile * 100, 'g'):>6} "
+          f"{'cut':>6} {'cap':>5} -> {'new':>5}  reason")
+    for name, entry in fitted.items():
+        print(f"{name:18} {entry['samples']:>8} {entry.get('p50', '-'):>6} {entry.get('p_q', '-'):>6} "
+              f"{entry.get('truncated', '-'):>6} {profiles[name].max_tokens:>5} -> {entry['max_tokens']:>5}  "
+              f"{entry['reason']}")
+
+    if args.dry_run:
+        return 0
+    path = Path(args.output)
+    data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"version": 1}
+    data["profiles"] = {
+        name: {key: entry[key] for key in ('max_tokens', 'samples', 'p50', 'p_q', 'truncated') if key in entry}
+        for name, entry in fitted.items()
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    print(f"\nwrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
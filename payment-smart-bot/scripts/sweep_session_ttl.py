@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Session TTL backfill
+
+Sessions written before the handler set a ttl attribute never expire. This
+scans the session table for items without one and sets it to the session's
+last update + SESSION_TTL_HOURS (now + TTL when unknown), so DynamoDB's TTL
+process deletes them. Items whose ttl lands in the past are deleted by TTL
+shortly after, without using write capacity.
+
+Reads and writes are rate limited in capacity units per second so the sweep
+does not take capacity from the live bot; run several copies with
+--segment/--total-segments to go faster. Each update is conditional on the
+item still having no ttl, so sessions the bot writes during the sweep keep
+their own.
+
+Usage:
+    python sweep_session_ttl.py --table payment-smart-bot-sessions-dev --dry-run
+    python sweep_session_ttl.py --table payment-smart-bot-sessions-dev --ttl-hours 1 --max-rcu 20 --max-wcu 10
+    python sweep_session_ttl.py --table ... --segment 0 --total-segments 4
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "lambda"))
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from session_store import EPOCH, IDEMPOTENCY_PREFIX, TTL_ATTRIBUTE, deserialize_session
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` units per second, bursts up to one second's worth."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def spend(self, units):
+        """Record units used, sleeping first if the bucket is empty."""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 0:
+            time.sleep(-self.tokens / self.rate)
+        self.tokens -= units
+
+
+def expiry_for(item, ttl_seconds, now):
+    """Epoch seconds at which a legacy item should expire."""
+    try:
+        updated = deserialize_session(item).get('lastUpdated')
+        last = (datetime.fromisoformat(updated) - EPOCH).total_seconds() if updated else None
+    except Exception:
+        last = None  # unreadable item: give it a full TTL from now
+    return int((last if last is not None else now) + ttl_seconds)
+
+
+def sweep(client, table, ttl_seconds, max_rcu, max_wcu, segment, total_segments, dry_run):
+    reads, writes = RateLimiter(max_rcu), RateLimiter(max_wcu)
+    counts = {'scanned': 0, 'missing': 0, 'updated': 0, 'expired': 0, 'skipped': 0}
+    scan = {
+        'TableName': table,
+        'FilterExpression': 'attribute_not_exists(#ttl)',
+        'ExpressionAttributeNames': {'#ttl': TTL_ATTRIBUTE},
+        'ReturnConsumedCapacity': 'TOTAL',
+        'Limit': 100,  # small pages keep the read rate smooth
+    }
+    if total_segments > 1:
+        scan.update(Segment=segment, TotalSegments=total_segments)
+
+    while True:
+        page = client.scan(**scan)
+        reads.spend(page['ConsumedCapacity']['CapacityUnits'])
+        counts['scanned'] += page['ScannedCount']
+        now = time.time()
+        for item in page['Items']:
+            counts['missing'] += 1
+            session_id = item['sessionId']['S']
+            if session_id.startswith(IDEMPOTENCY_PREFIX):
+                continue  # always written with a ttl; nothing to repair
+            expires = expiry_for(item, ttl_seconds, now)
+            counts['expired' if expires <= now else 'updated'] += 1
+            if dry_run:
+                continue
+            try:
+                response = client.update_item(
+                    TableName=table,
+                    Key={'sessionId': {'S': session_id}},
+                    UpdateExpression='SET #ttl = :ttl',
+                    ConditionExpression='attribute_exists(sessionId) AND attribute_not_exists(#ttl)',
+                    ExpressionAttributeNames={'#ttl': TTL_ATTRIBUTE},
+                    ExpressionAttributeValues={':ttl': {'N': str(expires)}},
+                    ReturnConsumedCapacity='TOTAL',
+                )
+                writes.spend(response['ConsumedCapacity']['CapacityUnits'])
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                counts['expired' if expires <= now else 'updated'] -= 1
+                counts['skipped'] += 1  # written or deleted since the scan
+                writes.spend(1)
+        if 'LastEvaluatedKey' not in page:
+            return counts
+        scan['ExclusiveStartKey'] = page['LastEvaluatedKey']
+        print(f"  ... {counts['scanned']} scanned, {counts['missing']} without ttl", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Set ttl on session items written without one")
+    parser.add_argument("--table", required=True, help="session table name")
+    parser.add_argument("--ttl-hours", type=float, default=1, help="session TTL, as SESSION_TTL_HOURS (default: 1)")
+    parser.add_argument("--max-rcu", type=float, default=10, help="read capacity units per second (default: 10)")
+    parser.add_argument("--max-wcu", type=float, default=5, help="write capacity units per second (default: 5)")
+    parser.add_argument("--segment", type=int, default=0, help="parallel scan segment of this worker")
+    parser.add_argument("--total-segments", type=int, default=1, help="parallel scan segments (default: 1)")
+    parser.add_argument("--region", default=None, help="AWS region (default: from the environment)")
+    parser.add_argument("--dry-run", action="store_true", help="count items, change nothing")
+    args = parser.parse_args()
+
+    # Adaptive retries back off on throttling on top of the rate limits
+    client = boto3.client("dynamodb", region_name=args.region, config=Config(retries={"mode": "adaptive"}))
+    started = time.perf_counter()
+    counts = sweep(client, args.table, int(args.ttl_hours * 3600), args.max_rcu, args.max_wcu,
+                   args.segment, args.total_segments, args.dry_run)
+    elapsed = time.perf_counter() - started
+
+    verb = "would set" if args.dry_run else "set"
+    print(f"{args.table} segment {args.segment}/{args.total_segments}: {counts['scanned']} items scanned "
+          f"in {elapsed:.1f} s, {counts['missing']} without ttl")
+    print(f"  {verb} ttl on {counts['updated']} live and {counts['expired']} already expired sessions, "
+          f"{counts['skipped']} skipped (changed during the sweep)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,85 +1,369 @@
 #!/usr/bin/env python3
 """
 Build Lambda deployment package with dependencies
+
+By default the package is lean: libraries the Lambda runtime already provides
+(boto3 and its dependencies) and libraries unused in production are left out,
+tests, __pycache__ and dist-info are stripped, and bytecode is precompiled so
+cold starts don't compile every module (/var/task is read-only, so Lambda
+can't cache it either).
+
+Dependencies are installed as manylinux wheels for the Lambda platform and
+cached in .build_cache/, keyed on requirements.txt and the target platform,
+so code-only changes just re-zip the handler. Zips are deterministic (sorted
+entries, fixed timestamps and permissions): an unchanged build produces the
+same hash and Terraform skips the redeploy.
+
+Usage:
+    python build_lambda.py            # lean lambda_function.zip
+    python build_lambda.py --layer    # code-only zip + lambda_layer.zip
+    python build_lambda.py --full     # bundle everything in requirements.txt
+    python build_lambda.py --rebuild  # ignore the dependency cache
 """
 
+import argparse
+import base64
+import compileall
+import fnmatch
+import hashlib
+import json
 import os
+import py_compile
+import re
 import sys
 import shutil
 import zipfile
 import subprocess
+from importlib import metadata
 from pathlib import Path
 
+# Must match `runtime` in lambda.tf; bytecode is only valid for this version
+LAMBDA_PYTHON = (3, 11)
+# Lambda x86_64 runs on Amazon Linux 2 (glibc 2.26)
+LAMBDA_PLATFORM = "manylinux2014_x86_64"
+
+# Bump when installing, pruning or compiling changes to invalidate the cache
+CACHE_VERSION = 1
+CACHE_KEEP = 3  # most recent dependency trees kept in .build_cache
+
+# Earliest timestamp a zip entry can hold
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+# Handler modules and data files copied from lambda/ into the package
+LAMBDA_FILES = [
+    "payment_handler.py",
+    "session_store.py",
+    "card_validation.py",
+    "card_networks.py",
+    "card_networks.json",
+    "field_extraction.py",
+    "payment_flow.py",
+    "intents.py",
+    "tokenization_queue.py",
+    "metrics.py",
+    "inference_profiles.py",
+    "inference_profiles.json",
+]
+
+# Already in the Lambda Python runtime
+RUNTIME_PROVIDED = {"boto3", "botocore", "s3transfer", "jmespath"}
+
+# Only used for local development (payment_handler imports dotenv optionally)
+UNUSED_IN_PRODUCTION = {"python-dateutil", "python-dotenv"}
+
+PRUNE_DIRS = ["__pycache__", "tests", ".pytest_cache", "*.dist-info", "*.egg-info"]
+PRUNE_TOP_LEVEL = ["bin"]  # console scripts installed by pip
+PRUNE_FILES = ["*.pyc", "*.pyi", "py.typed"]
+
+
+def normalize(name):
+    """PEP 503 normalized distribution name"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def requirement_name(line):
+    match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", line)
+    return normalize(match.group(1)) if match else None
+
+
+def read_requirements(requirements_file, excluded):
+    """Requirement lines from requirements.txt, minus excluded distributions"""
+    requirements = []
+    for line in requirements_file.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if requirement_name(line) in excluded:
+            print(f"   - skipping {line} (excluded)")
+            continue
+        requirements.append(line)
+    return requirements
+
+
+def remove_distributions(target_dir, excluded):
+    """Uninstall excluded distributions pulled in as transitive dependencies"""
+    for dist in metadata.distributions(path=[str(target_dir)]):
+        if normalize(dist.metadata["Name"]) not in excluded:
+            continue
+        print(f"   - removing {dist.metadata['Name']} (excluded)")
+        for file in dist.files or []:
+            path = target_dir / file
+            if path.is_file():
+                path.unlink()
+        # Drop directories left without files (shared namespace dirs are kept)
+        for top in {Path(str(file)).parts[0] for file in dist.files or []}:
+            path = target_dir / top
+            if path.is_dir() and not any(p.is_file() for p in path.rglob("*")):
+                shutil.rmtree(path)
+
+
+def prune(target_dir):
+    """Remove tests, caches, metadata and type stubs"""
+    for entry in PRUNE_TOP_LEVEL:
+        if (target_dir / entry).is_dir():
+            shutil.rmtree(target_dir / entry)
+
+    for root, dirs, files in os.walk(target_dir):
+        for d in list(dirs):
+            if any(fnmatch.fnmatch(d, pattern) for pattern in PRUNE_DIRS):
+                shutil.rmtree(os.path.join(root, d))
+                dirs.remove(d)
+        for file in files:
+            if any(fnmatch.fnmatch(file, pattern) for pattern in PRUNE_FILES):
+                os.remove(os.path.join(root, file))
+
+
+def precompile(target_dir):
+    """Write __pycache__ bytecode that Lambda can use as-is"""
+    # Unchecked hashes: zip timestamps can't invalidate the cache, sources are
+    # never edited in place. stripdir keeps build paths out of the bytecode.
+    compileall.compile_dir(
+        str(target_dir),
+        quiet=1,
+        optimize=0,
+        stripdir=str(target_dir),
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+
+
+def dependency_key(requirements, excluded, compile_bytecode):
+    """Cache key for an installed dependency tree"""
+    payload = json.dumps({
+        "version": CACHE_VERSION,
+        "requirements": requirements,
+        "excluded": sorted(excluded),
+        "platform": LAMBDA_PLATFORM,
+        "python": f"{LAMBDA_PYTHON[0]}.{LAMBDA_PYTHON[1]}",
+        "bytecode": compile_bytecode,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def install_dependencies(requirements, excluded, target_dir, compile_bytecode):
+    """pip install Lambda-platform wheels into target_dir, then prune and compile"""
+    target_dir.mkdir(parents=True)
+    if requirements:
+        subprocess.run(
+            [
+                sys.executable, "-m", "pip", "install", *requirements,
+                "-t", str(target_dir),
+                "--platform", LAMBDA_PLATFORM,
+                "--implementation", "cp",
+                "--python-version", f"{LAMBDA_PYTHON[0]}.{LAMBDA_PYTHON[1]}",
+                "--only-binary=:all:",
+                "--quiet",
+            ],
+            check=True,
+            capture_output=True
+        )
+    if excluded:
+        remove_distributions(target_dir, excluded)
+    prune(target_dir)
+    if compile_bytecode:
+        precompile(target_dir)
+
+
+def cached_dependencies(cache_dir, key, requirements, excluded, compile_bytecode, rebuild=False):
+    """Directory holding the installed tree (site/) for key, installing on a miss"""
+    entry = cache_dir / f"deps-{key}"
+    if rebuild and entry.exists():
+        shutil.rmtree(entry)
+
+    if entry.exists():
+        print(f"[CACHE] Reusing dependencies ({entry.name})")
+    else:
+        print(f"[DEPS] Installing Python dependencies for {LAMBDA_PLATFORM} ({entry.name})...")
+        staging = cache_dir / f"deps-{key}.tmp"
+        if staging.exists():
+            shutil.rmtree(staging)
+        install_dependencies(requirements, excluded, staging / "site", compile_bytecode)
+        staging.rename(entry)
+
+    entry.touch()  # mtime marks recent use
+    trees = [path for path in cache_dir.glob("deps-*") if path.suffix != ".tmp"]
+    stale = sorted(trees, key=lambda path: path.stat().st_mtime, reverse=True)
+    for old in stale[CACHE_KEEP:]:
+        shutil.rmtree(old)
+    return entry
+
+
+def zip_entries(source_dir, prefix=""):
+    """(archive name, path) for every file under source_dir, in sorted order"""
+    entries = []
+    for root, dirs, files in os.walk(source_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            entries.append((Path(prefix, os.path.relpath(path, source_dir)).as_posix(), path))
+    return sorted(entries)
+
+
+def add_to_zip(zipf, entries):
+    """Add files with fixed timestamps and permissions, so equal input gives equal bytes"""
+    for arcname, path in entries:
+        info = zipfile.ZipInfo(arcname, date_time=ZIP_TIMESTAMP)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        with open(path, "rb") as f:
+            zipf.writestr(info, f.read(), compresslevel=9)
+
+
+def write_zip(source_dir, output_zip, prefix="", base_zip=None):
+    """Deterministic zip of source_dir, appended to a copy of base_zip if given"""
+    if base_zip is not None:
+        shutil.copyfile(base_zip, output_zip)
+    with zipfile.ZipFile(output_zip, 'a' if base_zip is not None else 'w') as zipf:
+        add_to_zip(zipf, zip_entries(source_dir, prefix))
+
+
+def cached_zip(entry, name, prefix=""):
+    """Zip of a cached dependency tree, compressed only once"""
+    path = entry / name
+    if not path.exists():
+        write_zip(entry / "site", entry / f"{name}.tmp", prefix=prefix)
+        os.replace(entry / f"{name}.tmp", path)
+    return path
+
+
+def lambda_hash(path):
+    """Same value as Terraform's filebase64sha256()"""
+    return base64.b64encode(hashlib.sha256(path.read_bytes()).digest()).decode()
+
+
+def size_report(*zip_files):
+    """Print uncompressed and compressed size per top-level package"""
+    packages = {}
+    for zip_file in zip_files:
+        with zipfile.ZipFile(zip_file) as zipf:
+            for info in zipf.infolist():
+                parts = Path(info.filename).parts
+                if parts[0] == "python" and len(parts) > 1:
+                    parts = parts[1:]  # layer layout
+                name = parts[0]
+                if name == "__pycache__" and len(parts) > 1:
+                    name = parts[1].split(".")[0] + ".py"
+                size, compressed = packages.get(name, (0, 0))
+                packages[name] = (size + info.file_size, compressed + info.compress_size)
+
+    print("")
+    print(f"[SIZE] {'Package':<28}{'Unzipped':>12}{'Zipped':>12}")
+    for name, (size, compressed) in sorted(packages.items(), key=lambda item: -item[1][1]):
+        print(f"       {name:<28}{size / 1024:>10.1f}KB{compressed / 1024:>10.1f}KB")
+    total = sum(size for size, _ in packages.values())
+    total_compressed = sum(compressed for _, compressed in packages.values())
+    print(f"       {'TOTAL':<28}{total / 1024:>10.1f}KB{total_compressed / 1024:>10.1f}KB")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Build the Lambda deployment package")
+    parser.add_argument("--full", action="store_true",
+                        help="bundle every requirement, including boto3 and dev-only libraries")
+    parser.add_argument("--layer", action="store_true",
+                        help="put dependencies in lambda_layer.zip and only code in lambda_function.zip")
+    parser.add_argument("--no-compile", action="store_true", help="don't precompile bytecode")
+    parser.add_argument("--rebuild", action="store_true", help="reinstall dependencies, ignoring the cache")
+    args = parser.parse_args()
+
     print("[BUILD] Building Lambda deployment package...")
-    
+
     # Get directories
     script_dir = Path(__file__).parent.absolute()
     lambda_dir = script_dir.parent / "lambda"
     build_dir = script_dir / "lambda_build"
+    cache_dir = script_dir / ".build_cache"
+    code_dir = build_dir / "function"
     output_zip = script_dir / "lambda_function.zip"
-    
+    layer_zip = script_dir / "lambda_layer.zip"
+
     # Clean up previous build
     print("[CLEANUP] Cleaning up previous build...")
     if build_dir.exists():
         shutil.rmtree(build_dir)
-    if output_zip.exists():
-        output_zip.unlink()
-    
+    for stale in (output_zip, layer_zip):
+        if stale.exists():
+            stale.unlink()
+
     # Create build directory
     print("[CREATE] Creating build directory...")
-    build_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Install dependencies
-    print("[DEPS] Installing Python dependencies...")
-    requirements_file = lambda_dir / "requirements.txt"
-    
+    code_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir.mkdir(exist_ok=True)
+
+    compile_bytecode = not args.no_compile
+    if compile_bytecode and sys.version_info[:2] != LAMBDA_PYTHON:
+        print(f"[WARN] Skipping bytecode: building with Python {sys.version_info[0]}.{sys.version_info[1]}, "
+              f"Lambda runs {LAMBDA_PYTHON[0]}.{LAMBDA_PYTHON[1]}")
+        compile_bytecode = False
+
+    # Install dependencies (or reuse the cached tree)
+    excluded = set() if args.full else {normalize(name) for name in RUNTIME_PROVIDED | UNUSED_IN_PRODUCTION}
+    print(f"[DEPS] Resolving Python dependencies ({'full' if args.full else 'lean'})...")
+    requirements = read_requirements(lambda_dir / "requirements.txt", excluded)
+    key = dependency_key(requirements, excluded, compile_bytecode)
+
     try:
-        subprocess.run(
-            [sys.executable, "-m", "pip", "install", "-r", str(requirements_file), "-t", str(build_dir), "--quiet"],
-            check=True,
-            capture_output=True
-        )
+        deps = cached_dependencies(cache_dir, key, requirements, excluded, compile_bytecode, args.rebuild)
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] Error installing dependencies: {e}")
         print(e.stderr.decode())
         return 1
-    
+
     # Copy Lambda function code
     print("[COPY] Copying Lambda function code...")
-    shutil.copy(lambda_dir / "payment_handler.py", build_dir / "payment_handler.py")
-    
+    for name in LAMBDA_FILES:
+        shutil.copy(lambda_dir / name, code_dir / name)
+
     # Remove unnecessary files
     print("[CLEAN] Removing unnecessary files...")
-    for root, dirs, files in os.walk(build_dir):
-        # Remove __pycache__ directories
-        dirs[:] = [d for d in dirs if d not in ['__pycache__', 'tests', '.pytest_cache', '*.dist-info']]
-        
-        # Remove .pyc files
-        for file in files:
-            if file.endswith('.pyc'):
-                os.remove(os.path.join(root, file))
-    
-    # Create ZIP file
+    prune(code_dir)
+
+    if compile_bytecode:
+        print("[COMPILE] Precompiling bytecode...")
+        precompile(code_dir)
+
+    # Create ZIP file: only the code is compressed, dependencies come pre-zipped
     print("[ZIP] Creating deployment package...")
-    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(build_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, build_dir)
-                zipf.write(file_path, arcname)
-    
+    if args.layer:
+        write_zip(code_dir, output_zip)
+        shutil.copyfile(cached_zip(deps, "layer.zip", prefix="python"), layer_zip)
+        outputs = [output_zip, layer_zip]
+    else:
+        write_zip(code_dir, output_zip, base_zip=cached_zip(deps, "function.zip"))
+        outputs = [output_zip]
+
+    size_report(*outputs)
+
     # Get package size
-    package_size = output_zip.stat().st_size / (1024 * 1024)  # MB
     print("")
     print("[SUCCESS] Lambda deployment package created successfully!")
-    print(f"[SIZE] Package size: {package_size:.2f} MB")
-    print(f"[LOCATION] Location: {output_zip}")
+    for output in outputs:
+        package_size = output.stat().st_size / (1024 * 1024)  # MB
+        print(f"[SIZE] {output.name}: {package_size:.2f} MB")
+        print(f"[HASH] source_code_hash: {lambda_hash(output)}")
+        print(f"[LOCATION] Location: {output}")
     print("")
-    
+
     # Clean up build directory
     shutil.rmtree(build_dir)
-    
+
     print("[DONE] Build complete!")
     return 0
 
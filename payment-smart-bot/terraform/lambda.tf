@@ -1,5 +1,33 @@
 # Build Lambda deployment package with dependencies
 # Run: python build_lambda.py before terraform apply
+# (python build_lambda.py --layer when lambda_layer_enabled = true)
+
+# Dependencies layer (optional)
+resource "aws_lambda_layer_version" "dependencies" {
+  count               = var.lambda_layer_enabled ? 1 : 0
+  filename            = "${path.module}/lambda_layer.zip"
+  layer_name          = "${var.project_name}-deps-${var.environment}"
+  source_code_hash    = filebase64sha256("${path.module}/lambda_layer.zip")
+  compatible_runtimes = ["python3.11"]
+}
+
+# Environment shared by the handler and the tokenization worker
+locals {
+  lambda_environment = {
+    BEDROCK_MODEL_ID           = var.bedrock_model_id
+    BEDROCK_PROMPT_CACHE       = var.bedrock_prompt_cache
+    BEDROCK_INFERENCE_PROFILES = var.bedrock_inference_profiles
+    DYNAMODB_TABLE             = aws_dynamodb_table.sessions.name
+    STRIPE_SECRET_ARN          = aws_secretsmanager_secret.stripe_key.arn
+    # AWS_REGION is automatically set by Lambda - don't override it
+    ENVIRONMENT              = var.environment
+    SESSION_TTL_HOURS        = var.session_ttl_hours
+    PAYMENT_BOT_PREINIT      = var.lambda_preinit
+    SESSION_ITEM_LIMIT_BYTES = var.session_item_limit_bytes
+    PAYMENT_BOT_FIELDS       = join(",", var.payment_fields)
+    TOKENIZE_RATE_PER_SECOND = var.tokenize_rate_per_second
+  }
+}
 
 # Lambda Function
 resource "aws_lambda_function" "payment_handler" {
@@ -9,19 +37,16 @@ resource "aws_lambda_function" "payment_handler" {
   handler         = "payment_handler.lambda_handler"
   source_code_hash = filebase64sha256("${path.module}/lambda_function.zip")
   runtime         = "python3.11"
+  layers          = aws_lambda_layer_version.dependencies[*].arn
   
   memory_size = var.lambda_memory_size
   timeout     = var.lambda_timeout
   
   environment {
-    variables = {
-      BEDROCK_MODEL_ID    = var.bedrock_model_id
-      DYNAMODB_TABLE      = aws_dynamodb_table.sessions.name
-      STRIPE_SECRET_ARN   = aws_secretsmanager_secret.stripe_key.arn
-      # AWS_REGION is automatically set by Lambda - don't override it
-      ENVIRONMENT         = var.environment
-      SESSION_TTL_HOURS   = var.session_ttl_hours
-    }
+    variables = merge(local.lambda_environment, {
+      TOKENIZE_MODE      = var.tokenize_mode
+      TOKENIZE_QUEUE_URL = var.tokenize_mode == "sqs" ? aws_sqs_queue.tokenization[0].url : ""
+    })
   }
   
   # X-Ray tracing
@@ -13,6 +13,11 @@ output "lambda_function_arn" {
   value       = aws_lambda_function.payment_handler.arn
 }
 
+output "tokenization_queue_url" {
+  description = "Tokenization queue URL (tokenize_mode = \"sqs\")"
+  value       = var.tokenize_mode == "sqs" ? aws_sqs_queue.tokenization[0].url : null
+}
+
 output "dynamodb_table_name" {
   description = "DynamoDB sessions table name"
   value       = aws_dynamodb_table.sessions.name
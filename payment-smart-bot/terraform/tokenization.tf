@@ -0,0 +1,160 @@
+# Asynchronous tokenization (tokenize_mode = "sqs")
+# The confirm turn queues a job and replies "processing"; the worker Lambda
+# tokenizes with Stripe and records the result in the session.
+
+resource "aws_sqs_queue" "tokenization_dlq" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  name                      = "${var.project_name}-tokenization-dlq-${var.environment}"
+  message_retention_seconds = 1209600  # 14 days
+  sqs_managed_sse_enabled   = true
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.project_name}-tokenization-dlq-${var.environment}"
+    }
+  )
+}
+
+resource "aws_sqs_queue" "tokenization" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  name = "${var.project_name}-tokenization-${var.environment}"
+  # AWS recommends 6x the function timeout for Lambda event sources
+  visibility_timeout_seconds = var.lambda_timeout * 6
+  # Jobs carry only the session id: the session expires after session_ttl_hours.
+  # SQS accepts 60 s to 14 days; without a TTL keep jobs the full 14 days.
+  message_retention_seconds = var.session_ttl_hours > 0 ? max(60, min(1209600, var.session_ttl_hours * 3600)) : 1209600
+  sqs_managed_sse_enabled   = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.tokenization_dlq[0].arn
+    maxReceiveCount     = 3
+  })
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.project_name}-tokenization-${var.environment}"
+    }
+  )
+}
+
+# Worker: same package as the handler, SQS entry point
+resource "aws_lambda_function" "tokenization_worker" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  filename         = "${path.module}/lambda_function.zip"
+  function_name    = "${var.project_name}-tokenizer-${var.environment}"
+  role             = aws_iam_role.lambda_role.arn
+  handler          = "payment_handler.tokenize_worker"
+  source_code_hash = filebase64sha256("${path.module}/lambda_function.zip")
+  runtime          = "python3.11"
+  layers           = aws_lambda_layer_version.dependencies[*].arn
+
+  memory_size = var.lambda_memory_size
+  timeout     = var.lambda_timeout
+
+  environment {
+    variables = local.lambda_environment
+  }
+
+  tracing_config {
+    mode = var.enable_xray_tracing ? "Active" : "PassThrough"
+  }
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.project_name}-tokenizer-${var.environment}"
+    }
+  )
+
+  depends_on = [
+    aws_iam_role_policy.lambda_logging,
+    aws_iam_role_policy.lambda_dynamodb,
+    aws_iam_role_policy.lambda_secrets,
+    aws_iam_role_policy.lambda_kms,
+    aws_iam_role_policy.lambda_sqs
+  ]
+}
+
+resource "aws_cloudwatch_log_group" "tokenization_worker_logs" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  name              = "/aws/lambda/${aws_lambda_function.tokenization_worker[0].function_name}"
+  retention_in_days = var.cloudwatch_log_retention_days
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.project_name}-tokenizer-logs-${var.environment}"
+    }
+  )
+}
+
+# Bounded concurrency: at most tokenize_max_concurrency worker instances
+resource "aws_lambda_event_source_mapping" "tokenization" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  event_source_arn        = aws_sqs_queue.tokenization[0].arn
+  function_name           = aws_lambda_function.tokenization_worker[0].arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.tokenize_max_concurrency
+  }
+}
+
+# Policy for the tokenization queue (handler sends, worker receives)
+resource "aws_iam_role_policy" "lambda_sqs" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  name = "${var.project_name}-lambda-sqs-${var.environment}"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.tokenization[0].arn
+      }
+    ]
+  })
+}
+
+# Jobs that failed three times
+resource "aws_cloudwatch_metric_alarm" "tokenization_dlq" {
+  count = var.tokenize_mode == "sqs" ? 1 : 0
+
+  alarm_name          = "${var.project_name}-tokenization-dlq-${var.environment}"
+  comparison_operator = "GreaterThanThreshold"
+  evaluation_periods  = "1"
+  metric_name         = "ApproximateNumberOfMessagesVisible"
+  namespace           = "AWS/SQS"
+  period              = "300"
+  statistic           = "Maximum"
+  threshold           = "0"
+  alarm_description   = "Tokenization jobs that failed repeatedly; their sessions stay in processing"
+  treat_missing_data  = "notBreaching"
+
+  dimensions = {
+    QueueName = aws_sqs_queue.tokenization_dlq[0].name
+  }
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.project_name}-tokenization-dlq-alarm-${var.environment}"
+    }
+  )
+}
@@ -22,6 +22,28 @@ variable "bedrock_model_id" {
   default     = "us.meta.llama3-2-1b-instruct-v1:0"
 }
 
+variable "bedrock_prompt_cache" {
+  description = "Bedrock prompt caching for the system prompt and history: auto (Claude and Nova models), on or off"
+  type        = string
+  default     = "auto"
+
+  validation {
+    condition     = contains(["auto", "on", "off"], var.bedrock_prompt_cache)
+    error_message = "bedrock_prompt_cache must be auto, on or off."
+  }
+}
+
+variable "bedrock_inference_profiles" {
+  description = "Bedrock inference settings: adaptive (token cap, temperature and stop sequences per kind of turn) or fixed (512 tokens, temperature 0.5)"
+  type        = string
+  default     = "adaptive"
+
+  validation {
+    condition     = contains(["adaptive", "fixed"], var.bedrock_inference_profiles)
+    error_message = "bedrock_inference_profiles must be adaptive or fixed."
+  }
+}
+
 variable "stripe_secret_key" {
   description = "Stripe API secret key (will be stored in Secrets Manager)"
   type        = string
@@ -47,7 +69,7 @@ variable "dynamodb_billing_mode" {
 }
 
 variable "session_ttl_hours" {
-  description = "Session TTL in hours (auto-delete old sessions)"
+  description = "Session TTL in hours after the last turn (auto-delete old sessions, 0 disables)"
   type        = number
   default     = 1
 }
@@ -88,6 +110,73 @@ variable "bedrock_token_threshold" {
   default     = 100000  # 100k tokens/day (~$1.50 at Llama 3.2 1B pricing)
 }
 
+variable "lambda_layer_enabled" {
+  description = "Deploy dependencies as a Lambda layer (build with: python build_lambda.py --layer)"
+  type        = bool
+  default     = false
+}
+
+variable "lambda_preinit" {
+  description = "Pre-initialize clients, secrets and Stripe during init: auto (provisioned concurrency only), on or off"
+  type        = string
+  default     = "auto"
+
+  validation {
+    condition     = contains(["auto", "on", "off"], var.lambda_preinit)
+    error_message = "lambda_preinit must be auto, on or off."
+  }
+}
+
+variable "session_item_limit_bytes" {
+  description = "Largest session item written to DynamoDB; older history is dropped to stay under it (default: the 400 KB item limit, so nothing is dropped; 4096 keeps reads to one unit)"
+  type        = number
+  default     = 409600
+
+  validation {
+    condition     = var.session_item_limit_bytes >= 1024 && var.session_item_limit_bytes <= 409600
+    error_message = "session_item_limit_bytes must be between 1024 and 409600 (the DynamoDB item limit)."
+  }
+}
+
+variable "payment_fields" {
+  description = "Payment fields the bot collects, in order (zip adds the billing ZIP code)"
+  type        = list(string)
+  default     = ["name", "card", "expiry", "cvv"]
+
+  validation {
+    condition     = length(var.payment_fields) > 0 && alltrue([for f in var.payment_fields : contains(["name", "card", "expiry", "cvv", "zip"], f)])
+    error_message = "payment_fields must be a non-empty list of name, card, expiry, cvv and zip."
+  }
+}
+
+variable "tokenize_mode" {
+  description = "Tokenization on the confirm turn: inline (in the request) or sqs (queued, worker Lambda; the reply is \"processing\")"
+  type        = string
+  default     = "inline"
+
+  validation {
+    condition     = contains(["inline", "sqs"], var.tokenize_mode)
+    error_message = "tokenize_mode must be inline or sqs."
+  }
+}
+
+variable "tokenize_max_concurrency" {
+  description = "Most tokenization worker instances running at once (sqs mode)"
+  type        = number
+  default     = 2
+
+  validation {
+    condition     = var.tokenize_max_concurrency >= 2 && var.tokenize_max_concurrency <= 1000
+    error_message = "tokenize_max_concurrency must be between 2 and 1000 (SQS event source limits)."
+  }
+}
+
+variable "tokenize_rate_per_second" {
+  description = "Tokenizations started per second by each worker instance (sqs mode)"
+  type        = number
+  default     = 5
+}
+
 variable "tags" {
   description = "Additional tags for resources"
   type        = map(string)